@@ -0,0 +1,117 @@
+"""
+Pedidos em aberto ('Novo' e sem boleto pago) mantidos em memória pelo dashboard.
+
+Uma thread em segundo plano consulta a cada `intervalo` segundos a versão dos dados (tabela
+versao_dados, incrementada pela ingestão). Quando ela muda, busca só os pedidos alterados e os
+boletos carregados desde a última atualização (colunas atualizado_em e carregado_em, migração
+atualizado_em), aplica as mudanças em uma cópia do frame e troca a cópia de uma vez. Os callbacks
+leem a foto atual sem esperar pela atualização; enquanto a primeira carga não termina (ou se a
+última atualização falhou), estado() retorna None e o dashboard lê direto do banco.
+
+Configuração por variável de ambiente:
+    ATUALIZACAO_PEDIDOS_SEGUNDOS=30   (0 desliga a thread)
+"""
+import os
+import time
+import datetime
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+from dados_bilhetagem import (
+    versao_dados, agora_banco, empresas_nao_contabilizaveis, pedidos_alterados, pedidos_com_boleto_desde
+)
+
+INTERVALO_PADRAO = 30
+# Folga na busca incremental: cobre linhas gravadas por uma transação que começou antes da
+# última atualização e só foi confirmada depois (reaplicar uma linha não muda o resultado)
+MARGEM = datetime.timedelta(minutes=5)
+# De tempos em tempos o frame é recarregado inteiro (ex.: boletos apagados pela deduplicação)
+RECARGA_COMPLETA = datetime.timedelta(hours=6)
+
+# Foto dos dados: versão, pedidos em aberto e ids das empresas não contabilizáveis
+Estado = namedtuple("Estado", ["versao", "pedidos", "excluidas", "marca", "carga_completa"])
+
+
+class PedidosEmAberto:
+    """Frame dos pedidos em aberto, atualizado por uma thread em segundo plano."""
+
+    def __init__(self, engine, intervalo=None):
+        self.engine = engine
+        if intervalo is None:
+            intervalo = int(os.environ.get("ATUALIZACAO_PEDIDOS_SEGUNDOS", INTERVALO_PADRAO))
+        self.intervalo = intervalo
+        self._estado = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        """Inicia a thread de atualização (uma única vez; chamadas seguintes não fazem nada)."""
+        if self.intervalo <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="atualizador-pedidos", daemon=True)
+                self._thread.start()
+
+    def estado(self):
+        """Foto atual (Estado) ou None se os dados ainda não foram carregados."""
+        return self._estado
+
+    def pedidos(self, start_date=None, end_date=None):
+        """
+        Pedidos em aberto da foto atual com 'Data do Pedido' no período, sem as empresas não
+        contabilizáveis (mesmas colunas de carregar_pedidos). None se não houver foto.
+        """
+        estado = self._estado
+        if estado is None:
+            return None
+        df = estado.pedidos
+        filtro = ~df['empresa_id'].isin(estado.excluidas)
+        if start_date and end_date:
+            filtro &= df['Data do Pedido'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
+        return df[filtro].reset_index(drop=True)
+
+    def atualizar(self):
+        """Confere a versão dos dados e, se mudou, atualiza a foto. Retorna True se houve troca."""
+        anterior = self._estado
+        versao = versao_dados(self.engine)
+        if anterior is not None and anterior.versao == versao:
+            return False
+        marca = pd.Timestamp(agora_banco(self.engine)).to_pydatetime()
+        if anterior is None or marca - anterior.carga_completa > RECARGA_COMPLETA:
+            pedidos = pedidos_alterados(self.engine)
+            pedidos = pedidos[pedidos.pop('Aberto')].reset_index(drop=True)
+            carga_completa = marca
+        else:
+            pedidos = self._aplicar_mudancas(anterior.pedidos, anterior.marca - MARGEM)
+            carga_completa = anterior.carga_completa
+        excluidas = empresas_nao_contabilizaveis(self.engine)
+        # A troca é uma única atribuição: quem já leu a foto anterior continua com ela
+        self._estado = Estado(versao, pedidos, excluidas, marca, carga_completa)
+        return True
+
+    def _aplicar_mudancas(self, pedidos, desde):
+        """Novo frame: tira os pedidos alterados ou que ganharam boleto e acrescenta os que estão em aberto."""
+        alterados = pedidos_alterados(self.engine, desde)
+        pagos = pedidos_com_boleto_desde(self.engine, desde)
+        sair = set(alterados['Nº Pedido']) | pagos
+        aberto = alterados.pop('Aberto')
+        abertos = alterados[aberto & ~alterados['Nº Pedido'].isin(pagos)]
+        mantidos = pedidos[~pedidos['Nº Pedido'].isin(sair)]
+        if abertos.empty:
+            return mantidos.reset_index(drop=True)
+        return pd.concat([mantidos, abertos], ignore_index=True)
+
+    def _executar(self):
+        while True:
+            try:
+                if self.atualizar():
+                    estado = self._estado
+                    print(f"🔄 Pedidos em aberto atualizados: versão {estado.versao}, {len(estado.pedidos)} pedidos.")
+            except Exception as e:
+                # Sem foto confiável o dashboard volta a ler do banco até a próxima atualização
+                self._estado = None
+                print(f"⚠️ Falha ao atualizar os pedidos em aberto: {e}")
+            time.sleep(self.intervalo)
@@ -0,0 +1,255 @@
+"""
+Carga retroativa (backfill) de períodos longos do VTAdmin.
+
+O VTAdmin não consegue gerar relatórios de períodos muito grandes (processar_relatorio espera
+no máximo 120s pelo relatório). Este script divide o período em janelas de um mês ou de uma
+semana, baixa as janelas com concorrência limitada e grava em um arquivo de checkpoint
+as janelas concluídas: se a execução cair, basta rodar o mesmo comando de novo para continuar
+de onde parou (o checkpoint é um arquivo por período e tamanho de janela). Uma janela que estoura o tempo é dividida ao meio e as metades voltam para a fila.
+
+Ao final, os CSVs baixados são tratados e carregados com tratar_relatorios_envioDB.carregar_relatorios
+(o manifesto de arquivos evita carregar duas vezes o mesmo CSV).
+
+Uso:
+    python backfill_bilhetagem.py 01/01/2024 31/12/2024 --janela mes --concorrencia 2
+"""
+import os
+import json
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from selenium.common.exceptions import TimeoutException
+
+from config_vtadmin import download_dir
+from vtadmin_via_selenium import SessaoVTAdmin, main as selenium_main
+from planejador_bilhetagem import (
+    data_br, formatar_data_br, agrupar_em_janelas, garantir_tabela_cobertura, registrar_cobertura
+)
+from db_bilhetagem import get_engine
+from tratar_relatorios_envioDB import carregar_relatorios
+
+CONCORRENCIA_PADRAO = 2
+# Janelas com até esta quantidade de dias não são mais divididas quando estouram o tempo
+DIAS_MINIMOS_JANELA = 1
+
+
+def caminho_checkpoint(inicio, fim, janela, pasta=download_dir):
+    """Arquivo de checkpoint do período e do tamanho de janela (um backfill não reaproveita o de outro)."""
+    return os.path.join(pasta, f"backfill_checkpoint_{inicio:%Y%m%d}_{fim:%Y%m%d}_{janela}.json")
+
+
+def erros_tempo_esgotado(via):
+    """
+    Erros que indicam que o período pedido é grande demais para o VTAdmin gerar a tempo.
+    requests só é importado no modo HTTP (não é necessário em instalações só com Selenium).
+    """
+    if via == "http":
+        import requests
+        return (TimeoutError, TimeoutException, requests.exceptions.Timeout)
+    return (TimeoutError, TimeoutException)
+
+
+def dividir_periodo(inicio, fim, janela="mes"):
+    """
+    Divide [inicio, fim] (datetime.date) em janelas de calendário: meses ou semanas
+    (segunda a domingo). A primeira e a última janela são cortadas no período pedido.
+    """
+    janelas = []
+    atual = inicio
+    while atual <= fim:
+        if janela == "semana":
+            proximo = atual + datetime.timedelta(days=7 - atual.weekday())
+        elif atual.month == 12:
+            proximo = datetime.date(atual.year + 1, 1, 1)
+        else:
+            proximo = datetime.date(atual.year, atual.month + 1, 1)
+        janelas.append((atual, min(proximo - datetime.timedelta(days=1), fim)))
+        atual = proximo
+    return janelas
+
+
+def dividir_ao_meio(inicio, fim):
+    """Divide a janela [inicio, fim] em duas metades."""
+    meio = inicio + datetime.timedelta(days=(fim - inicio).days // 2)
+    return [(inicio, meio), (meio + datetime.timedelta(days=1), fim)]
+
+
+def dias_da_janela(inicio, fim):
+    """Conjunto de datas de inicio a fim (inclusive)."""
+    return {inicio + datetime.timedelta(days=i) for i in range((fim - inicio).days + 1)}
+
+
+class Checkpoint:
+    """
+    Arquivo JSON com o período, o tamanho de janela e as janelas já baixadas. É regravado
+    (de forma atômica) a cada janela concluída, para que uma execução interrompida possa ser
+    retomada. Um arquivo de outro período ou tamanho de janela é recusado (ValueError).
+    """
+
+    def __init__(self, caminho, inicio, fim, janela):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.periodo = {"inicio": formatar_data_br(inicio), "fim": formatar_data_br(fim), "janela": janela}
+        self.concluidas = []
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            if dados.get("periodo") != self.periodo:
+                raise ValueError(
+                    f"O checkpoint {caminho} é de outro backfill ({dados.get('periodo')}); "
+                    f"use outro arquivo para {self.periodo}."
+                )
+            self.concluidas = [tuple(janela) for janela in dados["concluidas"]]
+
+    def dias_concluidos(self):
+        dias = set()
+        for inicio, fim in self.concluidas:
+            dias |= dias_da_janela(data_br(inicio), data_br(fim))
+        return dias
+
+    def pendentes(self, janelas):
+        """
+        Retorna as partes das janelas que ainda não foram baixadas, mantendo a divisão original
+        (uma janela já dividida por timeout em uma execução anterior volta só com o que faltou).
+        """
+        concluidos = self.dias_concluidos()
+        resultado = []
+        for inicio, fim in janelas:
+            faltam = dias_da_janela(inicio, fim) - concluidos
+            resultado.extend(agrupar_em_janelas(faltam, dias_para_unir=0))
+        return resultado
+
+    def marcar(self, inicio, fim):
+        with self.lock:
+            self.concluidas.append((formatar_data_br(inicio), formatar_data_br(fim)))
+            temporario = self.caminho + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({
+                    "periodo": self.periodo,
+                    "concluidas": sorted(self.concluidas, key=lambda j: data_br(j[0])),
+                }, f, indent=2)
+            os.replace(temporario, self.caminho)
+
+
+class BaixadorJanelas:
+    """
+    Baixa os dois relatórios de uma janela. No modo Selenium cada thread mantém sua própria
+    SessaoVTAdmin (navegador logado, com pasta de download exclusiva), reaproveitada entre as janelas.
+    """
+
+    def __init__(self, via="selenium", pasta_download=download_dir):
+        self.via = via
+        self.pasta_download = pasta_download
+        self.local = threading.local()
+        self.sessoes = []
+        self.lock = threading.Lock()
+
+    def _sessao(self):
+        if not hasattr(self.local, "sessao"):
+            with self.lock:
+                pasta = os.path.join(self.pasta_download, f"_backfill_{len(self.sessoes) + 1}")
+                os.makedirs(pasta, exist_ok=True)
+                self.local.sessao = SessaoVTAdmin(pasta, pasta_destino=self.pasta_download)
+                self.sessoes.append(self.local.sessao)
+        return self.local.sessao
+
+    def baixar(self, inicio, fim):
+        data_inicial, data_final = formatar_data_br(inicio), formatar_data_br(fim)
+        if self.via == "http":
+            import vtadmin_http  # Só o modo HTTP precisa de requests/beautifulsoup4
+            return vtadmin_http.main(data_inicial, data_final, pasta_download=self.pasta_download)
+        return selenium_main(data_inicial, data_final, sessao=self._sessao())
+
+    def fechar(self):
+        for sessao in self.sessoes:
+            sessao.fechar()
+
+
+def executar_backfill(inicio, fim, janela="mes", concorrencia=CONCORRENCIA_PADRAO, via="selenium",
+                      checkpoint=None, dias_minimos=DIAS_MINIMOS_JANELA, pasta_download=download_dir,
+                      engine=None):
+    """
+    Baixa o período [inicio, fim] em janelas, com até `concorrencia` janelas ao mesmo tempo.
+    Com `engine`, cada janela concluída também é registrada na cobertura usada pelo planejador.
+    Retorna a lista de janelas que falharam (vazia se tudo foi baixado).
+    """
+    if checkpoint is None:
+        checkpoint = Checkpoint(caminho_checkpoint(inicio, fim, janela, pasta_download), inicio, fim, janela)
+    erros_tempo = erros_tempo_esgotado(via)
+    fila = checkpoint.pendentes(dividir_periodo(inicio, fim, janela))
+    if not fila:
+        print("✅ Todas as janelas do período já foram baixadas (checkpoint).")
+        return []
+    print(f"📅 {len(fila)} janela(s) pendente(s) entre {formatar_data_br(inicio)} e {formatar_data_br(fim)}.")
+
+    baixador = BaixadorJanelas(via, pasta_download)
+    falhas = []
+    try:
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            em_andamento = {}
+            while fila or em_andamento:
+                while fila and len(em_andamento) < concorrencia:
+                    janela_atual = fila.pop(0)
+                    em_andamento[executor.submit(baixador.baixar, *janela_atual)] = janela_atual
+                prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    ini, fi = em_andamento.pop(futuro)
+                    periodo = f"{formatar_data_br(ini)} a {formatar_data_br(fi)}"
+                    try:
+                        futuro.result()
+                    except erros_tempo:
+                        if (fi - ini).days + 1 > dias_minimos:
+                            print(f"⏳ Tempo esgotado em {periodo}. Dividindo a janela ao meio...")
+                            fila[:0] = dividir_ao_meio(ini, fi)
+                        else:
+                            print(f"❌ Tempo esgotado em {periodo}, que não pode mais ser dividida.")
+                            falhas.append((ini, fi))
+                    except Exception as e:
+                        print(f"❌ Falha ao baixar {periodo}: {type(e).__name__}: {e}")
+                        falhas.append((ini, fi))
+                    else:
+                        checkpoint.marcar(ini, fi)
+                        if engine is not None:
+                            registrar_cobertura(engine, ini, fi)
+                        print(f"✅ Janela {periodo} concluída.")
+    finally:
+        baixador.fechar()
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga retroativa de um período longo do VTAdmin, em janelas.")
+    parser.add_argument("desde", type=data_br, help="Data inicial (dd/mm/yyyy).")
+    parser.add_argument("ate", type=data_br, help="Data final (dd/mm/yyyy).")
+    parser.add_argument("--janela", choices=("mes", "semana"), default="mes", help="Tamanho das janelas iniciais.")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PADRAO,
+                        help="Quantidade máxima de janelas baixadas ao mesmo tempo.")
+    parser.add_argument("--via", choices=("selenium", "http"), default="selenium")
+    parser.add_argument("--checkpoint",
+                        help="Arquivo JSON com as janelas concluídas. Padrão: um por período e tamanho de janela.")
+    parser.add_argument("--sem-carga", action="store_true", help="Apenas baixa os CSVs, sem carregar no banco.")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para tratar os CSVs na carga.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    garantir_tabela_cobertura(engine)
+    caminho = args.checkpoint or caminho_checkpoint(args.desde, args.ate, args.janela)
+    falhas = executar_backfill(
+        args.desde, args.ate, args.janela, args.concorrencia, args.via,
+        Checkpoint(caminho, args.desde, args.ate, args.janela), engine=engine
+    )
+    if not args.sem_carga:
+        carregar_relatorios(engine, download_dir, workers=args.workers)
+
+    if falhas:
+        print(f"⚠ {len(falhas)} janela(s) não baixada(s); rode o mesmo comando novamente para tentar de novo:")
+        for ini, fi in falhas:
+            print(f"   - {formatar_data_br(ini)} a {formatar_data_br(fi)}")
+    else:
+        print("✅ Backfill concluído.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Cache das figuras do dashboard, com descarte LRU (a entrada usada há mais tempo sai primeiro).
+
+A chave é (função, argumentos, versão dos dados): os argumentos são o período selecionado e a
+versão vem da tabela versao_dados, incrementada pela ingestão. Assim uma entrada só deixa de
+valer quando chegam dados novos, e as entradas de versões antigas saem pelo próprio LRU.
+
+Backends:
+  - "memoria": dicionário ordenado no processo (padrão);
+  - "disco": um arquivo pickle por entrada, compartilhado entre os processos da mesma máquina;
+  - "desligado": sem cache.
+
+Configuração por variáveis de ambiente:
+    CACHE_FIGURAS=memoria|disco|desligado
+    CACHE_FIGURAS_MAXIMO=256
+    CACHE_FIGURAS_PASTA=/tmp/cache_figuras
+"""
+import os
+import pickle
+import hashlib
+import tempfile
+import functools
+import threading
+from collections import OrderedDict
+
+BACKEND_PADRAO = "memoria"
+MAXIMO_PADRAO = 256
+PASTA_PADRAO = os.path.join(tempfile.gettempdir(), "cache_figuras")
+
+# Marcador de entrada ausente (None pode ser um valor guardado)
+_AUSENTE = object()
+
+
+class CacheMemoria:
+    """Cache LRU em memória, limitado a `maximo` entradas."""
+
+    def __init__(self, maximo=MAXIMO_PADRAO):
+        self.maximo = maximo
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+
+    def obter(self, chave):
+        with self.lock:
+            if chave not in self.entradas:
+                return _AUSENTE
+            self.entradas.move_to_end(chave)
+            return self.entradas[chave]
+
+    def guardar(self, chave, valor):
+        with self.lock:
+            self.entradas[chave] = valor
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.maximo:
+                self.entradas.popitem(last=False)
+
+    def limpar(self):
+        with self.lock:
+            self.entradas.clear()
+
+
+class CacheDisco:
+    """
+    Cache LRU em disco: cada entrada é um arquivo .pkl na pasta; a data de modificação do
+    arquivo marca o último uso. Acima de `maximo` arquivos, os usados há mais tempo são apagados.
+    """
+
+    def __init__(self, pasta=PASTA_PADRAO, maximo=MAXIMO_PADRAO):
+        self.pasta = pasta
+        self.maximo = maximo
+        os.makedirs(pasta, exist_ok=True)
+
+    def _caminho(self, chave):
+        nome = hashlib.sha1(repr(chave).encode("utf-8")).hexdigest()
+        return os.path.join(self.pasta, f"{nome}.pkl")
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                valor = pickle.load(f)
+            os.utime(caminho)
+        except FileNotFoundError:
+            return _AUSENTE
+        except (pickle.UnpicklingError, EOFError, OSError):
+            # Arquivo corrompido ou apagado no meio da leitura por outro processo: recalcula
+            return _AUSENTE
+        return valor
+
+    def guardar(self, chave, valor):
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+        self._descartar()
+
+    def _descartar(self):
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(".pkl"):
+                caminho = os.path.join(self.pasta, nome)
+                try:
+                    arquivos.append((os.path.getmtime(caminho), caminho))
+                except FileNotFoundError:
+                    continue
+        arquivos.sort()
+        for _, caminho in arquivos[:max(len(arquivos) - self.maximo, 0)]:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+    def limpar(self):
+        for nome in os.listdir(self.pasta):
+            if nome.endswith(".pkl"):
+                os.remove(os.path.join(self.pasta, nome))
+
+
+class SemCache:
+    """Backend que não guarda nada (CACHE_FIGURAS=desligado)."""
+
+    def obter(self, chave):
+        return _AUSENTE
+
+    def guardar(self, chave, valor):
+        pass
+
+    def limpar(self):
+        pass
+
+
+def criar_cache(backend=None, maximo=None, pasta=None):
+    """Cria o backend de cache conforme os parâmetros ou as variáveis de ambiente CACHE_FIGURAS*."""
+    backend = backend or os.environ.get("CACHE_FIGURAS", BACKEND_PADRAO)
+    maximo = maximo or int(os.environ.get("CACHE_FIGURAS_MAXIMO", MAXIMO_PADRAO))
+    if backend == "memoria":
+        return CacheMemoria(maximo)
+    if backend == "disco":
+        return CacheDisco(pasta or os.environ.get("CACHE_FIGURAS_PASTA", PASTA_PADRAO), maximo)
+    if backend == "desligado":
+        return SemCache()
+    raise ValueError(f"Backend de cache desconhecido: {backend!r} (use memoria, disco ou desligado).")
+
+
+# Um lock por chave sendo calculada: chamadas simultâneas da mesma chave (ex.: vários gráficos
+# pedindo os mesmos dados ao abrir a página) esperam o primeiro cálculo em vez de repeti-lo
+_calculando = {}
+_lock_calculando = threading.Lock()
+
+
+def memorizar(cache, versao):
+    """
+    Decorador: guarda no `cache` o resultado da função por (nome da função, argumentos, versao()).
+    `versao` é chamada a cada execução e deve ser barata (ex.: ler a linha de versao_dados).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            chave = (funcao.__module__, funcao.__qualname__, args, tuple(sorted(kwargs.items())), versao())
+            valor = cache.obter(chave)
+            if valor is not _AUSENTE:
+                return valor
+            with _lock_calculando:
+                lock = _calculando.setdefault(chave, threading.Lock())
+            try:
+                with lock:
+                    valor = cache.obter(chave)
+                    if valor is _AUSENTE:
+                        valor = funcao(*args, **kwargs)
+                        cache.guardar(chave, valor)
+            finally:
+                # Só remove o lock desta rodada: quem acordou depois pode já ver outro lock
+                # criado por uma chamada nova da mesma chave
+                with _lock_calculando:
+                    if _calculando.get(chave) is lock:
+                        del _calculando[chave]
+            return valor
+        return envoltorio
+    return decorador
@@ -0,0 +1,411 @@
+import os
+import re
+import time
+import datetime
+import hashlib
+import tempfile
+from decimal import Decimal
+
+import pandas as pd
+from sqlalchemy import text
+
+# Estratégias de carga em massa disponíveis:
+#   "multi"  -> INSERT com várias linhas por comando (to_sql method="multi"), em lotes de tamanho_lote
+#   "infile" -> LOAD DATA LOCAL INFILE alimentado por um buffer CSV montado em memória
+#               (exige get_engine(local_infile=True) e local_infile=ON no servidor MySQL)
+ESTRATEGIAS_CARGA = ("multi", "infile")
+ESTRATEGIA_CARGA_PADRAO = "multi"
+TAMANHO_LOTE_PADRAO = 1000
+
+# Colunas de boletos_pago_v3 que entram no hash de conteúdo, nesta ordem
+COLUNAS_HASH_BOLETOS = [
+    "Banco", "Empresa", "Emissão", "Pagamento", "Processado",
+    "Liberação", "Nosso Número", "Número Pedido", "Valor Pedido", "Valor"
+]
+# Identificadores que podem chegar como número (12345, 12345.0) ou texto ("12345", "12345.0")
+COLUNAS_IDENTIFICADOR = {"Nosso Número", "Número Pedido"}
+_RE_INTEIRO_COM_DECIMAIS = re.compile(r"^(-?\d+)\.0*$")
+
+
+def _normalizar_para_hash(valor):
+    """
+    Converte um valor para texto de forma estável, para que o mesmo boleto gere o mesmo
+    hash tanto vindo do CSV (tratar_boletos_pago_v3) quanto lido de volta do banco.
+    """
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if isinstance(valor, Decimal):
+        return f"{valor:.2f}"
+    if isinstance(valor, float):
+        return str(int(valor)) if valor.is_integer() else repr(valor)
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()[:10]
+    return str(valor).strip()
+
+
+def normalizar_identificador(valor):
+    """
+    Texto canônico de um identificador: 12345, 12345.0, Decimal("12345.00"), "12345" e
+    "12345.0" viram todos "12345", qualquer que seja o tipo da coluna de origem.
+    """
+    texto = _normalizar_para_hash(valor)
+    inteiro = _RE_INTEIRO_COM_DECIMAIS.match(texto)
+    return inteiro.group(1) if inteiro else texto
+
+
+def calcular_hash_linhas(df, colunas=COLUNAS_HASH_BOLETOS):
+    """
+    Retorna uma Series com o SHA-1 (40 caracteres hex) do conteúdo de cada linha,
+    considerando apenas as `colunas` informadas, na ordem dada.
+    As colunas de COLUNAS_IDENTIFICADOR entram no hash em forma canônica (normalizar_identificador).
+    """
+    normalizadores = [
+        normalizar_identificador if coluna in COLUNAS_IDENTIFICADOR else _normalizar_para_hash
+        for coluna in colunas
+    ]
+
+    def hash_linha(linha):
+        texto = "\x1f".join(normalizar(v) for normalizar, v in zip(normalizadores, linha))
+        return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    return pd.Series(
+        [hash_linha(linha) for linha in df[colunas].itertuples(index=False, name=None)],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def _valor_infile(valor):
+    """Formata um valor para o arquivo do LOAD DATA (tabulado, escape '\\', NULL como \\N)."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return "\\N"
+    if isinstance(valor, datetime.datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    return (
+        str(valor)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _carregar_load_data(conn, df, tabela):
+    """
+    Carrega o DataFrame com LOAD DATA LOCAL INFILE.
+    O conteúdo é montado em memória; como o PyMySQL só envia arquivos a partir de um caminho,
+    o buffer é gravado em um arquivo temporário que é apagado logo após a carga.
+    """
+    linhas = (
+        "\t".join(_valor_infile(v) for v in linha)
+        for linha in df.itertuples(index=False, name=None)
+    )
+    buffer = "\n".join(linhas) + "\n"
+
+    arquivo = tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", suffix=".tsv", delete=False)
+    try:
+        with arquivo:
+            arquivo.write(buffer)
+        colunas = ", ".join(f"`{c}`" for c in df.columns)
+        conn.execute(
+            text(f"""
+                LOAD DATA LOCAL INFILE :arquivo
+                INTO TABLE {tabela}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({colunas})
+            """),
+            {"arquivo": arquivo.name.replace("\\", "/")},
+        )
+    finally:
+        os.remove(arquivo.name)
+
+
+def carregar_em_lote(conn, df, tabela, estrategia=ESTRATEGIA_CARGA_PADRAO,
+                     tamanho_lote=TAMANHO_LOTE_PADRAO, dtype=None):
+    """
+    Insere o DataFrame na tabela usando a estratégia de carga em massa escolhida
+    ("multi" ou "infile"). A tabela já deve existir.
+    """
+    if estrategia == "multi":
+        df.to_sql(
+            name=tabela, con=conn, if_exists="append", index=False,
+            method="multi", chunksize=tamanho_lote, dtype=dtype
+        )
+    elif estrategia == "infile":
+        _carregar_load_data(conn, df, tabela)
+    else:
+        raise ValueError(f"Estratégia de carga desconhecida: {estrategia}. Use uma de {ESTRATEGIAS_CARGA}.")
+
+
+def tabela_staging(tabela):
+    """Nome da tabela de staging usada na carga de `tabela`."""
+    return f"stg_{tabela}"
+
+
+def recriar_staging(engine, tabela):
+    """
+    Recria a tabela de staging com a mesma estrutura (colunas e índices) da tabela final.
+    É recriada a cada carga para acompanhar qualquer alteração de schema da tabela final.
+    """
+    staging = tabela_staging(tabela)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+        conn.execute(text(f"CREATE TABLE {staging} LIKE {tabela};"))
+    return staging
+
+
+def upsert_por_chave(engine, df, tabela, chave, dtype=None,
+                     estrategia=ESTRATEGIA_CARGA_PADRAO, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Carrega o lote `df` na tabela usando a coluna `chave` (índice único) como identidade:
+      - chaves novas são inseridas;
+      - chaves existentes com algum valor diferente são atualizadas;
+      - chaves existentes com todos os valores iguais não são tocadas.
+
+    O custo depende apenas do tamanho do lote (as buscas usam o índice único da chave),
+    e não do tamanho total da tabela.
+
+    Retorna um dicionário com as contagens {"inseridos", "atualizados", "inalterados"}
+    e o tempo total da carga em "segundos".
+    """
+    inicio = time.perf_counter()
+    contagens = {"inseridos": 0, "atualizados": 0, "inalterados": 0, "segundos": 0.0}
+    # Dentro do mesmo lote, vale a última ocorrência de cada chave
+    df = df.dropna(subset=[chave]).drop_duplicates(subset=[chave], keep="last")
+    if df.empty:
+        return contagens
+
+    staging = recriar_staging(engine, tabela)
+    colunas = [f"`{c}`" for c in df.columns]
+    lista_colunas = ", ".join(colunas)
+    iguais = " AND ".join(f"t.{c} <=> s.{c}" for c in colunas)
+    atualizacoes = ", ".join(f"{tabela}.{c} = VALUES({c})" for c in colunas if c != f"`{chave}`")
+
+    # A carga do lote vai para o staging em uma transação própria; na tabela final
+    # fica só o INSERT ... SELECT abaixo, em uma transação curta, confirmada por lote.
+    with engine.begin() as conn:
+        carregar_em_lote(conn, df, staging, estrategia, tamanho_lote, dtype)
+
+    with engine.begin() as conn:
+        contagens["inseridos"] = conn.execute(text(f"""
+            SELECT COUNT(*) FROM {staging} AS s
+            LEFT JOIN {tabela} AS t ON t.`{chave}` = s.`{chave}`
+            WHERE t.`{chave}` IS NULL
+        """)).scalar()
+        contagens["inalterados"] = conn.execute(text(f"""
+            SELECT COUNT(*) FROM {staging} AS s
+            JOIN {tabela} AS t ON t.`{chave}` = s.`{chave}`
+            WHERE {iguais}
+        """)).scalar()
+        contagens["atualizados"] = len(df) - contagens["inseridos"] - contagens["inalterados"]
+
+        # Só envia ao upsert as linhas novas ou alteradas
+        conn.execute(text(f"""
+            INSERT INTO {tabela} ({lista_colunas})
+            SELECT * FROM (
+                SELECT {", ".join(f"s.{c}" for c in colunas)} FROM {staging} AS s
+                LEFT JOIN {tabela} AS t ON t.`{chave}` = s.`{chave}` AND {iguais}
+                WHERE t.`{chave}` IS NULL
+            ) AS novos
+            ON DUPLICATE KEY UPDATE {atualizacoes}
+        """))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+    contagens["segundos"] = time.perf_counter() - inicio
+    return contagens
+
+
+def inserir_novos_por_hash(engine, df, tabela, coluna_hash="hash_linha", dtype=None,
+                           estrategia=ESTRATEGIA_CARGA_PADRAO, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Insere apenas as linhas cujo hash ainda não existe na tabela.
+    O índice único da coluna de hash rejeita duplicados no momento da inserção,
+    sem precisar reescrever a tabela inteira.
+
+    Retorna um dicionário com as contagens {"inseridos", "duplicados"}
+    e o tempo total da carga em "segundos".
+    """
+    inicio = time.perf_counter()
+    total = len(df)
+    df = df.dropna(subset=[coluna_hash]).drop_duplicates(subset=[coluna_hash])
+    contagens = {"inseridos": 0, "duplicados": total - len(df), "segundos": 0.0}
+    if df.empty:
+        return contagens
+
+    staging = recriar_staging(engine, tabela)
+    colunas = [f"`{c}`" for c in df.columns]
+    lista_colunas = ", ".join(colunas)
+
+    with engine.begin() as conn:
+        carregar_em_lote(conn, df, staging, estrategia, tamanho_lote, dtype)
+
+    with engine.begin() as conn:
+        novos = conn.execute(text(f"""
+            SELECT COUNT(*) FROM {staging} AS s
+            LEFT JOIN {tabela} AS t ON t.`{coluna_hash}` = s.`{coluna_hash}`
+            WHERE t.`{coluna_hash}` IS NULL
+        """)).scalar()
+        contagens["inseridos"] = novos
+        contagens["duplicados"] += len(df) - novos
+
+        # Duplicados batem no índice único e são descartados (atualização sem efeito)
+        conn.execute(text(f"""
+            INSERT INTO {tabela} ({lista_colunas})
+            SELECT {lista_colunas} FROM {staging}
+            ON DUPLICATE KEY UPDATE {tabela}.`{coluna_hash}` = {tabela}.`{coluna_hash}`
+        """))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {staging};"))
+    contagens["segundos"] = time.perf_counter() - inicio
+    return contagens
+
+
+def publicar_nova_versao(engine, tabela, preencher, manter_antiga=False):
+    """
+    Reconstrói a tabela em uma cópia e publica a cópia com uma troca atômica (RENAME TABLE).
+
+    `preencher(conn, nova)` recebe a conexão (dentro de uma transação) e o nome da cópia vazia
+    ({tabela}_novo, com a mesma estrutura e índices) e deve inseri-la com a nova versão dos dados,
+    retornando a quantidade de linhas. Enquanto isso a tabela publicada continua inteira para
+    o dashboard; quem consulta vê a versão anterior ou a nova, nunca uma tabela vazia ou pela metade.
+
+    A versão anterior é descartada após a troca, a menos que manter_antiga=True
+    (nesse caso fica em {tabela}_antigo). Escritas na tabela durante a reconstrução
+    não entram na nova versão: use apenas com a ingestão parada.
+    Ao final incrementa a versão dos dados (versao_dados), invalidando o cache do dashboard.
+    """
+    nova = f"{tabela}_novo"
+    antiga = f"{tabela}_antigo"
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {nova};"))
+        conn.execute(text(f"CREATE TABLE {nova} LIKE {tabela};"))
+    try:
+        with engine.begin() as conn:
+            linhas = preencher(conn, nova)
+    except Exception:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {nova};"))
+        raise
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {antiga};"))
+        conn.execute(text(f"RENAME TABLE {tabela} TO {antiga}, {nova} TO {tabela};"))
+        if not manter_antiga:
+            conn.execute(text(f"DROP TABLE {antiga};"))
+    garantir_tabela_versao(engine)
+    incrementar_versao_dados(engine)
+    return linhas
+
+
+def relatar_velocidade(tabela, linhas, segundos):
+    """Imprime a taxa de carga (linhas por segundo) de uma tabela."""
+    taxa = linhas / segundos if segundos > 0 else 0.0
+    print(f"⏱️ {tabela}: {linhas} linhas em {segundos:.2f}s ({taxa:,.0f} linhas/s).")
+
+
+# ===================== MANIFESTO DE ARQUIVOS CARREGADOS =====================
+
+TABELA_MANIFESTO = "arquivos_ingeridos"
+
+
+def garantir_tabela_manifesto(engine):
+    """Cria, se ainda não existir, a tabela que registra os arquivos CSV já carregados."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_MANIFESTO} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                pasta VARCHAR(255) NOT NULL,
+                nome_arquivo VARCHAR(255) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                tamanho BIGINT NOT NULL,
+                linhas INT NOT NULL,
+                carregado_em DATETIME NOT NULL,
+                UNIQUE KEY uk_pasta_checksum (pasta, checksum)
+            )
+        """))
+
+
+def checksum_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def info_arquivo(caminho, pasta):
+    """Monta o registro do manifesto (sem a contagem de linhas) para um arquivo."""
+    return {
+        "pasta": pasta,
+        "nome_arquivo": os.path.basename(caminho),
+        "caminho": caminho,
+        "checksum": checksum_arquivo(caminho),
+        "tamanho": os.path.getsize(caminho),
+    }
+
+
+def checksums_carregados(engine, pasta):
+    """Retorna o conjunto de checksums já carregados para a pasta de relatório."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(f"SELECT checksum FROM {TABELA_MANIFESTO} WHERE pasta = :pasta"),
+            {"pasta": pasta},
+        )
+        return {linha[0] for linha in result}
+
+
+def registrar_arquivo(engine, info, linhas):
+    """Registra no manifesto um arquivo cuja carga terminou com sucesso."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"""
+                INSERT INTO {TABELA_MANIFESTO}
+                    (pasta, nome_arquivo, checksum, tamanho, linhas, carregado_em)
+                VALUES (:pasta, :nome_arquivo, :checksum, :tamanho, :linhas, :carregado_em)
+                ON DUPLICATE KEY UPDATE
+                    nome_arquivo = VALUES(nome_arquivo),
+                    linhas = VALUES(linhas),
+                    carregado_em = VALUES(carregado_em)
+            """),
+            {
+                "pasta": info["pasta"],
+                "nome_arquivo": info["nome_arquivo"],
+                "checksum": info["checksum"],
+                "tamanho": info["tamanho"],
+                "linhas": linhas,
+                "carregado_em": datetime.datetime.now(),
+            },
+        )
+
+
+# ===================== VERSÃO DOS DADOS =====================
+
+# Tabela de uma linha com um contador incrementado a cada carga: o dashboard usa o valor como
+# parte da chave do cache de figuras (cache_figuras.py), que assim só é invalidado quando chegam dados.
+TABELA_VERSAO = "versao_dados"
+
+
+def garantir_tabela_versao(engine):
+    """Cria, se ainda não existir, a tabela da versão dos dados (já com a linha única)."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_VERSAO} (
+                id TINYINT PRIMARY KEY,
+                versao BIGINT NOT NULL,
+                atualizado_em DATETIME NOT NULL
+            )
+        """))
+        conn.execute(text(f"INSERT IGNORE INTO {TABELA_VERSAO} (id, versao, atualizado_em) VALUES (1, 0, NOW())"))
+
+
+def incrementar_versao_dados(engine):
+    """Marca que os dados mudaram (uma linha, um UPDATE)."""
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE {TABELA_VERSAO} SET versao = versao + 1, atualizado_em = NOW() WHERE id = 1"))
@@ -0,0 +1,29 @@
+# Configurações compartilhadas pelos exportadores do VTAdmin (Selenium e HTTP)
+
+download_dir = r"C:\Users\dcdse\OneDrive\Desktop"
+
+URL_VTADMIN = "https://vtadmin.manaus.prodatamobility.com.br"
+
+# Credenciais de acesso ao VTAdmin
+usuario = "DAVICARVALHO.SNTR"
+senha = "123456"
+
+# Relatórios disponíveis: código usado em selecionar_relatorio -> subpasta de destino dos CSVs
+RELATORIOS = {
+    1: "Pedidos Provider - V2",
+    2: "Boletos Pago (por data de pagamento - V3)",
+}
+
+# Campos do formulário wfm_ReportFilter.aspx de cada relatório (arquivo .rpt e datas inicial/final)
+FILTROS_RELATORIOS = {
+    1: {
+        "rpt": "ProviderOrders_v2.rpt",
+        "inicio": "DynamicControlProviderOrders_v2.rpt_4",
+        "fim": "DynamicControlProviderOrders_v2.rpt_5",
+    },
+    2: {
+        "rpt": "BilletsReport_V3.rpt",
+        "inicio": "DynamicControlBilletsReport_V3.rpt_7",
+        "fim": "DynamicControlBilletsReport_V3.rpt_8",
+    },
+}
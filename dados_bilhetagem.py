@@ -0,0 +1,319 @@
+import re
+import math
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from carga_bilhetagem import normalizar_identificador
+
+# Colunas de pedidos_provider_v2 lidas pelo dashboard (e exibidas nas tabelas de detalhes)
+COLUNAS_PEDIDOS = ["Empresa", "Código da Empresa", "Nº Pedido", "Data do Pedido", "Taxa Adm.", "Valor Crédito", "Status"]
+
+
+# Descarta os pedidos ainda em 'Novo' que já têm boleto pago (antes apagados da tabela ao abrir o dashboard)
+_SEM_NOVOS_JA_PAGOS = """NOT (COALESCE(p.`Status`, '') = 'Novo'
+             AND EXISTS (SELECT 1 FROM boletos_pago_v3 AS b WHERE b.`Número Pedido` = p.`Nº Pedido`))"""
+
+
+def versao_dados(engine):
+    """Versão atual dos dados (contador da tabela versao_dados, incrementado pela ingestão)."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT versao FROM versao_dados WHERE id = 1")).scalar()
+
+
+def agora_banco(engine):
+    """Data e hora atuais do servidor MySQL (mesmo relógio das colunas atualizado_em/carregado_em)."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT NOW()")).scalar()
+
+
+def empresas_nao_contabilizaveis(engine):
+    """Conjunto dos ids das empresas marcadas como não contabilizáveis."""
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT id FROM empresas WHERE contabilizavel = 0")).scalars())
+
+
+def limites_pedidos(engine):
+    """Menor e maior 'Data do Pedido' (datetime.date), lidas do índice ix_pedidos_data; (None, None) sem dados."""
+    with engine.connect() as conn:
+        menor, maior = conn.execute(
+            text("SELECT MIN(`Data do Pedido`), MAX(`Data do Pedido`) FROM pedidos_provider_v2")
+        ).one()
+    if menor is None:
+        return None, None
+    return pd.Timestamp(menor).date(), pd.Timestamp(maior).date()
+
+
+def carregar_pedidos(engine, start_date=None, end_date=None, status=None):
+    """
+    Lê de pedidos_provider_v2 apenas as COLUNAS_PEDIDOS (mais empresa_id) dos pedidos com
+    'Data do Pedido' entre start_date e end_date (inclusive) e, se informado, com o status na lista.
+    O filtro é feito no banco (índices ix_pedidos_data e ix_pedidos_status_data); empresas
+    marcadas como não contabilizáveis na tabela `empresas` ficam de fora.
+    Pedidos em 'Novo' que já têm boleto em boletos_pago_v3 (já pagos, o status ainda não foi
+    atualizado) também ficam de fora, por anti-join no índice ix_boletos_numero_pedido.
+    """
+    colunas = ", ".join(f"p.`{coluna}`" for coluna in COLUNAS_PEDIDOS)
+    filtros = ["COALESCE(e.contabilizavel, 1) = 1", _SEM_NOVOS_JA_PAGOS]
+    params = {}
+    if start_date and end_date:
+        filtros.append("p.`Data do Pedido` BETWEEN :inicio AND :fim")
+        params.update(inicio=pd.Timestamp(start_date).date(), fim=pd.Timestamp(end_date).date())
+    if status is not None:
+        filtros.append("p.`Status` IN :status")
+        params["status"] = list(status)
+    condicoes = " AND ".join(filtros)
+    query = text(f"""
+        SELECT {colunas}, p.empresa_id
+        FROM pedidos_provider_v2 AS p
+        LEFT JOIN empresas AS e ON e.id = p.empresa_id
+        WHERE {condicoes}
+    """)
+    if status is not None:
+        query = query.bindparams(bindparam("status", expanding=True))
+    # 'Data do Pedido' é DATE e 'Valor Crédito' é DECIMAL no banco: chegam já tipados
+    return pd.read_sql(query, engine, params=params, parse_dates=['Data do Pedido'])
+
+
+def pedidos_alterados(engine, desde=None):
+    """
+    Pedidos para o frame em memória do dashboard (atualizador_bilhetagem.py), com as
+    COLUNAS_PEDIDOS, empresa_id e a coluna booleana 'Aberto' (em 'Novo' e sem boleto pago).
+      - sem `desde`: todos os pedidos em aberto (carga completa);
+      - com `desde`: todos os pedidos inseridos ou alterados a partir de `desde` (coluna
+        atualizado_em, migração atualizado_em), abertos ou não, para tirar do frame os que fecharam.
+    As empresas não contabilizáveis não são filtradas aqui, e sim na leitura do frame.
+    """
+    colunas = ", ".join(f"p.`{coluna}`" for coluna in COLUNAS_PEDIDOS)
+    aberto = f"(COALESCE(p.`Status`, '') = 'Novo' AND {_SEM_NOVOS_JA_PAGOS})"
+    params = {}
+    if desde is None:
+        filtro = aberto
+    else:
+        filtro = "p.atualizado_em >= :desde"
+        params["desde"] = desde
+    query = text(f"""
+        SELECT {colunas}, p.empresa_id, {aberto} AS Aberto
+        FROM pedidos_provider_v2 AS p
+        WHERE {filtro}
+    """)
+    df = pd.read_sql(query, engine, params=params, parse_dates=['Data do Pedido'])
+    df['Aberto'] = df['Aberto'].astype(bool)
+    # Mesmo texto canônico de pedidos_com_boleto_desde, para o isin() do atualizador
+    df['Nº Pedido'] = df['Nº Pedido'].map(normalizar_identificador)
+    return df
+
+
+def pedidos_com_boleto_desde(engine, desde):
+    """
+    Números de pedido dos boletos carregados a partir de `desde` (coluna carregado_em), no texto
+    canônico de 'Nº Pedido' ("900018.0" gravado por cargas antigas vira "900018").
+    """
+    with engine.connect() as conn:
+        numeros = conn.execute(
+            text("SELECT DISTINCT `Número Pedido` FROM boletos_pago_v3 WHERE carregado_em >= :desde"),
+            {"desde": desde},
+        ).scalars()
+        return {numero for numero in map(normalizar_identificador, numeros) if numero}
+
+
+def pagamentos_por_dia(engine, inicio, fim):
+    """
+    Soma por dia o valor pago dos pedidos 'Pago e Liberado' entre inicio (inclusive) e fim (exclusive),
+    lendo apenas a faixa de datas da tabela de conciliação pedido_pagamento.
+    O dia é o do pagamento do boleto ou, sem ele, a data do pedido.
+    """
+    query = text("""
+        SELECT COALESCE(pp.pagamento, pp.data_pedido) AS Data, SUM(pp.valor_pago) AS ValorPago
+        FROM pedido_pagamento AS pp
+        LEFT JOIN empresas AS e ON e.id = pp.empresa_id
+        WHERE pp.status = 'Pago e Liberado'
+          AND COALESCE(e.contabilizavel, 1) = 1
+          AND ((pp.pagamento >= :inicio AND pp.pagamento < :fim)
+               OR (pp.pagamento IS NULL AND pp.data_pedido >= :inicio AND pp.data_pedido < :fim))
+        GROUP BY COALESCE(pp.pagamento, pp.data_pedido)
+        ORDER BY Data
+    """)
+    params = {"inicio": pd.Timestamp(inicio).date(), "fim": pd.Timestamp(fim).date()}
+    return pd.read_sql(query, engine, params=params, parse_dates=['Data'])
+
+
+def ranking_atrasos(engine, start_date, end_date, dias=5, limite=10):
+    """
+    Empresas com mais boletos pagos mais de `dias` dias após a emissão, entre os pedidos
+    com 'Data do Pedido' no intervalo selecionado. Consulta a tabela pedido_pagamento.
+    Pedidos ainda em 'Novo' ficam de fora (são os pedidos já pagos, ver carregar_pedidos).
+
+    Retorna as colunas empresa_id e QtdAtrasos, em ordem decrescente.
+    """
+    filtro_periodo = ""
+    params = {"dias": dias, "limite": limite}
+    if start_date and end_date:
+        filtro_periodo = "AND pp.data_pedido BETWEEN :inicio AND :fim"
+        params.update(inicio=pd.Timestamp(start_date).date(), fim=pd.Timestamp(end_date).date())
+    query = text(f"""
+        SELECT pp.empresa_id, COUNT(*) AS QtdAtrasos
+        FROM pedido_pagamento AS pp
+        LEFT JOIN empresas AS e ON e.id = pp.empresa_id
+        WHERE pp.dias_para_pagar > :dias
+          AND COALESCE(pp.status, '') <> 'Novo'
+          AND COALESCE(e.contabilizavel, 1) = 1
+          {filtro_periodo}
+        GROUP BY pp.empresa_id
+        ORDER BY QtdAtrasos DESC
+        LIMIT :limite
+    """)
+    return pd.read_sql(query, engine, params=params)
+
+
+def _filtro_meses(start_date, end_date, params):
+    """Filtro SQL dos meses inteiros que contêm o intervalo selecionado (sem datas, todos os meses)."""
+    if not (start_date and end_date):
+        return ""
+    params.update(
+        mes_inicio=pd.Timestamp(start_date).date().replace(day=1),
+        mes_fim=pd.Timestamp(end_date).date().replace(day=1),
+    )
+    return "AND k.mes BETWEEN :mes_inicio AND :mes_fim"
+
+
+def kpis_pedidos_mensais(engine, start_date, end_date):
+    """
+    Pedidos emitidos e pagos por mês (kpi_pedidos_mes), só das empresas contabilizáveis.
+    Retorna as colunas YearMonth (Period mensal), TotalEmitidos e TotalPagos.
+    """
+    params = {}
+    query = text(f"""
+        SELECT k.mes, SUM(k.emitidos) AS TotalEmitidos, SUM(k.pagos) AS TotalPagos
+        FROM kpi_pedidos_mes AS k
+        LEFT JOIN empresas AS e ON e.id = k.empresa_id
+        WHERE COALESCE(e.contabilizavel, 1) = 1
+          {_filtro_meses(start_date, end_date, params)}
+        GROUP BY k.mes
+        ORDER BY k.mes
+    """)
+    df = pd.read_sql(query, engine, params=params, parse_dates=['mes'])
+    df['YearMonth'] = df.pop('mes').dt.to_period('M')
+    return df
+
+
+def kpis_boletos_mensais(engine, start_date, end_date):
+    """
+    Indicadores mensais dos boletos pagos (kpi_boletos_mes), somados entre as empresas:
+    quantidade, valor, empresas distintas que pagaram (e com valor), dias até o pagamento e faixas.
+    Como antes, os boletos não passam pelo filtro de empresas contabilizáveis.
+    Retorna uma linha por mês, com a coluna YearMonth (Period mensal).
+    """
+    params = {}
+    query = text(f"""
+        SELECT k.mes,
+               SUM(k.boletos) AS boletos,
+               SUM(k.valor) AS valor,
+               COUNT(DISTINCT CASE WHEN k.empresa_id <> 0 THEN k.empresa_id END) AS empresas,
+               COUNT(DISTINCT CASE WHEN k.empresa_id <> 0 AND k.boletos_com_valor > 0 THEN k.empresa_id END)
+                   AS empresas_com_valor,
+               SUM(k.boletos_com_valor) AS boletos_com_valor,
+               SUM(k.boletos_com_emissao) AS boletos_com_emissao,
+               SUM(k.soma_dias) AS soma_dias,
+               SUM(k.qtd_ate_5) AS qtd_ate_5, SUM(k.qtd_6_a_10) AS qtd_6_a_10, SUM(k.qtd_mais_10) AS qtd_mais_10,
+               SUM(k.valor_ate_5) AS valor_ate_5, SUM(k.valor_6_a_10) AS valor_6_a_10,
+               SUM(k.valor_mais_10) AS valor_mais_10
+        FROM kpi_boletos_mes AS k
+        WHERE 1 = 1
+          {_filtro_meses(start_date, end_date, params)}
+        GROUP BY k.mes
+        ORDER BY k.mes
+    """)
+    df = pd.read_sql(query, engine, params=params, parse_dates=['mes'])
+    df['YearMonth'] = df.pop('mes').dt.to_period('M')
+    return df
+
+
+# ----------------------------------------------------------------------------
+# Paginação das tabelas de detalhes (DataTable com page_action/sort_action/filter_action='custom')
+# ----------------------------------------------------------------------------
+FORMATO_DATA_TABELA = '%d/%m/%Y'
+# Operadores do filter_query do DataTable ('{coluna} operador valor'), em símbolo e por extenso
+_OPERADORES_FILTRO = {
+    "eq": "eq", "=": "eq", "ne": "ne", "!=": "ne",
+    "lt": "lt", "<": "lt", "le": "le", "<=": "le", "gt": "gt", ">": "gt", "ge": "ge", ">=": "ge",
+    "contains": "contains", "icontains": "contains", "scontains": "contains",
+    "datestartswith": "datestartswith", "idatestartswith": "datestartswith", "sdatestartswith": "datestartswith",
+}
+_PARTE_FILTRO = re.compile(r"^\{(?P<coluna>[^}]+)\}\s+(?P<operador>\S+)\s+(?P<valor>.+)$")
+
+
+def _partes_filtro(filter_query):
+    """Divide o filter_query ('{col} op valor && ...') em (coluna, operador, valor); ignora o que não entende."""
+    partes = []
+    for parte in (filter_query or "").split(" && "):
+        encontrado = _PARTE_FILTRO.match(parte.strip())
+        if not encontrado or encontrado["operador"] not in _OPERADORES_FILTRO:
+            continue
+        valor = encontrado["valor"].strip()
+        if len(valor) >= 2 and valor[0] == valor[-1] and valor[0] in "'\"`":
+            valor = valor[1:-1].replace("\\" + valor[0], valor[0])
+        partes.append((encontrado["coluna"], _OPERADORES_FILTRO[encontrado["operador"]], valor))
+    return partes
+
+
+def _como_exibido(serie):
+    """Valores como aparecem na tabela: datas em FORMATO_DATA_TABELA, o resto como está."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime(FORMATO_DATA_TABELA)
+    return serie
+
+
+def filtrar_ordenar_tabela(df, sort_by=None, filter_query=None):
+    """
+    Aplica ao frame o filtro (filter_query) e a ordenação (sort_by) do DataTable.
+    Texto e datas são comparados como exibidos (datas em dd/mm/aaaa, 'contém' sem diferenciar
+    maiúsculas); números, numericamente. A ordenação usa os valores originais (datas como datas).
+    """
+    filtro = pd.Series(True, index=df.index)
+    for coluna, operador, valor in _partes_filtro(filter_query):
+        if coluna not in df.columns:
+            continue
+        serie = _como_exibido(df[coluna])
+        if operador in ("contains", "datestartswith"):
+            texto = serie.astype(str)
+            if operador == "contains":
+                filtro &= texto.str.contains(valor, case=False, regex=False)
+            else:
+                filtro &= texto.str.startswith(valor)
+            continue
+        numeros = pd.to_numeric(serie, errors="coerce")
+        try:
+            valor_numero = float(valor)
+        except ValueError:
+            valor_numero = None
+        if valor_numero is not None and numeros.notna().any():
+            serie, valor = numeros, valor_numero
+        else:
+            serie = serie.astype(str)
+        filtro &= {
+            "eq": serie == valor, "ne": serie != valor,
+            "lt": serie < valor, "le": serie <= valor, "gt": serie > valor, "ge": serie >= valor,
+        }[operador]
+    df = df[filtro]
+    if sort_by:
+        colunas = [s["column_id"] for s in sort_by if s["column_id"] in df.columns]
+        ascendente = [s["direction"] == "asc" for s in sort_by if s["column_id"] in df.columns]
+        if colunas:
+            df = df.sort_values(colunas, ascending=ascendente, kind="stable")
+    return df
+
+
+def pagina_tabela(df, page_current, page_size, sort_by=None, filter_query=None, colunas=None):
+    """
+    Uma página do frame filtrado e ordenado, pronta para o DataTable: retorna (registros, total de páginas).
+    Só as `colunas` informadas (todas, se None) e só as linhas da página vão para o navegador.
+    """
+    df = filtrar_ordenar_tabela(df, sort_by, filter_query)
+    total_paginas = max(math.ceil(len(df) / page_size), 1)
+    inicio = (page_current or 0) * page_size
+    pagina = df.iloc[inicio:inicio + page_size]
+    if colunas is not None:
+        pagina = pagina[colunas]
+    pagina = pagina.assign(**{coluna: _como_exibido(pagina[coluna]) for coluna in pagina.columns})
+    return pagina.to_dict('records'), total_paginas
@@ -4,8 +4,14 @@ import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
 from db_bilhetagem import get_engine
+from dados_bilhetagem import (
+    COLUNAS_PEDIDOS, FORMATO_DATA_TABELA, versao_dados, limites_pedidos, carregar_pedidos, pagamentos_por_dia,
+    ranking_atrasos, kpis_pedidos_mensais, kpis_boletos_mensais, filtrar_ordenar_tabela, pagina_tabela
+)
+from empresas_bilhetagem import nomes_empresas
+from cache_figuras import criar_cache, memorizar
+from atualizador_bilhetagem import PedidosEmAberto
 import datetime
-from sqlalchemy import text
 import plotly.graph_objects as go
 import locale
 
@@ -14,55 +20,25 @@ try:
 except:
     locale.setlocale(locale.LC_TIME, 'Portuguese_Brazil')
 
-# 1) Conexão e carregamento de dados
+# 1) Conexão (a engine só conecta no primeiro uso: importar este módulo não acessa o banco)
 engine = get_engine()
 
-def remove_pedidos_ja_pagos(engine):
-    """
-    Remove da tabela pedidos_provider_v2 todos os pedidos em status 'Novo'
-    cujo 'Nº Pedido' também existe na tabela boletos_pago_v3 (ou seja, já foram pagos).
-    """
-    with engine.begin() as conn:
-        delete_query = text("""
-            DELETE FROM `db_bilhetagem`.`pedidos_provider_v2`
-            WHERE `Status` = 'Novo'
-            AND `Nº Pedido` IN (
-                SELECT DISTINCT `Número Pedido`
-                FROM `db_bilhetagem`.`boletos_pago_v3`
-            );
-        """)
-        conn.execute(delete_query)
-
-def load_pedidos_data():
-    """Carrega os dados da tabela pedidos_provider_v2, removendo antes os pedidos já pagos."""
-    remove_pedidos_ja_pagos(engine)
-    query = "SELECT * FROM pedidos_provider_v2"
-    df = pd.read_sql(query, engine)
-    return df
-
-df_pedidos = load_pedidos_data()
-
-# 2) Conversão da coluna de data para datetime
-df_pedidos['Data do Pedido'] = pd.to_datetime(
-    df_pedidos['Data do Pedido'], format='%d/%m/%Y', errors='coerce'
-)
+# Figuras já calculadas por período e versão dos dados (ver cache_figuras.py)
+cache = criar_cache()
 
-# 3) Cópia do DataFrame para manipulação
-df_novo = df_pedidos.copy()
+# Pedidos em aberto mantidos em memória por uma thread que acompanha a versão dos dados
+# (ver atualizador_bilhetagem.py); a thread só começa no primeiro callback
+pedidos_memoria = PedidosEmAberto(engine)
 
-# Define as datas mínimas e máximas para o seletor de data
-if not df_novo.empty:
-    min_date = df_novo['Data do Pedido'].min().date()
-    max_date = df_novo['Data do Pedido'].max().date()
-else:
-    hoje = pd.to_datetime('today').date()
-    min_date = hoje
-    max_date = hoje
+# 2) Os pedidos não são mais carregados inteiros na memória: cada callback lê do banco só o
+#    período selecionado (dados_bilhetagem.carregar_pedidos). Os pedidos em 'Novo' que já têm
+#    boleto pago não são mais apagados aqui: as consultas os deixam de fora na leitura.
 
-hoje = pd.Timestamp.now().normalize().date()
-tres_meses_atras = (hoje - pd.DateOffset(months=2)).replace(day=1).date()
-start_date_default = max(tres_meses_atras, min_date)
-end_date_default   = min(hoje, max_date)
+def periodo_padrao():
+    """Período inicial do seletor: do primeiro dia de dois meses atrás até hoje."""
+    hoje = pd.Timestamp.now().normalize().date()
+    tres_meses_atras = (hoje - pd.DateOffset(months=2)).replace(day=1).date()
+    return tres_meses_atras, hoje
 
 def filtrar_pedidos_vencidos(df):
     """
@@ -79,186 +55,236 @@ def filtrar_pedidos_vencidos(df):
 # 4) Inicializa o aplicativo Dash com tema escuro do Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY])
 
-app.layout = html.Div(
-    style={
-        "backgroundColor": "#1f1f3d",
-        "minHeight": "100vh",
-        "padding": "20px"
-    },
-    children=[
-        html.H1(
-            "Dashboard - Pedidos com Status Novo",
-            style={
-                'textAlign': 'center',
-                'color': '#ffffff',
-                'marginBottom': '30px'
-            }
-        ),
-        # Card com seletor de data
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px",},
-            children=[
-                html.Label("Selecione o período:", style={"color": "#ffffff"}),
-                dcc.DatePickerRange(
-                    id='date-picker-range',
-                    min_date_allowed=min_date,
-                    max_date_allowed=max_date,
-                    start_date=start_date_default,
-                    end_date=end_date_default,
-                    display_format='YYYY-MM-DD',
-                    style={"backgroundColor": "#2a2b4f"}
-                )
-            ]
-        ),
-        # GRÁFICO 1: Taxa de Conversão de Pedidos em Pagamentos
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-novo') ]
-        ),
-
-
-        # GRÁFICO : Quantidade de Vales Pagos por Mês
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-vales') ]
-        ),
+def montar_layout():
+    """
+    Layout da página, montado a cada carregamento e sem consultar o banco: o período padrão
+    vem da data de hoje e os limites do seletor são preenchidos pelo callback limites_seletor.
+    """
+    start_date_default, end_date_default = periodo_padrao()
+    return html.Div(
+        style={
+            "backgroundColor": "#1f1f3d",
+            "minHeight": "100vh",
+            "padding": "20px"
+        },
+        children=[
+            # Dispara, ao abrir a página, os gráficos que não dependem do período selecionado
+            dcc.Location(id='url', refresh=False),
+            html.H1(
+                "Dashboard - Pedidos com Status Novo",
+                style={
+                    'textAlign': 'center',
+                    'color': '#ffffff',
+                    'marginBottom': '30px'
+                }
+            ),
+            # Card com seletor de data
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px",},
+                children=[
+                    html.Label("Selecione o período:", style={"color": "#ffffff"}),
+                    dcc.DatePickerRange(
+                        id='date-picker-range',
+                        start_date=start_date_default,
+                        end_date=end_date_default,
+                        display_format='YYYY-MM-DD',
+                        style={"backgroundColor": "#2a2b4f"}
+                    )
+                ]
+            ),
+            # GRÁFICO 1: Taxa de Conversão de Pedidos em Pagamentos
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-novo') ]
+            ),
+
+
+            # GRÁFICO : Quantidade de Vales Pagos por Mês
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-vales') ]
+            ),
 
 
         
-        # GRÁFICO 2: Pedidos vencidos agrupados por faixa (5 a 29 dias)
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-vencimento') ]
-        ),
-        # Tabela para detalhes ao clicar no gráfico de vencidos
-        # No layout principal, onde está o Card da tabela de pedidos vencidos, substitua por:
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[
-                html.H4("Detalhes dos Pedidos Vencidos (Clique em uma barra acima)", style={"color": "#ffffff"}),
-                dash_table.DataTable(
-                    id='table-vencidos',
-                    columns=[{"name": col, "id": col} for col in df_pedidos.columns],
-                    data=[],
-                    page_size=10,
-                    style_table={'overflowX': 'auto'},
-                    style_header={'backgroundColor': '#2a2b4f', 'color': 'white'},
-                    style_cell={'backgroundColor': '#1f1f3d', 'color': 'white'}
-                ),
-                html.Br(),
-                html.Button(
-                    "Exportar para Excel",
-                    id="btn-export-excel",
-                    n_clicks=0,
-                    style={
-                        "width": "190px",            # Ajusta a largura
-                        "height": "40px",          # Ajusta a altura
-                        "backgroundColor": "#48C9B0",  # Tom de verde (ajuste conforme desejar)
-                        "color": "#FFFFFF",           # Cor branca para o texto
-                        "fontWeight": "300",          # Fonte mais “leve” (pode usar 400 ou 600, se preferir)
-                        "border": "none",             # Remove a borda padrão
-                        "borderRadius": "4px",        # Borda levemente arredondada
-                        "padding": "8px 16px",        # Espaçamento interno
-                        "cursor": "pointer"           # Cursor tipo “mãozinha” ao passar sobre o botão
-                    }
-                ),
-
-                dcc.Download(id="download-table-vencidos")
-            ]
-        ),
-
-        # GRÁFICO 3: Previsão vs. Realizado Mensal
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-previsao') ]
-        ),
-        # GRÁFICO 4: Tempo Médio entre Emissão e Pagamento
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[dcc.Graph(id='graph-tempo-medio')]
-        ),
-
-        #Quantidade de Empresas que Pagaram
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-pago-empresas') ]
-        ),
-
-        # GRÁFICO : Ticket Médio por Mês
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-ticket-medio') ]
-        ),
-
-
-        # GRÁFICO 5: Ranking das Empresas com Mais Atrasos de Pagamento
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[ dcc.Graph(id='graph-empresas') ]
-        ),
-        # GRÁFICO 6: Top 10 Empresas com Maiores Valores Devidos (Atraso > 5 dias)
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[dcc.Graph(id='graph-evolucao')]
-        ),
-                # Novo DataTable para detalhes dos boletos em atraso (Empresa selecionada no Gráfico 6)
-        dbc.Card(
-            style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
-            children=[
-                html.H4("Detalhes dos Boletos em Atraso", style={"color": "#ffffff"}),
-                dash_table.DataTable(
-                    id='table-devedores',
-                    columns=[{"name": col, "id": col} for col in df_pedidos.columns],
-                    data=[],
-                    page_size=10,
-                    style_table={'overflowX': 'auto'},
-                    style_header={'backgroundColor': '#2a2b4f', 'color': 'white'},
-                    style_cell={'backgroundColor': '#1f1f3d', 'color': 'white'}
-                )
-            ]
-        ),
-
-    ]
-)
+            # GRÁFICO 2: Pedidos vencidos agrupados por faixa (5 a 29 dias)
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-vencimento') ]
+            ),
+            # Tabela para detalhes ao clicar no gráfico de vencidos
+            # No layout principal, onde está o Card da tabela de pedidos vencidos, substitua por:
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[
+                    html.H4("Detalhes dos Pedidos Vencidos (Clique em uma barra acima)", style={"color": "#ffffff"}),
+                    dash_table.DataTable(
+                        id='table-vencidos',
+                        columns=[{"name": col, "id": col} for col in COLUNAS_PEDIDOS],
+                        data=[],
+                        page_current=0,
+                        page_size=10,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query='',
+                        style_table={'overflowX': 'auto'},
+                        style_header={'backgroundColor': '#2a2b4f', 'color': 'white'},
+                        style_cell={'backgroundColor': '#1f1f3d', 'color': 'white'}
+                    ),
+                    html.Br(),
+                    html.Button(
+                        "Exportar para Excel",
+                        id="btn-export-excel",
+                        n_clicks=0,
+                        style={
+                            "width": "190px",            # Ajusta a largura
+                            "height": "40px",          # Ajusta a altura
+                            "backgroundColor": "#48C9B0",  # Tom de verde (ajuste conforme desejar)
+                            "color": "#FFFFFF",           # Cor branca para o texto
+                            "fontWeight": "300",          # Fonte mais “leve” (pode usar 400 ou 600, se preferir)
+                            "border": "none",             # Remove a borda padrão
+                            "borderRadius": "4px",        # Borda levemente arredondada
+                            "padding": "8px 16px",        # Espaçamento interno
+                            "cursor": "pointer"           # Cursor tipo “mãozinha” ao passar sobre o botão
+                        }
+                    ),
+
+                    dcc.Download(id="download-table-vencidos")
+                ]
+            ),
+
+            # GRÁFICO 3: Previsão vs. Realizado Mensal
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-previsao') ]
+            ),
+            # GRÁFICO 4: Tempo Médio entre Emissão e Pagamento
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[dcc.Graph(id='graph-tempo-medio')]
+            ),
+
+            #Quantidade de Empresas que Pagaram
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-pago-empresas') ]
+            ),
+
+            # GRÁFICO : Ticket Médio por Mês
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-ticket-medio') ]
+            ),
+
+
+            # GRÁFICO 5: Ranking das Empresas com Mais Atrasos de Pagamento
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[ dcc.Graph(id='graph-empresas') ]
+            ),
+            # GRÁFICO 6: Top 10 Empresas com Maiores Valores Devidos (Atraso > 5 dias)
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[dcc.Graph(id='graph-evolucao')]
+            ),
+                    # Novo DataTable para detalhes dos boletos em atraso (Empresa selecionada no Gráfico 6)
+            dbc.Card(
+                style={"backgroundColor": "#2a2b4f", "padding": "20px", "marginBottom": "30px"},
+                children=[
+                    html.H4("Detalhes dos Boletos em Atraso", style={"color": "#ffffff"}),
+                    dash_table.DataTable(
+                        id='table-devedores',
+                        columns=[{"name": col, "id": col} for col in COLUNAS_PEDIDOS],
+                        data=[],
+                        page_current=0,
+                        page_size=10,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query='',
+                        style_table={'overflowX': 'auto'},
+                        style_header={'backgroundColor': '#2a2b4f', 'color': 'white'},
+                        style_cell={'backgroundColor': '#1f1f3d', 'color': 'white'}
+                    )
+                ]
+            ),
+
+        ]
+    )
+
+
+app.layout = montar_layout
 
 # ----------------------------------------------------------------------------
-# CALLBACK 1: Atualiza os gráficos
+# CALLBACKS DOS GRÁFICOS: um callback por gráfico, para que cada um seja desenhado assim que
+# fica pronto (e um erro em um gráfico não derrube os demais). Os dados usados por vários
+# gráficos vêm das funções abaixo, guardadas no mesmo cache das figuras.
 # ----------------------------------------------------------------------------
+ENTRADAS_PERIODO = [
+    Input('date-picker-range', 'start_date'),
+    Input('date-picker-range', 'end_date')
+]
+
+
+def versao_atual():
+    """
+    Parte da chave do cache: versão dos dados e o dia de hoje (vencidos e previsão dependem de hoje).
+    A versão vem da foto em memória dos pedidos em aberto; sem ela, é lida do banco.
+    """
+    pedidos_memoria.iniciar()
+    estado = pedidos_memoria.estado()
+    versao = estado.versao if estado is not None else versao_dados(engine)
+    return versao, datetime.date.today()
+
+
+@memorizar(cache, versao_atual)
+def limites_pedidos_cache():
+    """Limites do seletor de datas (sem pedidos, hoje nos dois)."""
+    min_date, max_date = limites_pedidos(engine)
+    if min_date is None:
+        hoje = pd.Timestamp.now().normalize().date()
+        return hoje, hoje
+    return min_date, max_date
+
+
 @app.callback(
-    [
-        Output('graph-novo', 'figure'),
-        Output('graph-pago-empresas', 'figure'),
-        Output('graph-vencimento', 'figure'),
-        Output('graph-previsao', 'figure'),
-        Output('graph-tempo-medio', 'figure'),
-        Output('graph-empresas', 'figure'),
-        Output('graph-evolucao', 'figure'),
-        Output('graph-vales', 'figure'),
-        Output('graph-ticket-medio', 'figure')  # Novo gráfico de Ticket Médio
-    ],
-    [
-        Input('date-picker-range', 'start_date'),
-        Input('date-picker-range', 'end_date')
-    ]
+    Output('date-picker-range', 'min_date_allowed'),
+    Output('date-picker-range', 'max_date_allowed'),
+    Input('url', 'pathname')
 )
+def limites_seletor(_pathname):
+    """Menor e maior 'Data do Pedido' como limites do seletor, lidas do banco ao abrir a página."""
+    return limites_pedidos_cache()
+
 
+@memorizar(cache, versao_atual)
+def pedidos_em_aberto(start_date, end_date):
+    """Pedidos em 'Novo' do período selecionado (vencidos e devedores). Compartilhado: não altere."""
+    df = pedidos_memoria.pedidos(start_date, end_date)
+    if df is None:
+        df = carregar_pedidos(engine, start_date, end_date, status=['Novo'])
+    return df
 
 
-def update_graphs(start_date, end_date):
-    # Filtra os dados conforme o intervalo selecionado
-    if start_date and end_date:
-        mask = (df_novo['Data do Pedido'] >= start_date) & (df_novo['Data do Pedido'] <= end_date)
-        filtered_df = df_novo.loc[mask].copy()
-    else:
-        filtered_df = df_novo.copy()
+@memorizar(cache, versao_atual)
+def kpis_boletos_periodo(start_date, end_date):
+    """
+    Indicadores mensais pré-agregados na ingestão (kpis_bilhetagem.py): uma linha por mês exibido,
+    sempre de meses inteiros, independente da quantidade de boletos. Compartilhado: não altere.
+    """
+    return kpis_boletos_mensais(engine, start_date, end_date)
 
-    ############# GRÁFICO : Taxa de conversão de pedidos em pagamentos (Barras mensais)
 
-    filtered_df['YearMonth'] = filtered_df['Data do Pedido'].dt.to_period('M')
-    df_emitidos = filtered_df.groupby('YearMonth').size().reset_index(name='TotalEmitidos')
-    df_pagos = filtered_df[filtered_df['Status'].isin(['Pago', 'Pago e Liberado'])]\
-        .groupby('YearMonth').size().reset_index(name='TotalPagos')
-    df_taxa = pd.merge(df_emitidos, df_pagos, on='YearMonth', how='left').fillna(0)
+@app.callback(Output('graph-novo', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_conversao(start_date, end_date):
+    ############# GRÁFICO : Taxa de conversão de pedidos em pagamentos (Barras mensais)
+    df_taxa = kpis_pedidos_mensais(engine, start_date, end_date)
     df_taxa['TaxaConversao'] = (df_taxa['TotalPagos'] / df_taxa['TotalEmitidos']) * 100
     df_taxa.sort_values('YearMonth', inplace=True)
     df_taxa['MesAno'] = df_taxa['YearMonth'].dt.strftime('%b/%Y')
@@ -292,32 +318,15 @@ def update_graphs(start_date, end_date):
     yaxis_min = max(0, min_val - margin)
     yaxis_max = min(100, max_val + margin)
     fig_conversao.update_yaxes(range=[yaxis_min, yaxis_max])
+    return fig_conversao
 
 
-
+@app.callback(Output('graph-vales', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_vales(start_date, end_date):
     ##############  GRÁFICO: Quantidade de Vales Pagos por Mês
-
-    query_vales = "SELECT Pagamento, Valor FROM boletos_pago_v3"
-    df_vales = pd.read_sql(query_vales, engine)
-    
-    df_vales['Pagamento'] = pd.to_datetime(df_vales['Pagamento'], format='%d/%m/%Y', errors='coerce')
-    df_vales.dropna(subset=['Pagamento', 'Valor'], inplace=True)
-    df_vales['Valor'] = (
-        df_vales['Valor']
-        .str.replace('R$', '', regex=False)
-        .str.replace('.', '', regex=False)
-        .str.replace(',', '.', regex=False)
-    )
-    df_vales['Valor'] = pd.to_numeric(df_vales['Valor'], errors='coerce')
-    
-    if start_date and end_date:
-        start_date_dt = pd.to_datetime(start_date)
-        end_date_dt = pd.to_datetime(end_date)
-        df_vales = df_vales[(df_vales['Pagamento'] >= start_date_dt) & (df_vales['Pagamento'] <= end_date_dt)]
-    
-    df_vales['MesAno'] = df_vales['Pagamento'].dt.to_period('M')
-    df_vales_group = df_vales.groupby('MesAno')['Valor'].sum().reset_index(name='ValorPago')
-    df_vales_group.sort_values('MesAno', inplace=True)
+    df_kpis_boletos = kpis_boletos_periodo(start_date, end_date)
+    df_vales_group = df_kpis_boletos[['YearMonth', 'valor']].rename(columns={'YearMonth': 'MesAno', 'valor': 'ValorPago'})
     df_vales_group['MesAnoLabel'] = df_vales_group['MesAno'].dt.strftime('%b/%Y')
     
     # Calcula a quantidade de vales pagos dividindo o valor total por 4,5
@@ -351,11 +360,14 @@ def update_graphs(start_date, end_date):
     texttemplate='%{text}',   # Exibe o valor exatamente como está na coluna QtdValesFormat
     hovertemplate='Quantidade de Vales: %{customdata[0]}<extra></extra>'
     )
-
-  
+    return fig_vales
 
 
+@app.callback(Output('graph-vencimento', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_vencimento(start_date, end_date):
     ################ GRÁFICO : Pedidos vencidos agrupados por faixa (5 a 29 dias)
+    filtered_df = pedidos_em_aberto(start_date, end_date)
     df_vencidos = filtrar_pedidos_vencidos(filtered_df)
     def categorize_vencimento(x):
         if x == 5:
@@ -393,23 +405,28 @@ def update_graphs(start_date, end_date):
         hoverlabel=dict(bgcolor='#f39c12', font_size=14, font_family='Arial')
     )
     fig_vencimento.update_traces(marker_color="#38b6ff")
+    return fig_vencimento
 
 
-
+@app.callback(Output('graph-previsao', 'figure'), Input('url', 'pathname'))
+@memorizar(cache, versao_atual)
+def figura_previsao(_pathname):
+    """Sempre os últimos meses até o mês que vem: não depende do período selecionado."""
     # GRÁFICO : Previsão vs. Pagamento Acumulado (Reset Mensal)
-
-
-    df_previsao = df_novo[df_novo['Status'].isin(['Novo', 'Pago e Liberado'])].copy()
+    today_ts = pd.Timestamp.today().normalize()
+    current_month_start = today_ts.replace(day=1)
+    previous_month_start = current_month_start - pd.DateOffset(months=2)
+    next_month_start = current_month_start + pd.DateOffset(months=1)
+
+    # Só os pedidos cuja previsão (Data do Pedido + 5 dias) cai nos meses exibidos
+    df_previsao = carregar_pedidos(
+        engine,
+        previous_month_start - pd.DateOffset(days=5),
+        next_month_start - pd.DateOffset(days=6),
+        status=['Novo', 'Pago e Liberado']
+    )
     df_previsto = pd.DataFrame()
     if not df_previsao.empty and 'Valor Crédito' in df_previsao.columns:
-        df_previsao['Valor Crédito'] = (
-            df_previsao['Valor Crédito']
-            .str.replace('R$', '', regex=False)
-            .str.replace('.', '', regex=False)
-            .str.replace(',', '.', regex=False)
-        )
-        df_previsao['Valor Crédito'] = pd.to_numeric(df_previsao['Valor Crédito'], errors='coerce')
-        df_previsao['Data do Pedido'] = pd.to_datetime(df_previsao['Data do Pedido'], dayfirst=True, errors='coerce')
         df_previsao['PrevisaoRecebimento'] = df_previsao['Data do Pedido'] + pd.DateOffset(days=5)
         
         df_previsto = (
@@ -423,10 +440,6 @@ def update_graphs(start_date, end_date):
         df_previsto['Data'] = pd.to_datetime(df_previsto['Data'])
         df_previsto['year_month'] = df_previsto['Data'].dt.to_period('M')
         df_previsto['ValorPrevistoAcumulado'] = df_previsto.groupby('year_month')['ValorPrevisto'].cumsum()
-        today_ts = pd.Timestamp.today()
-        current_month_start = today_ts.replace(day=1)
-        previous_month_start = current_month_start - pd.DateOffset(months=2)
-        next_month_start = current_month_start + pd.DateOffset(months=1)
         df_previsto_filtered = df_previsto[
             (df_previsto['Data'] >= previous_month_start) &
             (df_previsto['Data'] < next_month_start)
@@ -437,59 +450,12 @@ def update_graphs(start_date, end_date):
     
     
     
-    df_pago = df_novo[df_novo['Status'] == 'Pago e Liberado'].copy()
-    df_pago['Valor Crédito'] = (
-        df_pago['Valor Crédito']
-        .str.replace('R$', '', regex=False)
-        .str.replace('.', '', regex=False)
-        .str.replace(',', '.', regex=False)
-    )
-    df_pago['Valor Crédito'] = pd.to_numeric(df_pago['Valor Crédito'], errors='coerce')
-    if not df_pago.empty and 'Nº Pedido' in df_pago.columns:
-        query_boletos = "SELECT * FROM boletos_pago_v3"
-        df_boletos = pd.read_sql(query_boletos, engine)
-        df_boletos['Pagamento'] = pd.to_datetime(df_boletos['Pagamento'], format='%d/%m/%Y', errors='coerce')
-        df_boletos['Valor'] = (
-            df_boletos['Valor']
-            .str.replace('R$', '', regex=False)
-            .str.replace('.', '', regex=False)
-            .str.replace(',', '.', regex=False)
-        )
-        df_boletos['Valor'] = pd.to_numeric(df_boletos['Valor'], errors='coerce')
-        df_pago['Nº Pedido'] = df_pago['Nº Pedido'].astype(str).str.strip()
-        df_boletos['Número Pedido'] = df_boletos['Número Pedido'].astype(str).str.strip()
-        df_pago_merged = pd.merge(
-            df_pago,
-            df_boletos,
-            left_on='Nº Pedido',
-            right_on='Número Pedido',
-            how='left'
-        )
-        df_pago_merged = df_pago_merged[
-            df_pago_merged['Número Pedido'].notna() & (df_pago_merged['Número Pedido'] != "")
-        ]
-        
-        df_pago_merged['ValorFinal'] = df_pago_merged['Valor'].combine_first(df_pago_merged['Valor Crédito'])
-        df_pago_merged['DataPagamento'] = df_pago_merged['Pagamento'].combine_first(df_pago_merged['Data do Pedido'])
-       
-        df_pago_grouped = (
-            df_pago_merged
-            .groupby(df_pago_merged['DataPagamento'].dt.date)['ValorFinal']
-            .sum()
-            .reset_index()
-        )
-        df_pago_grouped.columns = ['Data', 'ValorPago']
-        if not df_pago_grouped.empty:
-            df_pago_grouped['Data'] = pd.to_datetime(df_pago_grouped['Data'])
-            df_pago_grouped['year_month'] = df_pago_grouped['Data'].dt.to_period('M')
-            df_pago_grouped['ValorPagoAcumulado'] = df_pago_grouped.groupby('year_month')['ValorPago'].cumsum()
-            df_pago_filtered = df_pago_grouped[
-                (df_pago_grouped['Data'] >= previous_month_start) &
-                (df_pago_grouped['Data'] < next_month_start)
-            ].copy()
-            df_pago_filtered.sort_values('Data', inplace=True)
-        else:
-            df_pago_filtered = pd.DataFrame(columns=['Data', 'ValorPagoAcumulado'])
+    # Pagamentos já conciliados com os pedidos na ingestão (tabela pedido_pagamento): lê só a faixa exibida
+    df_pago_grouped = pagamentos_por_dia(engine, previous_month_start, next_month_start)
+    if not df_pago_grouped.empty:
+        df_pago_grouped['year_month'] = df_pago_grouped['Data'].dt.to_period('M')
+        df_pago_grouped['ValorPagoAcumulado'] = df_pago_grouped.groupby('year_month')['ValorPago'].cumsum()
+        df_pago_filtered = df_pago_grouped
     else:
         df_pago_filtered = pd.DataFrame(columns=['Data', 'ValorPagoAcumulado'])
     print(df_pago_filtered)
@@ -528,143 +494,122 @@ def update_graphs(start_date, end_date):
     )
     fig_previsao.update_xaxes(tickangle=-45, automargin=True)
     fig_previsao.update_yaxes(gridcolor='rgba(255,255,255,0.1)')
+    return fig_previsao
 
+
+@app.callback(Output('graph-tempo-medio', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_tempo_medio(start_date, end_date):
     # GRÁFICO : Tempo Médio entre Emissão e Pagamento + Percentual por Faixa
-    if 'Emissão' in df_boletos.columns and 'Pagamento' in df_boletos.columns:
-        df_boletos['Emissão'] = pd.to_datetime(df_boletos['Emissão'], format='%d/%m/%Y', errors='coerce')
-        df_boletos['Pagamento'] = pd.to_datetime(df_boletos['Pagamento'], format='%d/%m/%Y', errors='coerce')
-        df_validos = df_boletos.dropna(subset=['Emissão', 'Pagamento']).copy()
-        if not df_validos.empty:
-            df_validos['TempoPagamento'] = (df_validos['Pagamento'] - df_validos['Emissão']).dt.days
-            df_validos['YearMonth'] = df_validos['Pagamento'].dt.to_period('M')
-            if start_date and end_date:
-                start_date_dt = pd.to_datetime(start_date).date()
-                end_date_dt = pd.to_datetime(end_date).date()
-                df_validos = df_validos[(df_validos['Pagamento'].dt.date >= start_date_dt) & 
-                                        (df_validos['Pagamento'].dt.date <= end_date_dt)]
-            df_tempo_medio = df_validos.groupby('YearMonth')['TempoPagamento'].mean().reset_index()
-            df_tempo_medio['MesAno'] = df_tempo_medio['YearMonth'].dt.strftime('%b/%Y')
-            fig_tempo_medio = px.line(
-                df_tempo_medio,
-                x='MesAno',
-                y='TempoPagamento',
-                title='Tempo Médio entre Emissão e Pagamento + Percentual por Faixa',
-                markers=True,
-                labels={'MesAno': 'Mês/Ano', 'TempoPagamento': 'Tempo Médio (dias)'},
-                text=df_tempo_medio['TempoPagamento'].round(2).astype(str) + ' dias'
-            )
-            df_validos['FaixaPagamento'] = pd.cut(df_validos['TempoPagamento'],
-                bins=[-float('inf'), 5, 10, float('inf')],
-                labels=['0-5 dias', '6-10 dias', '10+ dias'],
-                right=True,
-                include_lowest=True
-            )
+    df_kpis_boletos = kpis_boletos_periodo(start_date, end_date)
+    df_validos = df_kpis_boletos[df_kpis_boletos['boletos_com_emissao'] > 0]
+    if not df_validos.empty:
+        df_tempo_medio = pd.DataFrame({
+            'YearMonth': df_validos['YearMonth'],
+            'TempoPagamento': df_validos['soma_dias'] / df_validos['boletos_com_emissao'],
+        })
+        df_tempo_medio['MesAno'] = df_tempo_medio['YearMonth'].dt.strftime('%b/%Y')
+        fig_tempo_medio = px.line(
+            df_tempo_medio,
+            x='MesAno',
+            y='TempoPagamento',
+            title='Tempo Médio entre Emissão e Pagamento + Percentual por Faixa',
+            markers=True,
+            labels={'MesAno': 'Mês/Ano', 'TempoPagamento': 'Tempo Médio (dias)'},
+            text=df_tempo_medio['TempoPagamento'].round(2).astype(str) + ' dias'
+        )
+        # Quantidade e valor pago por faixa de dias e mês (0-5 inclui os pagamentos antes da emissão)
+        faixas = {'0-5 dias': 'ate_5', '6-10 dias': '6_a_10', '10+ dias': 'mais_10'}
+        df_faixas = pd.concat([
+            pd.DataFrame({
+                'YearMonth': df_validos['YearMonth'],
+                'FaixaPagamento': faixa,
+                'Quantidade': df_validos[f'qtd_{sufixo}'],
+                'ValorPago': df_validos[f'valor_{sufixo}'],
+                'Total': df_validos['boletos_com_emissao'],
+            })
+            for faixa, sufixo in faixas.items()
+        ], ignore_index=True)
+        df_faixas['FaixaPagamento'] = pd.Categorical(df_faixas['FaixaPagamento'], categories=list(faixas))
+        df_faixas.sort_values(['YearMonth', 'FaixaPagamento'], inplace=True)
+
+        df_faixas['Percentual'] = (df_faixas['Quantidade'] / df_faixas['Total']) * 100
+        
+        df_faixas['MesAno'] = df_faixas['YearMonth'].dt.strftime('%b/%Y')
+        
 
-            # Usa 'ValorFinal', que é mais confiável (vindo do merge com boletos)
-            df_validos['ValorFinal'] = pd.to_numeric(df_validos['Valor'], errors='coerce')  # Se ainda não foi feito
-            #df_validos.to_excel('df_validos.xlsx', index=False)
-            # Soma o valor final pago por faixa e mês
-            df_valores = df_validos.groupby(['YearMonth', 'FaixaPagamento'])['ValorFinal'].sum().reset_index(name='ValorPago')
-           
-            df_faixas = df_validos.groupby(['YearMonth', 'FaixaPagamento']).size().reset_index(name='Quantidade')
-            
-            df_totais = df_validos.groupby('YearMonth').size().reset_index(name='Total')
-            
-            df_faixas = df_faixas.merge(df_totais, on='YearMonth')
-            
-            df_faixas['Percentual'] = (df_faixas['Quantidade'] / df_faixas['Total']) * 100
-            
-            df_faixas['MesAno'] = df_faixas['YearMonth'].dt.strftime('%b/%Y')
-            
-            df_faixas = df_faixas.merge(df_valores, on=['YearMonth', 'FaixaPagamento'], how='left')
-            
-
-            fig_barras = px.bar(
-                df_faixas,
-                x='MesAno',
-                y='Percentual',
-                color='FaixaPagamento',
-                barmode='overlay',
-                category_orders={'FaixaPagamento': ['0-5 dias', '6-10 dias', '10+ dias']}
-            )
-            for trace in fig_barras.data:
-                faixa = trace.name  # nome da faixa, ex.: '0-5 dias'
-                # Cria uma lista de customdata alinhada com os x de cada barra na trace
-                customdata_list = []
-                for x_val in trace.x:
-                    # Procura no DataFrame a linha que tenha o mesmo mês e a mesma faixa
-                    row = df_faixas[(df_faixas['MesAno'] == x_val) & (df_faixas['FaixaPagamento'] == faixa)]
-                    if not row.empty:
-                        customdata_list.append([faixa, row.iloc[0]['ValorPago']])
-                    else:
-                        customdata_list.append([faixa, 0])
-                trace.customdata = customdata_list
-                trace.hovertemplate = (
-                    'Mês: %{x}<br>' +
-                    'Faixa: %{customdata[0]}<br>' +
-                    'Percentual: %{y:.2f}%<br>' +
-                    'Valor Pago: R$ %{customdata[1]:,.2f}<extra></extra>'
-                )
-
-
-            fig_tempo_medio = go.Figure()
-            for trace in fig_barras.data:
-                trace.yaxis = "y2"
-                fig_tempo_medio.add_trace(trace)
-            fig_tempo_medio.add_trace(go.Scatter(
-                x=df_tempo_medio['MesAno'],
-                y=df_tempo_medio['TempoPagamento'],
-                mode='lines+markers',
-                name='Tempo Médio de Pagamento',
-                line=dict(color='#2ecc71', width=4),
-                marker=dict(size=10),
-                text=df_tempo_medio['TempoPagamento'].round(2).astype(str) + ' dias',
-                textposition='top center'
-            ))
-            fig_tempo_medio.update_layout(
-                title='Tempo Médio de Pagamento e Percentual por Faixa',
-                template='plotly_dark',
-                paper_bgcolor='#2a2b4f',
-                plot_bgcolor='#2a2b4f',
-                font_color='white',
-                legend=dict(x=1.04, y=1),
-                yaxis=dict(title='Tempo Médio (dias)'),
-                yaxis2=dict(
-                    title="Percentual de Pagamentos (%)",
-                    overlaying="y",
-                    side="right"
-                ),
-                barmode='stack'
+        fig_barras = px.bar(
+            df_faixas,
+            x='MesAno',
+            y='Percentual',
+            color='FaixaPagamento',
+            barmode='overlay',
+            category_orders={'FaixaPagamento': ['0-5 dias', '6-10 dias', '10+ dias']}
+        )
+        for trace in fig_barras.data:
+            faixa = trace.name  # nome da faixa, ex.: '0-5 dias'
+            # Cria uma lista de customdata alinhada com os x de cada barra na trace
+            customdata_list = []
+            for x_val in trace.x:
+                # Procura no DataFrame a linha que tenha o mesmo mês e a mesma faixa
+                row = df_faixas[(df_faixas['MesAno'] == x_val) & (df_faixas['FaixaPagamento'] == faixa)]
+                if not row.empty:
+                    customdata_list.append([faixa, row.iloc[0]['ValorPago']])
+                else:
+                    customdata_list.append([faixa, 0])
+            trace.customdata = customdata_list
+            trace.hovertemplate = (
+                'Mês: %{x}<br>' +
+                'Faixa: %{customdata[0]}<br>' +
+                'Percentual: %{y:.2f}%<br>' +
+                'Valor Pago: R$ %{customdata[1]:,.2f}<extra></extra>'
             )
-        else:
-            fig_tempo_medio = go.Figure()
-            fig_tempo_medio.update_layout(title='Tempo Médio entre Emissão e Pagamento - Sem Dados')
+
+
+        fig_tempo_medio = go.Figure()
+        for trace in fig_barras.data:
+            trace.yaxis = "y2"
+            fig_tempo_medio.add_trace(trace)
+        fig_tempo_medio.add_trace(go.Scatter(
+            x=df_tempo_medio['MesAno'],
+            y=df_tempo_medio['TempoPagamento'],
+            mode='lines+markers',
+            name='Tempo Médio de Pagamento',
+            line=dict(color='#2ecc71', width=4),
+            marker=dict(size=10),
+            text=df_tempo_medio['TempoPagamento'].round(2).astype(str) + ' dias',
+            textposition='top center'
+        ))
+        fig_tempo_medio.update_layout(
+            title='Tempo Médio de Pagamento e Percentual por Faixa',
+            template='plotly_dark',
+            paper_bgcolor='#2a2b4f',
+            plot_bgcolor='#2a2b4f',
+            font_color='white',
+            legend=dict(x=1.04, y=1),
+            yaxis=dict(title='Tempo Médio (dias)'),
+            yaxis2=dict(
+                title="Percentual de Pagamentos (%)",
+                overlaying="y",
+                side="right"
+            ),
+            barmode='stack'
+        )
     else:
         fig_tempo_medio = go.Figure()
-        fig_tempo_medio.update_layout(title='Tempo Médio entre Emissão e Pagamento - Dados Incompletos')
-
+        fig_tempo_medio.update_layout(title='Tempo Médio entre Emissão e Pagamento - Sem Dados')
+    return fig_tempo_medio
 
 
+@app.callback(Output('graph-pago-empresas', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_pago_empresas(start_date, end_date):
     # NOVO GRÁFICO: Quantidade de Empresas que Pagaram por Mês
-    query_boletos = "SELECT Empresa, Pagamento FROM boletos_pago_v3"
-    df_boletos = pd.read_sql(query_boletos, engine)
-    df_boletos['Pagamento'] = pd.to_datetime(df_boletos['Pagamento'], format='%d/%m/%Y', errors='coerce')
-    df_boletos.dropna(subset=['Pagamento'], inplace=True)
-
-    # Aplica o filtro de data
-    if start_date and end_date:
-        start_date_dt = pd.to_datetime(start_date)
-        end_date_dt = pd.to_datetime(end_date)
-        df_boletos = df_boletos[(df_boletos['Pagamento'] >= start_date_dt) & (df_boletos['Pagamento'] <= end_date_dt)]
-
-    # Cria uma coluna do tipo Period (mês/ano) para agrupar
-    df_boletos['MesAno'] = df_boletos['Pagamento'].dt.to_period('M')
-
-    # Agrupa por MesAno e conta o número de empresas únicas
-    df_empresas_mes = df_boletos.groupby('MesAno')['Empresa'].nunique().reset_index(name='Quantidade')
-
-    # Ordena pela coluna MesAno (agora em Period), garantindo ordem cronológica
-    df_empresas_mes.sort_values('MesAno', inplace=True)
+    df_kpis_boletos = kpis_boletos_periodo(start_date, end_date)
+    # Empresas distintas com boleto pago no mês (contadas na leitura, a partir das linhas por empresa)
+    df_empresas_mes = df_kpis_boletos[['YearMonth', 'empresas']].rename(
+        columns={'YearMonth': 'MesAno', 'empresas': 'Quantidade'}
+    )
 
     # Cria uma coluna string formatada para exibir no eixo X (ex.: "Jan/2025")
     df_empresas_mes['MesAnoLabel'] = df_empresas_mes['MesAno'].dt.strftime('%b/%Y')
@@ -687,35 +632,17 @@ def update_graphs(start_date, end_date):
     )
 
     fig_pago_empresas.update_traces(marker_color='#38b6ff')
+    return fig_pago_empresas
 
 
+@app.callback(Output('graph-ticket-medio', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_ticket(start_date, end_date):
     # NOVO GRÁFICO: Ticket Médio por Mês
-    query_ticket = "SELECT Empresa, Pagamento, Valor FROM boletos_pago_v3"
-    df_ticket = pd.read_sql(query_ticket, engine)
-    
-    df_ticket['Pagamento'] = pd.to_datetime(df_ticket['Pagamento'], format='%d/%m/%Y', errors='coerce')
-    df_ticket.dropna(subset=['Pagamento', 'Valor'], inplace=True)
-    df_ticket['Valor'] = (
-        df_ticket['Valor']
-        .str.replace('R$', '', regex=False)
-        .str.replace('.', '', regex=False)
-        .str.replace(',', '.', regex=False)
-    )
-    df_ticket['Valor'] = pd.to_numeric(df_ticket['Valor'], errors='coerce')
-    
-    # Aplica o filtro de data
-    if start_date and end_date:
-        start_date_dt = pd.to_datetime(start_date)
-        end_date_dt = pd.to_datetime(end_date)
-        df_ticket = df_ticket[(df_ticket['Pagamento'] >= start_date_dt) & (df_ticket['Pagamento'] <= end_date_dt)]
-    
-    # Agrupa por mês/ano
-    df_ticket['MesAno'] = df_ticket['Pagamento'].dt.to_period('M')
-    df_ticket_group = df_ticket.groupby('MesAno').agg(
-        TotalValor=('Valor', 'sum'),
-        Empresas=('Empresa', 'nunique')
-    ).reset_index()
-    df_ticket_group.sort_values('MesAno', inplace=True)
+    df_kpis_boletos = kpis_boletos_periodo(start_date, end_date)
+    df_ticket_group = df_kpis_boletos.loc[
+        df_kpis_boletos['boletos_com_valor'] > 0, ['YearMonth', 'valor', 'empresas_com_valor']
+    ].rename(columns={'YearMonth': 'MesAno', 'valor': 'TotalValor', 'empresas_com_valor': 'Empresas'})
     df_ticket_group['MesAnoLabel'] = df_ticket_group['MesAno'].dt.strftime('%b/%Y')
     
     # Calcula o Ticket Médio: Total vendido / número de empresas únicas
@@ -738,34 +665,17 @@ def update_graphs(start_date, end_date):
         bargap=0.2
     )
     fig_ticket.update_traces(marker_color='#38b6ff')
+    return fig_ticket
 
 
-
+@app.callback(Output('graph-empresas', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_empresas(start_date, end_date):
     # GRÁFICO 5: Ranking das Empresas com Mais Atrasos de Pagamento (por quantidade)
     try:
-        query_boletos = "SELECT * FROM boletos_pago_v3"
-        df_boletos_emp = pd.read_sql(query_boletos, engine)
-        df_boletos_emp['Emissão'] = pd.to_datetime(df_boletos_emp['Emissão'], format='%d/%m/%Y', errors='coerce')
-        df_boletos_emp['Pagamento'] = pd.to_datetime(df_boletos_emp['Pagamento'], format='%d/%m/%Y', errors='coerce')
-        df_boletos_emp.dropna(subset=['Emissão', 'Pagamento'], inplace=True)
-        filtered_df['Nº Pedido'] = filtered_df['Nº Pedido'].astype(str).str.strip()
-        df_boletos_emp['Número Pedido'] = df_boletos_emp['Número Pedido'].astype(str).str.strip()
-        df_merged = pd.merge(
-            filtered_df,
-            df_boletos_emp,
-            left_on='Nº Pedido',
-            right_on='Número Pedido',
-            how='inner',
-            suffixes=('', '_boletos')
-        )
-        df_merged['TempoPagamento'] = (df_merged['Pagamento'] - df_merged['Emissão']).dt.days
-        df_merged = df_merged[df_merged['TempoPagamento'] >= 0]
-        df_atrasados = df_merged[df_merged['TempoPagamento'] > 5]
-        if 'Empresa' in df_atrasados.columns:
-            df_empresas = df_atrasados.groupby('Empresa').size().reset_index(name='QtdAtrasos')
-            df_empresas = df_empresas.sort_values('QtdAtrasos', ascending=False).head(10)
-        else:
-            df_empresas = pd.DataFrame(columns=['Empresa', 'QtdAtrasos'])
+        # Dias entre emissão e pagamento já calculados na conciliação (tabela pedido_pagamento)
+        df_empresas = ranking_atrasos(engine, start_date, end_date)
+        df_empresas['Empresa'] = df_empresas['empresa_id'].map(nomes_empresas(engine))
         fig_empresas = px.bar(
             df_empresas,
             x='QtdAtrasos',
@@ -783,8 +693,14 @@ def update_graphs(start_date, end_date):
     except Exception as e:
         fig_empresas = go.Figure()
         fig_empresas.update_layout(title='Ranking de Empresas - Dados Indisponíveis')
+    return fig_empresas
+
 
+@app.callback(Output('graph-evolucao', 'figure'), ENTRADAS_PERIODO)
+@memorizar(cache, versao_atual)
+def figura_devedores(start_date, end_date):
     # GRÁFICO 6: Top 10 Empresas com Maiores Valores Devidos (Atraso > 5 dias)
+    filtered_df = pedidos_em_aberto(start_date, end_date)
     try:
         # Filtra os pedidos em status "Novo" (ainda não pagos) no período selecionado
         df_overdue = filtered_df[filtered_df['Status'] == 'Novo'].copy()
@@ -792,28 +708,28 @@ def update_graphs(start_date, end_date):
         df_overdue['DiasDesdePedido'] = (hoje_normalizado - df_overdue['Data do Pedido']).dt.days
         df_overdue = df_overdue[df_overdue['DiasDesdePedido'] > 5].copy()
         
-        # Converter "Valor Crédito" para numérico
-        if 'Valor Crédito' in df_overdue.columns:
-            df_overdue['Valor Crédito'] = (
-                df_overdue['Valor Crédito']
-                .str.replace('R$', '', regex=False)
-                .str.replace('.', '', regex=False)
-                .str.replace(',', '.', regex=False)
-            )
-            df_overdue['Valor Crédito'] = pd.to_numeric(df_overdue['Valor Crédito'], errors='coerce')
-        
         # Agrupar por "Empresa" e somar o valor devido
-        df_devedores = df_overdue.groupby('Empresa', as_index=False)['Valor Crédito'].sum()
+        df_devedores = df_overdue.groupby('empresa_id', as_index=False)['Valor Crédito'].sum()
         df_devedores = df_devedores.sort_values('Valor Crédito', ascending=False).head(10)
-        
+        df_devedores['Empresa'] = df_devedores['empresa_id'].map(nomes_empresas(engine))
+        # Uma barra por empresa_id (empresas com o mesmo nome não se juntam); o eixo mostra o nome
+        # e o clique entrega o empresa_id em customdata para a tabela de detalhes
+        df_devedores['empresa_id'] = df_devedores['empresa_id'].astype(int)
+        df_devedores['IdEmpresa'] = df_devedores['empresa_id'].astype(str)
+
         # Criar gráfico de barras horizontal
         fig_devedores = px.bar(
             df_devedores,
             x='Valor Crédito',
-            y='Empresa',
+            y='IdEmpresa',
             orientation='h',
+            custom_data=['empresa_id'],
+            hover_data={'Empresa': True, 'IdEmpresa': False},
             title='Top 10 Empresas com Maiores Valores Devidos (Atraso > 5 dias)',
-            labels={'Valor Crédito': 'Valor Devido (R$)', 'Empresa': 'Empresa'}
+            labels={'Valor Crédito': 'Valor Devido (R$)', 'IdEmpresa': 'Empresa'}
+        )
+        fig_devedores.update_yaxes(
+            type='category', tickvals=df_devedores['IdEmpresa'], ticktext=df_devedores['Empresa']
         )
         fig_devedores.update_layout(
             template='plotly_dark',
@@ -824,105 +740,117 @@ def update_graphs(start_date, end_date):
     except Exception as e:
         fig_devedores = go.Figure()
         fig_devedores.update_layout(title=f'Erro ao gerar gráfico de devedores: {e}')
+    return fig_devedores
+
+
+# ----------------------------------------------------------------------------
+# TABELAS DE DETALHES
+# ----------------------------------------------------------------------------
+# As duas tabelas de detalhes paginam, ordenam e filtram no servidor (page_action, sort_action e
+# filter_action='custom'): o frame da seleção fica no cache e só a página exibida vai ao navegador.
+def _faixa_vencimento(dias):
+    if dias == 5:
+        return "5 dias"
+    elif 6 <= dias <= 10:
+        return "6 a 10 dias"
+    elif 11 <= dias < 30:
+        return "11 a 29 dias"
+    else:
+        return None
 
-    return (
-        fig_conversao,
-        fig_pago_empresas,
-        fig_vencimento,
-        fig_previsao,
-        fig_tempo_medio,
-        fig_empresas,
-        fig_devedores,
-        fig_vales,
-        fig_ticket  
-    )
 
+@memorizar(cache, versao_atual)
+def detalhes_vencidos(start_date, end_date, faixa):
+    """Pedidos vencidos do período na faixa clicada no gráfico de vencidos. Compartilhado: não altere."""
+    df_vencidos = filtrar_pedidos_vencidos(pedidos_em_aberto(start_date, end_date))
+    df_vencidos['FaixaVencimento'] = df_vencidos['DiasDesdePedido'].apply(_faixa_vencimento)
+    return df_vencidos[df_vencidos['FaixaVencimento'] == faixa].reset_index(drop=True)
 
 
+@memorizar(cache, versao_atual)
+def detalhes_devedores(start_date, end_date, empresa_id):
+    """Pedidos em 'Novo' há mais de 5 dias da empresa clicada no gráfico de devedores. Compartilhado: não altere."""
+    df_overdue = pedidos_em_aberto(start_date, end_date)
+    df_overdue = df_overdue[(df_overdue['Status'] == 'Novo') & (df_overdue['empresa_id'] == empresa_id)].copy()
+    hoje_normalizado = pd.Timestamp.now().normalize()
+    df_overdue['DiasDesdePedido'] = (hoje_normalizado - df_overdue['Data do Pedido']).dt.days
+    return df_overdue[df_overdue['DiasDesdePedido'] > 5].reset_index(drop=True)
+
+
+def _pagina_detalhes(tabela, df, page_current, page_size, sort_by, filter_query):
+    """
+    Registros da página, total de páginas e página atual do DataTable `tabela`. Qualquer mudança
+    que não seja a troca de página (clique, período, ordenação ou filtro) volta para a primeira página.
+    """
+    if f"{tabela}.page_current" not in dash.ctx.triggered_prop_ids:
+        page_current = 0
+    if df is None:
+        return [], 1, 0
+    registros, total_paginas = pagina_tabela(df, page_current, page_size, sort_by, filter_query, COLUNAS_PEDIDOS)
+    return registros, total_paginas, page_current
+
 
 # ----------------------------------------------------------------------------
 # CALLBACK 2: Atualiza a tabela com os detalhes ao clicar no gráfico de vencidos
 # ----------------------------------------------------------------------------
 @app.callback(
     Output('table-vencidos', 'data'),
-    [
-        Input('graph-vencimento', 'clickData'),
-        Input('date-picker-range', 'start_date'),
-        Input('date-picker-range', 'end_date')
-    ]
+    Output('table-vencidos', 'page_count'),
+    Output('table-vencidos', 'page_current'),
+    Input('graph-vencimento', 'clickData'),
+    Input('date-picker-range', 'start_date'),
+    Input('date-picker-range', 'end_date'),
+    Input('table-vencidos', 'page_current'),
+    Input('table-vencidos', 'page_size'),
+    Input('table-vencidos', 'sort_by'),
+    Input('table-vencidos', 'filter_query')
 )
-def update_table_vencidos(clickData, start_date, end_date):
-    if start_date and end_date:
-        mask = (df_novo['Data do Pedido'] >= start_date) & (df_novo['Data do Pedido'] <= end_date)
-        filtered_df = df_novo.loc[mask].copy()
-    else:
-        filtered_df = df_novo.copy()
-    df_vencidos = filtrar_pedidos_vencidos(filtered_df)
-    def categorize_vencimento(x):
-        if x == 5:
-            return "5 dias"
-        elif 6 <= x <= 10:
-            return "6 a 10 dias"
-        elif 11 <= x < 30:
-            return "11 a 29 dias"
-        else:
-            return None
-    df_vencidos['FaixaVencimento'] = df_vencidos['DiasDesdePedido'].apply(categorize_vencimento)
-    if not df_vencidos.empty and clickData is not None:
-        faixa_clicada = clickData['points'][0]['x']
-        df_filtrado = df_vencidos[df_vencidos['FaixaVencimento'] == faixa_clicada].copy()
-        if not df_filtrado.empty:
-            df_filtrado['Data do Pedido'] = df_filtrado['Data do Pedido'].dt.strftime('%d/%m/%Y')
-        return df_filtrado.to_dict('records')
-    else:
-        return []
-    
+def update_table_vencidos(clickData, start_date, end_date, page_current, page_size, sort_by, filter_query):
+    df = None
+    if clickData is not None:
+        df = detalhes_vencidos(start_date, end_date, clickData['points'][0]['x'])
+    return _pagina_detalhes('table-vencidos', df, page_current, page_size, sort_by, filter_query)
+
+
 @app.callback(
     Output('table-devedores', 'data'),
-    [
-        Input('graph-evolucao', 'clickData'),
-        Input('date-picker-range', 'start_date'),
-        Input('date-picker-range', 'end_date')
-    ]
+    Output('table-devedores', 'page_count'),
+    Output('table-devedores', 'page_current'),
+    Input('graph-evolucao', 'clickData'),
+    Input('date-picker-range', 'start_date'),
+    Input('date-picker-range', 'end_date'),
+    Input('table-devedores', 'page_current'),
+    Input('table-devedores', 'page_size'),
+    Input('table-devedores', 'sort_by'),
+    Input('table-devedores', 'filter_query')
 )
-def update_table_devedores(clickData, start_date, end_date):
-    # Filtra os dados pelo período selecionado
-    if start_date and end_date:
-        mask = (df_novo['Data do Pedido'] >= start_date) & (df_novo['Data do Pedido'] <= end_date)
-        filtered_df = df_novo.loc[mask].copy()
-    else:
-        filtered_df = df_novo.copy()
-
-    # Filtra os boletos com status "Novo" (ainda não pagos) e com atraso > 5 dias
-    df_overdue = filtered_df[filtered_df['Status'] == 'Novo'].copy()
-    hoje_normalizado = pd.Timestamp.now().normalize()
-    df_overdue['DiasDesdePedido'] = (hoje_normalizado - df_overdue['Data do Pedido']).dt.days
-    df_overdue = df_overdue[df_overdue['DiasDesdePedido'] > 5].copy()
-
-    # Se houver clique no gráfico, filtra pelos boletos da empresa selecionada (eixo 'y')
+def update_table_devedores(clickData, start_date, end_date, page_current, page_size, sort_by, filter_query):
+    # Se houver clique no gráfico, mostra os boletos da empresa selecionada (empresa_id em customdata)
+    df = None
     if clickData is not None:
-        empresa_selecionada = clickData['points'][0]['y']
-        df_filtrado = df_overdue[df_overdue['Empresa'] == empresa_selecionada].copy()
-        if not df_filtrado.empty:
-            df_filtrado['Data do Pedido'] = df_filtrado['Data do Pedido'].dt.strftime('%d/%m/%Y')
-        return df_filtrado.to_dict('records')
-    else:
-        return []
-
+        df = detalhes_devedores(start_date, end_date, clickData['points'][0]['customdata'][0])
+    return _pagina_detalhes('table-devedores', df, page_current, page_size, sort_by, filter_query)
 
 
 @app.callback(
     Output("download-table-vencidos", "data"),  # Ação de download
     Input("btn-export-excel", "n_clicks"),      # Botão que dispara o download
-    State("table-vencidos", "data"),            # Pega os dados atuais da tabela
+    # A tabela só tem a página exibida: a exportação refaz a seleção inteira no servidor
+    State('graph-vencimento', 'clickData'),
+    State('date-picker-range', 'start_date'),
+    State('date-picker-range', 'end_date'),
+    State('table-vencidos', 'sort_by'),
+    State('table-vencidos', 'filter_query'),
     prevent_initial_call=True                   # Evita chamar sem ter clique
 )
-def export_table_vencidos(n_clicks, table_data):
-    if not n_clicks:
+def export_table_vencidos(n_clicks, clickData, start_date, end_date, sort_by, filter_query):
+    if not n_clicks or clickData is None:
         raise dash.exceptions.PreventUpdate
-    
-    # Converte a lista de dicionários em DataFrame
-    df = pd.DataFrame(table_data)
+
+    # Pedidos da faixa selecionada, com o mesmo filtro e ordenação da tabela
+    df = detalhes_vencidos(start_date, end_date, clickData['points'][0]['x'])
+    df = filtrar_ordenar_tabela(df, sort_by, filter_query).copy()
+    df['Data do Pedido'] = df['Data do Pedido'].dt.strftime(FORMATO_DATA_TABELA)
 
     # Retorna a ação de download
     return dcc.send_data_frame(
@@ -1,9 +1,10 @@
 from sqlalchemy import create_engine
 
-def get_engine():
+def get_engine(local_infile=False):
     """
     Retorna uma engine SQLAlchemy conectada ao MySQL.
     Altere user, password, host, db_name conforme seu ambiente.
+    Com local_infile=True o cliente permite LOAD DATA LOCAL INFILE (carga em massa).
     """
     user = "root"               # Usando root
     password = "password" # Coloque a senha do root aqui
@@ -11,7 +12,8 @@ def get_engine():
     db_name = "db_bilhetagem"    # Seu banco de dados
 
     engine_url = f"mysql+pymysql://{user}:{password}@{host}/{db_name}"
-    engine = create_engine(engine_url, echo=False)
+    connect_args = {"local_infile": True} if local_infile else {}
+    engine = create_engine(engine_url, echo=False, connect_args=connect_args)
     return engine
 
 
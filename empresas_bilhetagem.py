@@ -0,0 +1,190 @@
+"""
+Dimensão de empresas (tabela `empresas`): código, nome e se a empresa entra nas contas do dashboard.
+
+A ingestão mantém a tabela atualizada e grava em cada linha de pedidos_provider_v2 e
+boletos_pago_v3 o `empresa_id` (inteiro) da empresa. As empresas não contabilizáveis
+(antes uma lista fixa no código de tratamento) são excluídas na leitura, por join com esta tabela.
+
+Uso:
+    python empresas_bilhetagem.py listar [--nao-contabilizaveis]
+    python empresas_bilhetagem.py excluir 99999
+    python empresas_bilhetagem.py incluir 99999
+"""
+import argparse
+import threading
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from db_bilhetagem import get_engine
+from carga_bilhetagem import garantir_tabela_versao, incrementar_versao_dados
+
+TABELA_EMPRESAS = "empresas"
+
+# Empresas internas/de teste que não entram nas contas do dashboard (carga inicial da tabela).
+# Nome None: o nome vem do próprio relatório de pedidos.
+EMPRESAS_NAO_CONTABILIZAVEIS = {
+    77776: "INSTITUTO MUNICIPAL DE MOBILIDADE URBANA",
+    99999: "EMPRESA DE RECARGA",
+    3: "VENDAS PIXSINETRAM",
+    27717: "PROVIDER REDE DE  VENDAS RECARGA PAY",
+    99998: "CREDITE TRANSFER",
+    77777: "PORTAL ESCOLAR",
+    77778: "PORTAL COMUM",
+    28671: None,
+    142: None,
+    5823: None,
+    24023: None,
+}
+
+# Cache dos ids já resolvidos nesta execução (o relatório repete as mesmas empresas em todo lote)
+_ids_por_codigo = {}
+_ids_por_nome = {}
+_lock_ids = threading.Lock()
+
+
+def garantir_tabela_empresas(engine):
+    """Cria, se ainda não existir, a tabela de empresas."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_EMPRESAS} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                codigo INT NULL,
+                nome VARCHAR(255) NOT NULL,
+                contabilizavel TINYINT(1) NOT NULL DEFAULT 1,
+                UNIQUE KEY uk_empresas_codigo (codigo),
+                KEY ix_empresas_nome (nome)
+            )
+        """))
+
+
+def _registrar_por_codigo(conn, pares):
+    """
+    Insere as empresas (código, nome) ainda desconhecidas e atualiza o nome das conhecidas.
+    Uma empresa cadastrada antes só pelo nome (vinda dos boletos) recebe o código aqui.
+    """
+    for codigo, nome in pares:
+        existe = conn.execute(
+            text(f"SELECT COUNT(*) FROM {TABELA_EMPRESAS} WHERE codigo = :codigo"), {"codigo": codigo}
+        ).scalar()
+        if not existe:
+            conn.execute(text(f"""
+                UPDATE {TABELA_EMPRESAS} SET codigo = :codigo
+                WHERE codigo IS NULL AND nome = :nome
+                LIMIT 1
+            """), {"codigo": codigo, "nome": nome})
+        conn.execute(text(f"""
+            INSERT INTO {TABELA_EMPRESAS} (codigo, nome) VALUES (:codigo, :nome)
+            ON DUPLICATE KEY UPDATE {TABELA_EMPRESAS}.nome = VALUES(nome)
+        """), {"codigo": codigo, "nome": nome})
+
+
+def _registrar_por_nome(conn, nomes):
+    """Insere (sem código) as empresas cujo nome ainda não está na tabela."""
+    for nome in nomes:
+        conn.execute(text(f"""
+            INSERT INTO {TABELA_EMPRESAS} (nome)
+            SELECT :nome FROM DUAL
+            WHERE NOT EXISTS (SELECT 1 FROM {TABELA_EMPRESAS} WHERE nome = :nome)
+        """), {"nome": nome})
+
+
+def atribuir_empresa_id(engine, df, coluna_nome="Empresa", coluna_codigo=None):
+    """
+    Preenche df["empresa_id"] com o id da empresa de cada linha, cadastrando as empresas novas.
+    Com `coluna_codigo` (pedidos) a empresa é identificada pelo código; sem ela (boletos), pelo nome.
+    Retorna o próprio DataFrame.
+    """
+    if df.empty:
+        df["empresa_id"] = pd.Series(dtype="Int64")
+        return df
+
+    if coluna_codigo is not None:
+        codigos = pd.to_numeric(df[coluna_codigo], errors="coerce").astype("Int64")
+        pares = (
+            pd.DataFrame({"codigo": codigos, "nome": df[coluna_nome].astype(str).str.strip()})
+            .dropna(subset=["codigo"])
+            .drop_duplicates(subset=["codigo"], keep="last")
+        )
+        with _lock_ids:
+            novos = [(int(c), n) for c, n in zip(pares["codigo"], pares["nome"]) if int(c) not in _ids_por_codigo]
+            if novos:
+                with engine.begin() as conn:
+                    _registrar_por_codigo(conn, novos)
+                    ids = conn.execute(
+                        text(f"SELECT codigo, id FROM {TABELA_EMPRESAS} WHERE codigo IN :codigos")
+                        .bindparams(bindparam("codigos", expanding=True)),
+                        {"codigos": [c for c, _ in novos]},
+                    )
+                    _ids_por_codigo.update(dict(ids.fetchall()))
+            mapa = dict(_ids_por_codigo)
+        df["empresa_id"] = codigos.map(mapa).astype("Int64")
+        return df
+
+    nomes = df[coluna_nome].astype(str).str.strip()
+    with _lock_ids:
+        novos = [n for n in nomes.dropna().unique() if n not in _ids_por_nome]
+        if novos:
+            with engine.begin() as conn:
+                _registrar_por_nome(conn, novos)
+                ids = conn.execute(
+                    text(f"SELECT nome, MIN(id) FROM {TABELA_EMPRESAS} WHERE nome IN :nomes GROUP BY nome")
+                    .bindparams(bindparam("nomes", expanding=True)),
+                    {"nomes": novos},
+                )
+                _ids_por_nome.update(dict(ids.fetchall()))
+        mapa = dict(_ids_por_nome)
+    df["empresa_id"] = nomes.map(mapa).astype("Int64")
+    return df
+
+
+def nomes_empresas(engine):
+    """Retorna {empresa_id: nome} de todas as empresas."""
+    with engine.connect() as conn:
+        return dict(conn.execute(text(f"SELECT id, nome FROM {TABELA_EMPRESAS}")).fetchall())
+
+
+def definir_contabilizavel(engine, codigo, contabilizavel):
+    """
+    Marca a empresa (pelo código) como contabilizável ou não. Retorna se a empresa existe.
+    Os gráficos mudam, então a versão dos dados é incrementada.
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(f"UPDATE {TABELA_EMPRESAS} SET contabilizavel = :flag WHERE codigo = :codigo"),
+            {"flag": int(contabilizavel), "codigo": codigo},
+        )
+    garantir_tabela_versao(engine)
+    incrementar_versao_dados(engine)
+    # O dialeto MySQL do SQLAlchemy conta as linhas encontradas, mesmo sem alteração
+    return result.rowcount > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta e altera a tabela de empresas.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    listar = sub.add_parser("listar", help="Lista as empresas cadastradas.")
+    listar.add_argument("--nao-contabilizaveis", action="store_true", help="Só as excluídas do dashboard.")
+    for comando, ajuda in (("excluir", "Tira a empresa das contas do dashboard."),
+                           ("incluir", "Volta a considerar a empresa no dashboard.")):
+        sub.add_parser(comando, help=ajuda).add_argument("codigo", type=int, help="Código da empresa.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.comando == "listar":
+        query = f"SELECT id, codigo, nome, contabilizavel FROM {TABELA_EMPRESAS}"
+        if args.nao_contabilizaveis:
+            query += " WHERE contabilizavel = 0"
+        print(pd.read_sql(query + " ORDER BY nome", engine).to_string(index=False))
+        return
+
+    contabilizavel = args.comando == "incluir"
+    if definir_contabilizavel(engine, args.codigo, contabilizavel):
+        estado = "contabilizável" if contabilizavel else "não contabilizável"
+        print(f"✅ Empresa {args.codigo} agora é {estado}.")
+    else:
+        print(f"❌ Empresa {args.codigo} não encontrada.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Servidor local que imita o VTAdmin, para testar e medir vtadmin_http.py sem acesso ao servidor real.
+
+Atende apenas às páginas usadas pelo exportador HTTP:
+  - /Login_Async.aspx                  → devolve o cookie de sessão;
+  - /Reports/wfm_ReportFilter.aspx     → formulário com ViewState (GET) e início do relatório (POST);
+  - /Reports/ShowReport.aspx           → página "processando" até o relatório ficar pronto (GET)
+                                         e exportação do CSV (POST com printMode = CSV).
+
+Os CSVs gerados seguem o mesmo layout dos relatórios reais que tratar_relatorios_envioDB.py espera
+(colunas de cabeçalho repetidas em cada linha, "Empresa: ..." e valores "R$ 1.234,56").
+
+Uso:
+    python fake_vtadmin.py --porta 8765 --linhas 100000
+    python fake_vtadmin.py --benchmark --linhas 100000
+"""
+import os
+import csv
+import io
+import json
+import time
+import uuid
+import random
+import argparse
+import datetime
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from config_vtadmin import FILTROS_RELATORIOS
+
+PORTA_PADRAO = 8765
+LINHAS_PADRAO = 1000
+# Tempo (s) que o "servidor" leva para gerar o relatório depois do POST do filtro
+ATRASO_PADRAO = 0.5
+
+EMPRESAS = [
+    (101, "VIACAO AMAZONAS LTDA"), (102, "TRANSPORTES MANAUS S/A"), (103, "EXPRESSO NORTE"),
+    (104, "COMERCIAL RIO NEGRO"), (105, "INDUSTRIA ZONA FRANCA"), (99999, "EMPRESA TESTE"),
+]
+BANCOS = ["BANCO DO BRASIL", "BRADESCO", "CAIXA", "ITAU"]
+
+ESTADO_CRYSTAL = {"common": {"printMode": "PDF", "reportSourceSessionID": ""}}
+
+
+def valor_br(valor):
+    """Formata um número como "R$ 1.234,56"."""
+    texto = f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {texto}"
+
+
+def _datas_periodo(data_inicial, data_final):
+    inicio = datetime.datetime.strptime(data_inicial, "%d/%m/%Y").date()
+    fim = datetime.datetime.strptime(data_final, "%d/%m/%Y").date()
+    return inicio, max((fim - inicio).days, 0)
+
+
+def linhas_pedidos(data_inicial, data_final, linhas, semente=0):
+    """
+    Gera as linhas do relatório 'Pedidos Provider - V2': 7 colunas de cabeçalho,
+    "Empresa: X", 10 colunas de detalhe (a segunda é o código), os 5 campos do pedido
+    e 3 colunas de totalizador no final.
+    """
+    rnd = random.Random(semente)
+    inicio, dias = _datas_periodo(data_inicial, data_final)
+    cabecalho = ["PROVIDER ORDERS V2", data_inicial, data_final, "VTAdmin", "Pag. 1", "Manaus", "SNTR"]
+    for i in range(linhas):
+        codigo, nome = rnd.choice(EMPRESAS)
+        data = inicio + datetime.timedelta(days=rnd.randint(0, dias))
+        valor = rnd.randint(1000, 500000) / 100
+        detalhe = ["Código", codigo, "CNPJ", "-", f"{rnd.randint(10**13, 10**14 - 1)}",
+                   "Contato", "x", "Tel.", "(92) 3000-0000", "-"]
+        pedido = [f"{900000 + i}", data.strftime("%d/%m/%Y"), valor_br(valor * 0.02),
+                  valor_br(valor), rnd.choice(["Pago", "Pendente", "Cancelado"])]
+        yield cabecalho + [f"Empresa: {nome}"] + detalhe + pedido + ["Total", valor_br(valor), "1"]
+
+
+def linhas_boletos(data_inicial, data_final, linhas, semente=0):
+    """
+    Gera as linhas do relatório 'Boletos Pago (por data de pagamento - V3)': 20 colunas iniciais
+    (índice 9 = Banco, índice 11 = Empresa), os 8 campos do boleto e 2 colunas de totalizador.
+
+    A última linha é o totalizador, como no relatório real: uma coluna a menos a partir da
+    coluna 11 (índice 10), sem números de pedido e de boleto (ver _ajustar_ultima_linha_boletos).
+    É ela que faz o pandas ler esses números como float no último lote do arquivo.
+    """
+    rnd = random.Random(semente)
+    inicio, dias = _datas_periodo(data_inicial, data_final)
+    total = 0
+    for i in range(linhas):
+        _, nome = rnd.choice(EMPRESAS)
+        pagamento = inicio + datetime.timedelta(days=rnd.randint(0, dias))
+        emissao = pagamento - datetime.timedelta(days=rnd.randint(0, 10))
+        valor = rnd.randint(1000, 500000) / 100
+        total += valor
+        iniciais = ["BILLETS V3", data_inicial, data_final, "VTAdmin", "Pag. 1", "Manaus",
+                    "SNTR", "Banco:", "-", rnd.choice(BANCOS), "Empresa:", nome,
+                    "-", "-", "-", "-", "-", "-", "-", "-"]
+        boleto = [emissao.strftime("%d/%m/%Y"), pagamento.strftime("%d/%m/%Y"),
+                  pagamento.strftime("%d/%m/%Y"), pagamento.strftime("%d/%m/%Y"),
+                  f"{rnd.randint(10**9, 10**10 - 1)}", f"{900000 + i}",
+                  valor_br(valor), valor_br(valor)]
+        yield iniciais + boleto + ["Total", valor_br(valor)]
+    iniciais = ["BILLETS V3", data_inicial, data_final, "VTAdmin", "Pag. 1", "Manaus",
+                "SNTR", "Banco:", "-", "-", "Total Geral", "-", "-", "-", "-", "-", "-", "-", "-"]
+    yield iniciais + ["", "", "", "", "", "", valor_br(total), valor_br(total)] + ["Total", valor_br(total)]
+
+
+GERADORES = {"ProviderOrders_v2.rpt": linhas_pedidos, "BilletsReport_V3.rpt": linhas_boletos}
+
+
+def _pagina(campos_ocultos, corpo=""):
+    inputs = "\n".join(
+        f'<input type="hidden" name="{nome}" id="{nome}" value="{valor}" />'
+        for nome, valor in campos_ocultos.items()
+    )
+    return f"<html><body><form method=\"post\">{inputs}{corpo}</form></body></html>".encode("utf-8")
+
+
+class VTAdminFalso(BaseHTTPRequestHandler):
+    """Trata as requisições; o estado das sessões fica em self.server.sessoes."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Silencia o log de cada requisição
+
+    def _sessao(self):
+        cookie = self.headers.get("Cookie", "")
+        for parte in cookie.split(";"):
+            nome, _, valor = parte.strip().partition("=")
+            if nome == "ASP.NET_SessionId":
+                return self.server.sessoes.get(valor)
+        return None
+
+    def _form(self):
+        tamanho = int(self.headers.get("Content-Length", 0))
+        dados = parse_qs(self.rfile.read(tamanho).decode("utf-8"), keep_blank_values=True)
+        return {k: v[0] for k, v in dados.items()}
+
+    def _responder(self, corpo, status=200, tipo="text/html; charset=utf-8", extras=None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (extras or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/Login_Async.aspx":
+            params = parse_qs(url.query)
+            if not params.get("usr") or not params.get("pass"):
+                return self._responder(b"erro", status=401)
+            id_sessao = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.sessoes[id_sessao] = {}
+            return self._responder(b"OK", extras={"Set-Cookie": f"ASP.NET_SessionId={id_sessao}; path=/"})
+
+        sessao = self._sessao()
+        if sessao is None:
+            return self._responder(b"<html><input id=\"txtLogin\"></html>")
+
+        if url.path == "/Reports/wfm_ReportFilter.aspx":
+            return self._responder(_pagina({"__VIEWSTATE": "filtro", "__VIEWSTATEGENERATOR": "F1"}))
+
+        if url.path == "/Reports/ShowReport.aspx":
+            relatorio = sessao.get("relatorio")
+            if relatorio is None or time.monotonic() < relatorio["pronto_em"]:
+                return self._responder(_pagina({"__VIEWSTATE": "processando"}, "Processando..."))
+            estado = json.dumps(ESTADO_CRYSTAL).replace("\"", "'")
+            return self._responder(_pagina({
+                "__VIEWSTATE": "relatorio", "__VIEWSTATEGENERATOR": "R1",
+                "__CRYSTALSTATECrystalReportViewer1": estado,
+            }))
+        self._responder(b"nao encontrado", status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        sessao = self._sessao()
+        if sessao is None:
+            return self._responder(b"<html><input id=\"txtLogin\"></html>")
+        form = self._form()
+
+        if url.path == "/Reports/wfm_ReportFilter.aspx":
+            rpt = form.get("ddListOpt")
+            filtro = next((f for f in FILTROS_RELATORIOS.values() if f["rpt"] == rpt), None)
+            if filtro is None:
+                return self._responder(b"relatorio invalido", status=400)
+            sessao["relatorio"] = {
+                "rpt": rpt,
+                "inicio": form.get(filtro["inicio"]),
+                "fim": form.get(filtro["fim"]),
+                "pronto_em": time.monotonic() + self.server.atraso,
+            }
+            return self._responder(_pagina({"__VIEWSTATE": "filtro"}, "OK"))
+
+        if url.path == "/Reports/ShowReport.aspx":
+            relatorio = sessao.get("relatorio")
+            estado = form.get("__CRYSTALSTATECrystalReportViewer1", "")
+            if relatorio is None or "CharacterSeparatedValues" not in estado:
+                return self._responder(_pagina({"__VIEWSTATE": "relatorio"}, "Exportação inválida"))
+            return self._exportar_csv(relatorio)
+        self._responder(b"nao encontrado", status=404)
+
+    def _exportar_csv(self, relatorio):
+        """Envia o CSV em chunked transfer encoding, gerando as linhas sob demanda."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.ms-excel")
+        self.send_header("Content-Disposition", f"attachment; filename={relatorio['rpt'].replace('.rpt', '.csv')}")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, lineterminator="\r\n")
+        gerador = GERADORES[relatorio["rpt"]]
+        for i, linha in enumerate(gerador(relatorio["inicio"], relatorio["fim"], self.server.linhas), 1):
+            escritor.writerow(linha)
+            if i % 5000 == 0:
+                self._enviar_bloco(buffer.getvalue().encode("windows-1252"))
+                buffer.seek(0)
+                buffer.truncate()
+        self._enviar_bloco(buffer.getvalue().encode("windows-1252"))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _enviar_bloco(self, dados):
+        if dados:
+            self.wfile.write(f"{len(dados):X}\r\n".encode("ascii") + dados + b"\r\n")
+
+
+def criar_servidor(porta=PORTA_PADRAO, linhas=LINHAS_PADRAO, atraso=ATRASO_PADRAO):
+    """Cria o servidor falso (porta 0 = porta livre qualquer). Use servidor.server_address para a porta."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), VTAdminFalso)
+    servidor.daemon_threads = True
+    servidor.sessoes = {}
+    servidor.lock = threading.Lock()
+    servidor.linhas = linhas
+    servidor.atraso = atraso
+    return servidor
+
+
+def iniciar_em_segundo_plano(porta=0, linhas=LINHAS_PADRAO, atraso=ATRASO_PADRAO):
+    """Sobe o servidor em uma thread e retorna (servidor, url_base)."""
+    servidor = criar_servidor(porta, linhas, atraso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    host, porta = servidor.server_address
+    return servidor, f"http://{host}:{porta}"
+
+
+def benchmark(linhas, atraso, data_inicial="01/03/2025", data_final="25/03/2025"):
+    """
+    Baixa os dois relatórios do servidor falso com vtadmin_http e trata os CSVs com
+    tratar_relatorios_envioDB, medindo o tempo de cada etapa.
+    """
+    import vtadmin_http
+    from tratar_relatorios_envioDB import tratar_pedidos_provider_v2, tratar_boletos_pago_v3
+
+    servidor, url_base = iniciar_em_segundo_plano(linhas=linhas, atraso=atraso)
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            inicio = time.perf_counter()
+            arquivos = vtadmin_http.main(data_inicial, data_final, pasta_download=pasta, url_base=url_base)
+            segundos_download = time.perf_counter() - inicio
+            tamanho = sum(os.path.getsize(a) for a in arquivos)
+
+            inicio = time.perf_counter()
+            pedidos = tratar_pedidos_provider_v2(pasta)
+            boletos = tratar_boletos_pago_v3(pasta)
+            segundos_tratamento = time.perf_counter() - inicio
+    finally:
+        servidor.shutdown()
+
+    print(f"⏱️ Download HTTP: {segundos_download:.2f}s para {tamanho / 1024 / 1024:.1f} MB "
+          f"(atraso simulado de {atraso}s por relatório).")
+    print(f"⏱️ Tratamento: {segundos_tratamento:.2f}s "
+          f"({sum(len(df) for df in pedidos)} pedidos, {sum(len(df) for df in boletos)} boletos).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VTAdmin falso para testes do exportador HTTP.")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--linhas", type=int, default=LINHAS_PADRAO, help="Linhas por relatório gerado.")
+    parser.add_argument("--atraso", type=float, default=ATRASO_PADRAO,
+                        help="Segundos até o relatório ficar pronto depois do filtro.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Sobe o servidor, baixa e trata os dois relatórios e mostra os tempos.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.linhas, args.atraso)
+        return
+
+    servidor = criar_servidor(args.porta, args.linhas, args.atraso)
+    print(f"✅ VTAdmin falso em http://127.0.0.1:{args.porta} (Ctrl+C para parar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
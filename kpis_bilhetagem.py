@@ -0,0 +1,179 @@
+"""
+Tabelas de indicadores mensais pré-agregados (por mês e empresa), mantidas pela ingestão.
+
+  - kpi_pedidos_mes: pedidos emitidos e pagos por mês da 'Data do Pedido' (taxa de conversão).
+    Pedidos ainda em 'Novo' que já têm boleto não entram (são os pedidos já pagos que o
+    dashboard também descarta na leitura, ver dados_bilhetagem.carregar_pedidos).
+  - kpi_boletos_mes: quantidade, valor e dias até o pagamento dos boletos por mês do 'Pagamento'
+    (vales pagos, empresas que pagaram, ticket médio, tempo médio e faixas de pagamento).
+
+As linhas são por (mês, empresa) para que a exclusão das empresas não contabilizáveis e a
+contagem de empresas distintas continuem sendo feitas na leitura. Boletos/pedidos sem empresa
+ficam com empresa_id = 0. A cada lote carregado, os meses tocados pelo lote são recalculados.
+
+Uso:
+    python kpis_bilhetagem.py  # recalcula todos os meses
+"""
+import datetime
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from db_bilhetagem import get_engine
+from carga_bilhetagem import publicar_nova_versao
+from reconciliacao_bilhetagem import normalizar_numeros, NUMEROS_POR_COMANDO
+
+TABELA_KPI_PEDIDOS = "kpi_pedidos_mes"
+TABELA_KPI_BOLETOS = "kpi_boletos_mes"
+
+_SELECT_KPI_PEDIDOS = """
+    SELECT DATE_FORMAT(p.`Data do Pedido`, '%Y-%m-01') AS mes,
+           COALESCE(p.empresa_id, 0) AS empresa_id,
+           COUNT(*) AS emitidos,
+           SUM(p.`Status` IN ('Pago', 'Pago e Liberado')) AS pagos
+    FROM pedidos_provider_v2 AS p
+    WHERE p.`Data do Pedido` IS NOT NULL
+      AND NOT (COALESCE(p.`Status`, '') = 'Novo'
+               AND EXISTS (SELECT 1 FROM boletos_pago_v3 AS b WHERE b.`Número Pedido` = p.`Nº Pedido`))
+      {filtro}
+    GROUP BY mes, COALESCE(p.empresa_id, 0)
+"""
+# Faixas de dias entre emissão e pagamento: até 5, de 6 a 10 e mais de 10 dias
+_DIAS = "DATEDIFF(b.`Pagamento`, b.`Emissão`)"
+_SELECT_KPI_BOLETOS = f"""
+    SELECT DATE_FORMAT(b.`Pagamento`, '%Y-%m-01') AS mes,
+           COALESCE(b.empresa_id, 0) AS empresa_id,
+           COUNT(*) AS boletos,
+           COUNT(b.`Valor`) AS boletos_com_valor,
+           COALESCE(SUM(b.`Valor`), 0) AS valor,
+           COUNT(b.`Emissão`) AS boletos_com_emissao,
+           COALESCE(SUM({_DIAS}), 0) AS soma_dias,
+           COALESCE(SUM({_DIAS} <= 5), 0) AS qtd_ate_5,
+           COALESCE(SUM({_DIAS} BETWEEN 6 AND 10), 0) AS qtd_6_a_10,
+           COALESCE(SUM({_DIAS} > 10), 0) AS qtd_mais_10,
+           COALESCE(SUM(CASE WHEN {_DIAS} <= 5 THEN b.`Valor` END), 0) AS valor_ate_5,
+           COALESCE(SUM(CASE WHEN {_DIAS} BETWEEN 6 AND 10 THEN b.`Valor` END), 0) AS valor_6_a_10,
+           COALESCE(SUM(CASE WHEN {_DIAS} > 10 THEN b.`Valor` END), 0) AS valor_mais_10
+    FROM boletos_pago_v3 AS b
+    WHERE b.`Pagamento` IS NOT NULL
+      {{filtro}}
+    GROUP BY mes, COALESCE(b.empresa_id, 0)
+"""
+_COLUNAS_KPI_PEDIDOS = "mes, empresa_id, emitidos, pagos"
+_COLUNAS_KPI_BOLETOS = (
+    "mes, empresa_id, boletos, boletos_com_valor, valor, boletos_com_emissao, soma_dias, "
+    "qtd_ate_5, qtd_6_a_10, qtd_mais_10, valor_ate_5, valor_6_a_10, valor_mais_10"
+)
+
+
+def garantir_tabelas_kpi(engine):
+    """Cria, se ainda não existirem, as tabelas de indicadores mensais."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_KPI_PEDIDOS} (
+                mes DATE NOT NULL,
+                empresa_id INT NOT NULL DEFAULT 0,
+                emitidos INT NOT NULL DEFAULT 0,
+                pagos INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (mes, empresa_id)
+            )
+        """))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_KPI_BOLETOS} (
+                mes DATE NOT NULL,
+                empresa_id INT NOT NULL DEFAULT 0,
+                boletos INT NOT NULL DEFAULT 0,
+                boletos_com_valor INT NOT NULL DEFAULT 0,
+                valor DECIMAL(16, 2) NOT NULL DEFAULT 0,
+                boletos_com_emissao INT NOT NULL DEFAULT 0,
+                soma_dias BIGINT NOT NULL DEFAULT 0,
+                qtd_ate_5 INT NOT NULL DEFAULT 0,
+                qtd_6_a_10 INT NOT NULL DEFAULT 0,
+                qtd_mais_10 INT NOT NULL DEFAULT 0,
+                valor_ate_5 DECIMAL(16, 2) NOT NULL DEFAULT 0,
+                valor_6_a_10 DECIMAL(16, 2) NOT NULL DEFAULT 0,
+                valor_mais_10 DECIMAL(16, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (mes, empresa_id)
+            )
+        """))
+
+
+def inicio_do_mes(data):
+    """Primeiro dia do mês da data (datetime.date)."""
+    return pd.Timestamp(data).date().replace(day=1)
+
+
+def proximo_mes(mes):
+    """Primeiro dia do mês seguinte."""
+    return (mes.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def meses_de(datas):
+    """Conjunto dos meses (primeiro dia) das datas informadas, ignorando as vazias."""
+    return {inicio_do_mes(data) for data in pd.to_datetime(pd.Series(datas), errors="coerce").dropna()}
+
+
+def _recalcular_meses(engine, tabela, colunas, select, coluna_data, meses):
+    """Apaga e recalcula, mês a mês, as linhas de `meses` da tabela de indicadores."""
+    for mes in sorted(meses):
+        filtro = f"AND {coluna_data} >= :inicio AND {coluna_data} < :fim"
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {tabela} WHERE mes = :mes"), {"mes": mes})
+            conn.execute(
+                text(f"INSERT INTO {tabela} ({colunas}) {select.format(filtro=filtro)}"),
+                {"inicio": mes, "fim": proximo_mes(mes)},
+            )
+
+
+def atualizar_kpis_pedidos(engine, meses):
+    """Recalcula kpi_pedidos_mes nos meses informados."""
+    _recalcular_meses(
+        engine, TABELA_KPI_PEDIDOS, _COLUNAS_KPI_PEDIDOS, _SELECT_KPI_PEDIDOS, "p.`Data do Pedido`", meses
+    )
+
+
+def atualizar_kpis_boletos(engine, meses):
+    """Recalcula kpi_boletos_mes nos meses informados."""
+    _recalcular_meses(
+        engine, TABELA_KPI_BOLETOS, _COLUNAS_KPI_BOLETOS, _SELECT_KPI_BOLETOS, "b.`Pagamento`", meses
+    )
+
+
+def meses_pedidos_novos(engine, numeros):
+    """
+    Meses (da 'Data do Pedido') dos pedidos em 'Novo' entre os números informados.
+    Um boleto novo para um desses pedidos o tira da contagem de emitidos do mês dele.
+    """
+    numeros = normalizar_numeros(numeros)
+    meses = set()
+    for i in range(0, len(numeros), NUMEROS_POR_COMANDO):
+        with engine.connect() as conn:
+            datas = conn.execute(
+                text("""
+                    SELECT DISTINCT `Data do Pedido` FROM pedidos_provider_v2
+                    WHERE `Nº Pedido` IN :numeros AND `Status` = 'Novo'
+                """).bindparams(bindparam("numeros", expanding=True)),
+                {"numeros": numeros[i:i + NUMEROS_POR_COMANDO]},
+            )
+            meses |= meses_de([linha[0] for linha in datas])
+    return meses
+
+
+def reconstruir_kpis(engine):
+    """Recalcula as duas tabelas de indicadores inteiras e publica com RENAME TABLE."""
+    garantir_tabelas_kpi(engine)
+    for tabela, colunas, select in (
+        (TABELA_KPI_PEDIDOS, _COLUNAS_KPI_PEDIDOS, _SELECT_KPI_PEDIDOS),
+        (TABELA_KPI_BOLETOS, _COLUNAS_KPI_BOLETOS, _SELECT_KPI_BOLETOS),
+    ):
+        linhas = publicar_nova_versao(
+            engine, tabela,
+            lambda conn, nova: conn.execute(
+                text(f"INSERT INTO {nova} ({colunas}) {select.format(filtro='')}")
+            ).rowcount
+        )
+        print(f"✅ {tabela} recalculada: {linhas} linhas (mês x empresa).")
+
+
+if __name__ == "__main__":
+    reconstruir_kpis(get_engine())
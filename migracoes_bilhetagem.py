@@ -0,0 +1,418 @@
+"""
+Migrações pontuais do banco db_bilhetagem.
+
+Uso:
+    python migracoes_bilhetagem.py tipos
+    python migracoes_bilhetagem.py chave_pedidos
+    python migracoes_bilhetagem.py hash_boletos
+    python migracoes_bilhetagem.py empresas
+    python migracoes_bilhetagem.py pedido_pagamento
+    python migracoes_bilhetagem.py kpis
+    python migracoes_bilhetagem.py indices
+    python migracoes_bilhetagem.py versao_dados
+    python migracoes_bilhetagem.py atualizado_em
+    python migracoes_bilhetagem.py cobertura
+    python migracoes_bilhetagem.py identificadores
+"""
+import argparse
+
+import pandas as pd
+from sqlalchemy import text
+
+from db_bilhetagem import get_engine
+from carga_bilhetagem import (
+    COLUNAS_HASH_BOLETOS, calcular_hash_linhas, inserir_novos_por_hash, garantir_tabela_versao,
+    incrementar_versao_dados
+)
+from empresas_bilhetagem import TABELA_EMPRESAS, EMPRESAS_NAO_CONTABILIZAVEIS, garantir_tabela_empresas
+from reconciliacao_bilhetagem import reconstruir_pedido_pagamento
+from kpis_bilhetagem import reconstruir_kpis
+from planejador_bilhetagem import semear_cobertura
+
+# Colunas que deixam de ser texto ("25/03/2025", "R$ 1.234,56") e passam a ter tipo nativo
+COLUNAS_DATA = {
+    "pedidos_provider_v2": ["Data do Pedido"],
+    "boletos_pago_v3": ["Emissão", "Pagamento"],
+}
+COLUNAS_VALOR = {
+    "pedidos_provider_v2": ["Valor Crédito"],
+    "boletos_pago_v3": ["Valor"],
+}
+# Índices das consultas por período do dashboard e da ingestão (colunas TEXT viram VARCHAR antes)
+COLUNAS_VARCHAR = {
+    "pedidos_provider_v2": {"Status": 64},
+    "boletos_pago_v3": {"Número Pedido": 32},
+}
+INDICES = {
+    "pedidos_provider_v2": {
+        "ix_pedidos_data": "`Data do Pedido`",
+        "ix_pedidos_status_data": "`Status`, `Data do Pedido`",
+    },
+    "boletos_pago_v3": {
+        "ix_boletos_pagamento": "`Pagamento`",
+        "ix_boletos_numero_pedido": "`Número Pedido`",
+    },
+}
+# Marca de quando cada linha entrou ou mudou, lida pela atualização incremental do dashboard
+COLUNAS_ATUALIZACAO = {
+    "pedidos_provider_v2": (
+        "atualizado_em", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+    ),
+    "boletos_pago_v3": ("carregado_em", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"),
+}
+# Identificadores gravados como "900018.0" pela carga LOAD DATA antes da conversão no tratamento
+COLUNAS_IDENTIFICADOR = {
+    "pedidos_provider_v2": ["Nº Pedido"],
+    "boletos_pago_v3": ["Número Pedido", "Nosso Número"],
+}
+
+
+def tipo_coluna(conn, tabela, coluna):
+    """Retorna o DATA_TYPE atual da coluna (ex.: 'text', 'date', 'decimal')."""
+    query = """
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabela AND COLUMN_NAME = :coluna
+    """
+    return conn.execute(text(query), {"tabela": tabela, "coluna": coluna}).scalar()
+
+
+def migrar_coluna_data(conn, tabela, coluna):
+    """
+    Converte em place uma coluna de texto "dd/mm/yyyy" para DATE.
+    Primeiro reescreve o texto em ISO ("yyyy-mm-dd"), anula o que não for data e depois altera o tipo.
+    """
+    if tipo_coluna(conn, tabela, coluna) == "date":
+        print(f"✅ {tabela}.`{coluna}` já é DATE.")
+        return
+    print(f"🔧 Convertendo {tabela}.`{coluna}` para DATE...")
+    result = conn.execute(text(f"""
+        UPDATE {tabela}
+        SET `{coluna}` = DATE_FORMAT(STR_TO_DATE(TRIM(`{coluna}`), '%d/%m/%Y'), '%Y-%m-%d')
+        WHERE TRIM(`{coluna}`) REGEXP '^[0-9]{{2}}/[0-9]{{2}}/[0-9]{{4}}$'
+    """))
+    print(f"   Linhas convertidas: {result.rowcount}")
+    result = conn.execute(text(f"""
+        UPDATE {tabela}
+        SET `{coluna}` = NULL
+        WHERE `{coluna}` NOT REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$'
+    """))
+    print(f"   Linhas inválidas anuladas: {result.rowcount}")
+    conn.execute(text(f"ALTER TABLE {tabela} MODIFY `{coluna}` DATE NULL"))
+    print(f"✅ {tabela}.`{coluna}` agora é DATE.")
+
+
+def migrar_coluna_valor(conn, tabela, coluna):
+    """
+    Converte em place uma coluna de texto "R$ 1.234,56" para DECIMAL(14,2).
+    """
+    if tipo_coluna(conn, tabela, coluna) == "decimal":
+        print(f"✅ {tabela}.`{coluna}` já é DECIMAL.")
+        return
+    print(f"🔧 Convertendo {tabela}.`{coluna}` para DECIMAL(14,2)...")
+    result = conn.execute(text(f"""
+        UPDATE {tabela}
+        SET `{coluna}` = REPLACE(REPLACE(TRIM(REPLACE(REPLACE(`{coluna}`, 'R$', ''), UNHEX('C2A0'), '')), '.', ''), ',', '.')
+        WHERE `{coluna}` LIKE '%,%' OR `{coluna}` LIKE 'R$%'
+    """))
+    print(f"   Linhas convertidas: {result.rowcount}")
+    result = conn.execute(text(f"""
+        UPDATE {tabela}
+        SET `{coluna}` = NULL
+        WHERE `{coluna}` NOT REGEXP '^-?[0-9]+(\\\\.[0-9]+)?$'
+    """))
+    print(f"   Linhas inválidas anuladas: {result.rowcount}")
+    conn.execute(text(f"ALTER TABLE {tabela} MODIFY `{coluna}` DECIMAL(14,2) NULL"))
+    print(f"✅ {tabela}.`{coluna}` agora é DECIMAL(14,2).")
+
+
+def migrar_tipos(engine):
+    """
+    Converte as colunas de data e valor de pedidos_provider_v2 e boletos_pago_v3
+    de texto para DATE/DECIMAL, mantendo os registros existentes.
+    """
+    for tabela, colunas in COLUNAS_DATA.items():
+        for coluna in colunas:
+            with engine.begin() as conn:
+                migrar_coluna_data(conn, tabela, coluna)
+    for tabela, colunas in COLUNAS_VALOR.items():
+        for coluna in colunas:
+            with engine.begin() as conn:
+                migrar_coluna_valor(conn, tabela, coluna)
+
+
+def indice_existe(conn, tabela, indice):
+    """Verifica se o índice já existe na tabela."""
+    query = """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabela AND INDEX_NAME = :indice
+    """
+    return conn.execute(text(query), {"tabela": tabela, "indice": indice}).scalar() > 0
+
+
+def criar_indice(conn, tabela, indice, colunas):
+    """Cria o índice (não único) se ainda não existir."""
+    if indice_existe(conn, tabela, indice):
+        print(f"✅ Índice {indice} já existe em {tabela}.")
+        return
+    conn.execute(text(f"ALTER TABLE {tabela} ADD KEY {indice} ({colunas})"))
+    print(f"✅ Índice {indice} criado em {tabela}.")
+
+
+def migrar_coluna_varchar(conn, tabela, coluna, tamanho):
+    """Converte uma coluna de texto para VARCHAR(tamanho), para poder ser indexada sem prefixo."""
+    if tipo_coluna(conn, tabela, coluna) != "varchar":
+        conn.execute(text(f"ALTER TABLE {tabela} MODIFY `{coluna}` VARCHAR({tamanho}) NULL"))
+        print(f"✅ {tabela}.`{coluna}` agora é VARCHAR({tamanho}).")
+
+
+def migrar_chave_pedidos(engine, tabela="pedidos_provider_v2", pk="id"):
+    """
+    Prepara pedidos_provider_v2 para a carga por upsert:
+      1. Remove os duplicados de 'Nº Pedido' existentes, mantendo o registro de maior {pk} (mais recente).
+      2. Garante que 'Nº Pedido' seja VARCHAR (colunas TEXT não aceitam índice único sem prefixo).
+      3. Cria o índice único uk_num_pedido em 'Nº Pedido'.
+    """
+    with engine.begin() as conn:
+        if indice_existe(conn, tabela, "uk_num_pedido"):
+            print(f"✅ Índice uk_num_pedido já existe em {tabela}.")
+            return
+
+        print(f"🧹 Removendo duplicados de 'Nº Pedido' em {tabela}, mantendo o maior {pk}...")
+        result = conn.execute(text(f"""
+            DELETE t FROM {tabela} AS t
+            JOIN {tabela} AS t2
+              ON t2.`Nº Pedido` = t.`Nº Pedido` AND t2.{pk} > t.{pk}
+        """))
+        print(f"   Registros removidos: {result.rowcount}")
+
+    with engine.begin() as conn:
+        if tipo_coluna(conn, tabela, "Nº Pedido") in ("text", "mediumtext", "longtext"):
+            conn.execute(text(f"ALTER TABLE {tabela} MODIFY `Nº Pedido` VARCHAR(32) NULL"))
+            print(f"✅ {tabela}.`Nº Pedido` agora é VARCHAR(32).")
+        conn.execute(text(f"ALTER TABLE {tabela} ADD UNIQUE KEY uk_num_pedido (`Nº Pedido`)"))
+        print(f"✅ Índice único uk_num_pedido criado em {tabela}.")
+
+
+def migrar_hash_boletos(engine, tabela="boletos_pago_v3", tamanho_lote=50000):
+    """
+    Acrescenta a coluna 'hash_linha' com índice único em boletos_pago_v3.
+
+    A tabela é reconstruída em uma cópia (tabela_novo) lida em lotes: o hash de cada linha é
+    calculado em Python com a mesma função usada em tratar_boletos_pago_v3 e os duplicados
+    são descartados pelo próprio índice. Ao final as tabelas são trocadas com RENAME TABLE
+    e a versão anterior fica guardada como tabela_antigo.
+
+    Exige a migração `tipos` já aplicada: o hash da ingestão é calculado sobre datas e valores
+    já convertidos, e linhas com datas/valores em texto gerariam hashes diferentes para o mesmo boleto.
+    """
+    nova = f"{tabela}_novo"
+    antiga = f"{tabela}_antigo"
+    with engine.begin() as conn:
+        if indice_existe(conn, tabela, "uk_hash_linha"):
+            print(f"✅ Índice uk_hash_linha já existe em {tabela}.")
+            return
+        pendentes = [
+            f"`{coluna}` ({tipo_esperado.upper()})"
+            for colunas, tipo_esperado in ((COLUNAS_DATA, "date"), (COLUNAS_VALOR, "decimal"))
+            for coluna in colunas.get(tabela, [])
+            if tipo_coluna(conn, tabela, coluna) != tipo_esperado
+        ]
+        if pendentes:
+            raise RuntimeError(
+                f"{tabela} ainda tem colunas em texto: {', '.join(pendentes)}. "
+                "Rode antes: python migracoes_bilhetagem.py tipos"
+            )
+        conn.execute(text(f"DROP TABLE IF EXISTS {nova};"))
+        conn.execute(text(f"CREATE TABLE {nova} LIKE {tabela};"))
+        conn.execute(text(f"""
+            ALTER TABLE {nova}
+            ADD COLUMN hash_linha CHAR(40) NULL,
+            ADD UNIQUE KEY uk_hash_linha (hash_linha)
+        """))
+
+    print(f"🔧 Calculando hash das linhas de {tabela}...")
+    totais = {"inseridos": 0, "duplicados": 0}
+    # coerce_float=False mantém DECIMAL como Decimal, igual ao que a ingestão gera
+    for lote in pd.read_sql(f"SELECT * FROM {tabela}", engine, chunksize=tamanho_lote, coerce_float=False):
+        lote["hash_linha"] = calcular_hash_linhas(lote, COLUNAS_HASH_BOLETOS)
+        contagens = inserir_novos_por_hash(engine, lote, nova)
+        for k, v in contagens.items():
+            totais[k] += v
+        print(f"   {totais['inseridos']} linhas copiadas, {totais['duplicados']} duplicadas descartadas...")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {antiga};"))
+        conn.execute(text(f"RENAME TABLE {tabela} TO {antiga}, {nova} TO {tabela};"))
+    print(f"✅ {tabela} agora tem hash_linha com índice único. Versão anterior guardada em {antiga}.")
+
+
+def migrar_empresas(engine):
+    """
+    Cria a dimensão `empresas` e liga as tabelas de fatos a ela:
+      1. Cadastra as empresas (código e nome) de pedidos_provider_v2 e os nomes que só aparecem
+         em boletos_pago_v3.
+      2. Marca como não contabilizáveis as empresas da antiga lista fixa do tratamento
+         (EMPRESAS_NAO_CONTABILIZAVEIS).
+      3. Acrescenta a coluna indexada empresa_id nas duas tabelas e preenche os registros existentes.
+    """
+    garantir_tabela_empresas(engine)
+    with engine.begin() as conn:
+        result = conn.execute(text(f"""
+            INSERT INTO {TABELA_EMPRESAS} (codigo, nome)
+            SELECT `Código da Empresa`, MAX(TRIM(`Empresa`))
+            FROM pedidos_provider_v2
+            WHERE `Código da Empresa` IS NOT NULL
+            GROUP BY `Código da Empresa`
+            ON DUPLICATE KEY UPDATE {TABELA_EMPRESAS}.nome = VALUES(nome)
+        """))
+        print(f"✅ Empresas de pedidos_provider_v2 cadastradas/atualizadas: {result.rowcount}")
+        result = conn.execute(text(f"""
+            INSERT INTO {TABELA_EMPRESAS} (nome)
+            SELECT DISTINCT TRIM(b.`Empresa`) FROM boletos_pago_v3 AS b
+            WHERE b.`Empresa` IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {TABELA_EMPRESAS} AS e WHERE e.nome = TRIM(b.`Empresa`))
+        """))
+        print(f"✅ Empresas só de boletos_pago_v3 cadastradas: {result.rowcount}")
+        for codigo, nome in EMPRESAS_NAO_CONTABILIZAVEIS.items():
+            conn.execute(text(f"""
+                INSERT INTO {TABELA_EMPRESAS} (codigo, nome, contabilizavel) VALUES (:codigo, :nome, 0)
+                ON DUPLICATE KEY UPDATE {TABELA_EMPRESAS}.contabilizavel = 0
+            """), {"codigo": codigo, "nome": nome or f"EMPRESA {codigo}"})
+        print(f"✅ {len(EMPRESAS_NAO_CONTABILIZAVEIS)} empresas marcadas como não contabilizáveis.")
+
+    for tabela in ("pedidos_provider_v2", "boletos_pago_v3"):
+        with engine.begin() as conn:
+            if tipo_coluna(conn, tabela, "empresa_id") is None:
+                conn.execute(text(f"""
+                    ALTER TABLE {tabela}
+                    ADD COLUMN empresa_id INT NULL,
+                    ADD KEY ix_{tabela}_empresa_id (empresa_id)
+                """))
+                print(f"✅ Coluna empresa_id criada em {tabela}.")
+
+    with engine.begin() as conn:
+        result = conn.execute(text(f"""
+            UPDATE pedidos_provider_v2 AS p
+            JOIN {TABELA_EMPRESAS} AS e ON e.codigo = p.`Código da Empresa`
+            SET p.empresa_id = e.id
+            WHERE p.empresa_id IS NULL
+        """))
+        print(f"   pedidos_provider_v2: {result.rowcount} registros ligados à empresa.")
+    with engine.begin() as conn:
+        result = conn.execute(text(f"""
+            UPDATE boletos_pago_v3 AS b
+            JOIN (SELECT nome, MIN(id) AS id FROM {TABELA_EMPRESAS} GROUP BY nome) AS e
+              ON e.nome = TRIM(b.`Empresa`)
+            SET b.empresa_id = e.id
+            WHERE b.empresa_id IS NULL
+        """))
+        print(f"   boletos_pago_v3: {result.rowcount} registros ligados à empresa.")
+
+
+def migrar_pedido_pagamento(engine, tabela="boletos_pago_v3"):
+    """
+    Cria a tabela de conciliação pedido_pagamento e a preenche com o histórico:
+      1. Garante que 'Número Pedido' dos boletos seja VARCHAR(32), igual a 'Nº Pedido' dos pedidos,
+         e cria o índice ix_boletos_numero_pedido (o join da conciliação usa os dois índices).
+      2. Reconstrói pedido_pagamento inteira a partir de pedidos_provider_v2 × boletos_pago_v3.
+    Depois disso a ingestão mantém a tabela atualizada a cada lote.
+    """
+    with engine.begin() as conn:
+        migrar_coluna_varchar(conn, tabela, "Número Pedido", COLUNAS_VARCHAR[tabela]["Número Pedido"])
+        criar_indice(conn, tabela, "ix_boletos_numero_pedido", INDICES[tabela]["ix_boletos_numero_pedido"])
+    reconstruir_pedido_pagamento(engine)
+
+
+def migrar_indices(engine):
+    """
+    Cria os índices usados pelas consultas por período (INDICES): data e status+data dos pedidos,
+    data de pagamento e número do pedido dos boletos. 'Nº Pedido' já tem o índice único
+    uk_num_pedido (migração chave_pedidos).
+    """
+    for tabela, indices in INDICES.items():
+        with engine.begin() as conn:
+            for coluna, tamanho in COLUNAS_VARCHAR.get(tabela, {}).items():
+                migrar_coluna_varchar(conn, tabela, coluna, tamanho)
+            for indice, colunas in indices.items():
+                criar_indice(conn, tabela, indice, colunas)
+
+
+def migrar_atualizado_em(engine):
+    """
+    Acrescenta as colunas de COLUNAS_ATUALIZACAO, com índice: atualizado_em em pedidos_provider_v2
+    (o MySQL a atualiza sozinho quando o upsert altera a linha) e carregado_em em boletos_pago_v3.
+    As linhas existentes ficam com a data da migração.
+    """
+    for tabela, (coluna, definicao) in COLUNAS_ATUALIZACAO.items():
+        with engine.begin() as conn:
+            if tipo_coluna(conn, tabela, coluna) is not None:
+                print(f"✅ {tabela}.`{coluna}` já existe.")
+                continue
+            conn.execute(text(f"""
+                ALTER TABLE {tabela}
+                ADD COLUMN {coluna} {definicao},
+                ADD KEY ix_{tabela}_{coluna} ({coluna})
+            """))
+            print(f"✅ Coluna {coluna} criada em {tabela}.")
+
+
+
+def migrar_identificadores(engine):
+    """
+    Reescreve os identificadores gravados com casas decimais ("900018.0") no texto canônico
+    ("900018") que o tratamento passou a gerar, para que as junções de 'Número Pedido' com
+    'Nº Pedido' encontrem esses boletos. Os hashes não mudam: já eram calculados sobre o texto canônico.
+
+    Em pedidos_provider_v2 um "900018.0" cujo "900018" já existe é o mesmo pedido carregado de
+    novo pela outra estratégia de carga: o UPDATE IGNORE mantém a linha canônica e a sobra é apagada.
+    Ao final a conciliação e os indicadores são reconstruídos e a versão dos dados é incrementada.
+    """
+    for tabela, colunas in COLUNAS_IDENTIFICADOR.items():
+        with engine.begin() as conn:
+            # Em boletos_pago_v3 carregado_em não muda sozinho: marca as linhas para a atualização
+            # incremental do dashboard (atualizado_em dos pedidos já é ON UPDATE)
+            marca = ", carregado_em = NOW()" if tipo_coluna(conn, tabela, "carregado_em") is not None else ""
+            for coluna in colunas:
+                nao_canonico = f"TRIM(`{coluna}`) REGEXP '^-?[0-9]+\\\\.0*$'"
+                result = conn.execute(text(f"""
+                    UPDATE IGNORE {tabela}
+                    SET `{coluna}` = SUBSTRING_INDEX(TRIM(`{coluna}`), '.', 1){marca}
+                    WHERE {nao_canonico}
+                """))
+                print(f"🔧 {tabela}.`{coluna}`: {result.rowcount} identificadores normalizados.")
+                result = conn.execute(text(f"DELETE FROM {tabela} WHERE {nao_canonico}"))
+                if result.rowcount:
+                    print(f"   {result.rowcount} linhas repetidas (mesmo identificador canônico) apagadas.")
+    reconstruir_pedido_pagamento(engine)
+    reconstruir_kpis(engine)
+    garantir_tabela_versao(engine)
+    incrementar_versao_dados(engine)
+
+
+MIGRACOES = {
+    "tipos": migrar_tipos,
+    "chave_pedidos": migrar_chave_pedidos,
+    "hash_boletos": migrar_hash_boletos,
+    "empresas": migrar_empresas,
+    "pedido_pagamento": migrar_pedido_pagamento,
+    "kpis": reconstruir_kpis,
+    "indices": migrar_indices,
+    "versao_dados": garantir_tabela_versao,
+    "atualizado_em": migrar_atualizado_em,
+    "cobertura": semear_cobertura,
+    "identificadores": migrar_identificadores,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações do banco db_bilhetagem.")
+    parser.add_argument("migracao", choices=list(MIGRACOES), help="Migração a executar.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    MIGRACOES[args.migracao](engine)
+    print("✅ Migração concluída.")
+
+
+if __name__ == "__main__":
+    main()
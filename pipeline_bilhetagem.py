@@ -0,0 +1,253 @@
+"""
+Pipeline de ingestão com as etapas sobrepostas: download → tratamento → carga.
+
+Cada etapa roda em sua própria thread, ligada à seguinte por uma fila de tamanho limitado:
+  - download: baixa os relatórios de cada janela, um por vez, e entrega o caminho do CSV;
+  - tratamento: lê o CSV em lotes (iterar_pedidos_provider_v2 / iterar_boletos_pago_v3);
+  - carga: envia cada lote ao MySQL e registra o arquivo no manifesto ao final.
+
+Assim o arquivo de Pedidos Provider já está sendo tratado e carregado enquanto o relatório
+de Boletos ainda é gerado no servidor, e o tempo total fica próximo ao da etapa mais lenta.
+As filas limitadas seguram a etapa mais rápida quando a seguinte não dá conta, mantendo a
+memória limitada a poucos lotes.
+"""
+import time
+import queue
+import threading
+
+from config_vtadmin import download_dir, usuario, senha, RELATORIOS
+from vtadmin_via_selenium import SessaoVTAdmin
+from carga_bilhetagem import (
+    relatar_velocidade, ESTRATEGIA_CARGA_PADRAO, TAMANHO_LOTE_PADRAO,
+    garantir_tabela_manifesto, checksums_carregados, info_arquivo, registrar_arquivo, garantir_tabela_versao
+)
+from empresas_bilhetagem import garantir_tabela_empresas
+from reconciliacao_bilhetagem import garantir_tabela_pedido_pagamento
+from kpis_bilhetagem import garantir_tabelas_kpi
+from planejador_bilhetagem import garantir_tabela_cobertura, registrar_cobertura
+from tratar_relatorios_envioDB import (
+    iterar_pedidos_provider_v2, iterar_boletos_pago_v3, carregar_lote_pedidos, carregar_lote_boletos
+)
+
+# Capacidade das filas entre as etapas (arquivos baixados aguardando tratamento e lotes aguardando carga)
+MAX_ARQUIVOS_NA_FILA = 2
+MAX_LOTES_NA_FILA = 4
+
+# Marcador de fim de fila
+_FIM = object()
+
+
+class _Etapa(threading.Thread):
+    """Thread de uma etapa: guarda o erro (se houver) e o tempo efetivamente trabalhado."""
+
+    def __init__(self, nome, alvo, parar):
+        super().__init__(name=nome, daemon=True)
+        self.alvo = alvo
+        self.parar = parar
+        self.erro = None
+        self.segundos = 0.0
+
+    def run(self):
+        try:
+            self.alvo(self)
+        except Exception as e:
+            self.erro = e
+            self.parar.set()
+
+
+def _colocar(fila, item, parar):
+    """put() que desiste se outra etapa falhou (evita travar com a fila cheia)."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _retirar(fila, parar):
+    """get() que desiste se outra etapa falhou."""
+    while not parar.is_set():
+        try:
+            return fila.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _FIM
+
+
+def baixar_arquivos(janelas, via="selenium", pasta_download=download_dir, engine=None):
+    """
+    Gera (relatório, caminho do CSV) à medida que cada relatório de cada janela termina de baixar.
+    Usa uma única sessão (navegador logado ou sessão HTTP) para todas as janelas.
+    Com `engine`, cada janela com os dois relatórios baixados é registrada na cobertura do planejador.
+    """
+    if via == "http":
+        import vtadmin_http  # Só o modo HTTP precisa de requests/beautifulsoup4
+        session = vtadmin_http.login_vtadmin(usuario, senha)
+        for data_inicial, data_final in janelas:
+            for relatorio in RELATORIOS:
+                yield relatorio, vtadmin_http.baixar_relatorio_http(
+                    session, relatorio, data_inicial, data_final, pasta_download
+                )
+            if engine is not None:
+                registrar_cobertura(engine, data_inicial, data_final)
+        return
+    with SessaoVTAdmin(pasta_download) as sessao:
+        for data_inicial, data_final in janelas:
+            for relatorio in RELATORIOS:
+                yield relatorio, sessao.baixar(relatorio, data_inicial, data_final)
+            if engine is not None:
+                registrar_cobertura(engine, data_inicial, data_final)
+
+
+def executar_pipeline(engine, janelas, via="selenium", force=False, estrategia=ESTRATEGIA_CARGA_PADRAO,
+                      tamanho_lote=TAMANHO_LOTE_PADRAO, pasta_download=download_dir, arquivos=None):
+    """
+    Baixa, trata e carrega os relatórios das janelas com as três etapas sobrepostas.
+
+    `arquivos` permite substituir a etapa de download por qualquer iterável de
+    (relatório, caminho do CSV) — por exemplo, para reprocessar arquivos já baixados.
+
+    Um arquivo com erro no tratamento ou na carga é pulado (os lotes restantes dele são
+    descartados e ele não entra no manifesto, voltando na próxima execução) e os demais
+    continuam, como em carregar_arquivos; as falhas são listadas no final.
+
+    Retorna os totais por tabela.
+    """
+    opcoes_carga = {"estrategia": estrategia, "tamanho_lote": tamanho_lote}
+    cargas = {
+        1: ("pedidos_provider_v2", iterar_pedidos_provider_v2,
+            lambda lote: carregar_lote_pedidos(engine, lote, **opcoes_carga)),
+        2: ("boletos_pago_v3", iterar_boletos_pago_v3,
+            lambda lote: carregar_lote_boletos(engine, lote, **opcoes_carga)),
+    }
+    totais = {tabela: {"linhas": 0, "segundos": 0.0} for tabela, _, _ in cargas.values()}
+
+    garantir_tabela_manifesto(engine)
+    garantir_tabela_empresas(engine)
+    garantir_tabela_pedido_pagamento(engine)
+    garantir_tabelas_kpi(engine)
+    garantir_tabela_versao(engine)
+    carregados = {
+        relatorio: checksums_carregados(engine, RELATORIOS[relatorio]) for relatorio in RELATORIOS
+    }
+    if arquivos is None:
+        garantir_tabela_cobertura(engine)
+        arquivos = baixar_arquivos(janelas, via, pasta_download, engine)
+
+    fila_arquivos = queue.Queue(maxsize=MAX_ARQUIVOS_NA_FILA)
+    fila_lotes = queue.Queue(maxsize=MAX_LOTES_NA_FILA)
+    parar = threading.Event()
+    falhas = []
+
+    def falhar(caminho, erro):
+        print(f"❌ Falha ao carregar {caminho}: {type(erro).__name__}: {erro}")
+        falhas.append((caminho, f"{type(erro).__name__}: {erro}"))
+
+    def etapa_download(etapa):
+        try:
+            inicio = time.perf_counter()
+            for relatorio, caminho in arquivos:
+                etapa.segundos += time.perf_counter() - inicio
+                if not _colocar(fila_arquivos, (relatorio, caminho), parar):
+                    return
+                inicio = time.perf_counter()
+        finally:
+            if hasattr(arquivos, "close"):
+                arquivos.close()  # Encerra o navegador/sessão do gerador de downloads
+            _colocar(fila_arquivos, _FIM, parar)
+
+    def etapa_tratamento(etapa):
+        try:
+            while (item := _retirar(fila_arquivos, parar)) is not _FIM:
+                relatorio, caminho = item
+                _, iterar, _ = cargas[relatorio]
+                info = None
+                inicio = time.perf_counter()
+                try:
+                    info = info_arquivo(caminho, RELATORIOS[relatorio])
+                    if not force and info["checksum"] in carregados[relatorio]:
+                        print(f"⏭️ {caminho} já foi carregado anteriormente.")
+                        continue
+                    for lote in iterar(caminho):
+                        etapa.segundos += time.perf_counter() - inicio
+                        if not _colocar(fila_lotes, (relatorio, info, lote), parar):
+                            return
+                        inicio = time.perf_counter()
+                    fim_arquivo = None  # A carga registra no manifesto depois do último lote
+                except Exception as e:
+                    if info is None:
+                        falhar(caminho, e)
+                        continue
+                    # No lugar do fim do arquivo vai o erro: a carga não registra o arquivo
+                    fim_arquivo = e
+                etapa.segundos += time.perf_counter() - inicio
+                if not _colocar(fila_lotes, (relatorio, info, fim_arquivo), parar):
+                    return
+        finally:
+            _colocar(fila_lotes, _FIM, parar)
+
+    def etapa_carga(etapa):
+        linhas_arquivo = {}
+        descartados = set()  # Arquivos com um lote que falhou: os lotes seguintes são ignorados
+        while (item := _retirar(fila_lotes, parar)) is not _FIM:
+            relatorio, info, lote = item
+            tabela, _, carregar_lote = cargas[relatorio]
+            caminho = info["caminho"]
+            inicio = time.perf_counter()
+            try:
+                if isinstance(lote, Exception):
+                    # O tratamento falhou no meio do arquivo
+                    linhas_arquivo.pop(caminho, None)
+                    if caminho not in descartados:
+                        falhar(caminho, lote)
+                    descartados.discard(caminho)
+                elif lote is None:
+                    # Arquivo sem nenhum lote tratado (layout inesperado) não entra no manifesto
+                    if caminho in descartados:
+                        descartados.discard(caminho)
+                    elif caminho in linhas_arquivo:
+                        registrar_arquivo(engine, info, linhas_arquivo.pop(caminho))
+                    else:
+                        print(f"⚠ Nenhum lote tratado em {caminho}: o arquivo não foi registrado no manifesto.")
+                elif caminho not in descartados:
+                    contagens = carregar_lote(lote)
+                    linhas_arquivo[caminho] = linhas_arquivo.get(caminho, 0) + len(lote)
+                    totais[tabela]["linhas"] += len(lote)
+                    for k, v in contagens.items():
+                        totais[tabela][k] = totais[tabela].get(k, 0) + v
+            except Exception as e:
+                falhar(caminho, e)
+                linhas_arquivo.pop(caminho, None)
+                if lote is not None:
+                    descartados.add(caminho)
+            etapa.segundos += time.perf_counter() - inicio
+
+    inicio_total = time.perf_counter()
+    etapas = [
+        _Etapa("download", etapa_download, parar),
+        _Etapa("tratamento", etapa_tratamento, parar),
+        _Etapa("carga", etapa_carga, parar),
+    ]
+    for etapa in etapas:
+        etapa.start()
+    for etapa in etapas:
+        etapa.join()
+    segundos_total = time.perf_counter() - inicio_total
+
+    for etapa in etapas:
+        if etapa.erro is not None:
+            raise RuntimeError(f"Falha na etapa de {etapa.name} do pipeline") from etapa.erro
+
+    for tabela, contagem in totais.items():
+        resumo = ", ".join(f"{v} {k}" for k, v in contagem.items() if k not in ("linhas", "segundos"))
+        print(f"📊 {tabela}: {resumo or 'nenhum arquivo novo'}.")
+        relatar_velocidade(tabela, contagem["linhas"], contagem["segundos"])
+    tempos = ", ".join(f"{etapa.name} {etapa.segundos:.1f}s" for etapa in etapas)
+    print(f"⏱️ Pipeline concluído em {segundos_total:.1f}s (tempo ativo por etapa: {tempos}).")
+    if falhas:
+        print(f"⚠ {len(falhas)} arquivo(s) não carregado(s):")
+        for arquivo, erro in falhas:
+            print(f"   - {arquivo}: {erro}")
+    return totais
@@ -0,0 +1,207 @@
+"""
+Planejamento das janelas de datas que precisam ser baixadas do VTAdmin.
+
+Em vez de baixar sempre o mesmo período fixo, consulta a tabela cobertura_downloads (as janelas
+já baixadas com sucesso, gravadas depois de cada download) e devolve apenas as janelas que faltam,
+mais os últimos dias, que são sempre baixados de novo porque o status dos pedidos e os pagamentos
+ainda podem mudar.
+
+O planejamento não olha as datas presentes nos dados: dias sem nenhum boleto pago (fins de
+semana, feriados) ficariam sempre "faltando" e seriam baixados de novo a cada execução.
+Para bancos carregados antes da tabela existir, a migração `cobertura` a semeia a partir dos dados.
+
+Uso:
+    python planejador_bilhetagem.py --desde 01/03/2025
+"""
+import argparse
+import datetime
+
+from sqlalchemy import text
+
+from db_bilhetagem import get_engine
+
+TABELA_COBERTURA = "cobertura_downloads"
+# Colunas de data que indicam quais dias de cada relatório já foram carregados (semente da cobertura)
+COBERTURA = {
+    "pedidos_provider_v2": "Data do Pedido",
+    "boletos_pago_v3": "Pagamento",
+}
+# Quantidade de dias finais baixados novamente a cada execução
+DIAS_REATUALIZAR = 7
+# Janelas separadas por até esta quantidade de dias já carregados são unidas em uma só
+# (baixar alguns dias a mais sai mais barato que gerar outro relatório no VTAdmin)
+DIAS_PARA_UNIR = 3
+# Ao semear a cobertura a partir dos dados, buracos de até esta quantidade de dias sem dados
+# (fins de semana, feriados) são considerados baixados
+DIAS_PARA_UNIR_SEMENTE = 7
+
+
+def data_br(texto):
+    """Converte "dd/mm/yyyy" para datetime.date."""
+    return datetime.datetime.strptime(texto, "%d/%m/%Y").date()
+
+
+def formatar_data_br(data):
+    """Converte datetime.date para "dd/mm/yyyy" (formato dos campos do VTAdmin)."""
+    return data.strftime("%d/%m/%Y")
+
+
+def datas_carregadas(engine, tabela, coluna, inicio, fim):
+    """Retorna o conjunto de datas distintas de `coluna` presentes na tabela entre inicio e fim."""
+    query = text(f"SELECT DISTINCT `{coluna}` FROM {tabela} WHERE `{coluna}` BETWEEN :inicio AND :fim")
+    with engine.connect() as conn:
+        return {linha[0] for linha in conn.execute(query, {"inicio": inicio, "fim": fim}) if linha[0] is not None}
+
+
+def _como_data(data):
+    """Aceita datetime.date ou "dd/mm/yyyy"."""
+    return data_br(data) if isinstance(data, str) else data
+
+
+def garantir_tabela_cobertura(engine):
+    """Cria, se ainda não existir, a tabela com as janelas já baixadas."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_COBERTURA} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                data_inicial DATE NOT NULL,
+                data_final DATE NOT NULL,
+                baixado_em DATETIME NOT NULL,
+                KEY ix_cobertura_periodo (data_inicial, data_final)
+            )
+        """))
+
+
+def registrar_cobertura(engine, data_inicial, data_final):
+    """Registra a janela (datetime.date ou "dd/mm/yyyy") cujos dois relatórios foram baixados com sucesso."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"""
+                INSERT INTO {TABELA_COBERTURA} (data_inicial, data_final, baixado_em)
+                VALUES (:inicio, :fim, :agora)
+            """),
+            {"inicio": _como_data(data_inicial), "fim": _como_data(data_final), "agora": datetime.datetime.now()},
+        )
+
+
+def datas_cobertas(engine, inicio, fim):
+    """Conjunto dos dias entre inicio e fim cobertos por alguma janela já baixada."""
+    query = text(f"""
+        SELECT data_inicial, data_final FROM {TABELA_COBERTURA}
+        WHERE data_final >= :inicio AND data_inicial <= :fim
+    """)
+    dias = set()
+    with engine.connect() as conn:
+        for data_inicial, data_final in conn.execute(query, {"inicio": inicio, "fim": fim}):
+            dia = max(data_inicial, inicio)
+            while dia <= min(data_final, fim):
+                dias.add(dia)
+                dia += datetime.timedelta(days=1)
+    return dias
+
+
+def primeira_data_coberta(engine):
+    """Menor data já baixada segundo a cobertura (None se nada foi registrado)."""
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT MIN(data_inicial) FROM {TABELA_COBERTURA}")).scalar()
+
+
+def semear_cobertura(engine, dias_para_unir=DIAS_PARA_UNIR_SEMENTE):
+    """
+    Preenche a cobertura de um banco carregado antes dela existir: os dias com dados em algum
+    dos relatórios, agrupados em janelas que ignoram buracos de até `dias_para_unir` dias.
+    Não faz nada se a cobertura já tiver registros.
+    """
+    garantir_tabela_cobertura(engine)
+    if primeira_data_coberta(engine) is not None:
+        print(f"✅ {TABELA_COBERTURA} já tem registros.")
+        return
+    inicio = primeira_data_carregada(engine)
+    if inicio is None:
+        print("✅ Banco sem dados carregados: nada a semear.")
+        return
+    fim = datetime.date.today()
+    dias = set()
+    for tabela, coluna in COBERTURA.items():
+        dias |= datas_carregadas(engine, tabela, coluna, inicio, fim)
+    janelas = agrupar_em_janelas(dias, dias_para_unir)
+    for data_inicial, data_final in janelas:
+        registrar_cobertura(engine, data_inicial, data_final)
+    print(f"✅ {TABELA_COBERTURA} semeada com {len(janelas)} janela(s) a partir dos dados.")
+
+
+def primeira_data_carregada(engine):
+    """Menor data já carregada entre os relatórios (None se o banco estiver vazio)."""
+    datas = []
+    with engine.connect() as conn:
+        for tabela, coluna in COBERTURA.items():
+            data = conn.execute(text(f"SELECT MIN(`{coluna}`) FROM {tabela}")).scalar()
+            if data is not None:
+                datas.append(data)
+    return min(datas) if datas else None
+
+
+def agrupar_em_janelas(dias, dias_para_unir=DIAS_PARA_UNIR):
+    """
+    Agrupa uma lista de datas em janelas contínuas [(inicio, fim)], unindo janelas
+    separadas por até `dias_para_unir` dias.
+    """
+    janelas = []
+    for dia in sorted(dias):
+        if janelas and (dia - janelas[-1][1]).days <= dias_para_unir + 1:
+            janelas[-1][1] = dia
+        else:
+            janelas.append([dia, dia])
+    return [tuple(janela) for janela in janelas]
+
+
+def planejar_janelas(engine, desde=None, ate=None, dias_reatualizar=DIAS_REATUALIZAR,
+                     dias_para_unir=DIAS_PARA_UNIR):
+    """
+    Calcula as janelas de datas que precisam ser baixadas entre `desde` e `ate` (datetime.date).
+
+    Um dia precisa ser baixado quando não está em nenhuma janela da cobertura ou quando está
+    entre os `dias_reatualizar` últimos dias do período. Sem `desde`, usa a primeira data
+    coberta (ou, sem cobertura, a primeira data carregada); sem `ate`, usa hoje.
+
+    Retorna uma lista de pares ("dd/mm/yyyy", "dd/mm/yyyy"), em ordem cronológica.
+    """
+    ate = ate or datetime.date.today()
+    desde = desde or primeira_data_coberta(engine) or primeira_data_carregada(engine)
+    if desde is None:
+        raise ValueError("Banco sem dados carregados: informe a data inicial (--desde).")
+    if desde > ate:
+        return []
+
+    cobertas = datas_cobertas(engine, desde, ate)
+    inicio_reatualizar = ate - datetime.timedelta(days=max(dias_reatualizar, 0) - 1)
+    dias = []
+    dia = desde
+    while dia <= ate:
+        if dia not in cobertas or dia >= inicio_reatualizar:
+            dias.append(dia)
+        dia += datetime.timedelta(days=1)
+
+    janelas = agrupar_em_janelas(dias, dias_para_unir)
+    return [(formatar_data_br(inicio), formatar_data_br(fim)) for inicio, fim in janelas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mostra as janelas de datas que faltam baixar do VTAdmin.")
+    parser.add_argument("--desde", type=data_br, help="Data inicial (dd/mm/yyyy). Padrão: primeira data carregada.")
+    parser.add_argument("--ate", type=data_br, help="Data final (dd/mm/yyyy). Padrão: hoje.")
+    parser.add_argument("--dias-reatualizar", type=int, default=DIAS_REATUALIZAR,
+                        help="Últimos dias do período que são sempre baixados novamente.")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    garantir_tabela_cobertura(engine)
+    janelas = planejar_janelas(engine, args.desde, args.ate, args.dias_reatualizar)
+    if not janelas:
+        print("✅ Nenhuma janela pendente.")
+    for data_inicial, data_final in janelas:
+        print(f"📅 {data_inicial} a {data_final}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Tabela de conciliação pedido_pagamento: cada boleto pago ligado ao seu pedido.
+
+Guarda, por boleto (hash_linha), o número e a data do pedido, a empresa e o status do pedido,
+as datas de emissão e pagamento, o valor pago e os dias até o pagamento. A ingestão atualiza
+as linhas dos números de pedido de cada lote carregado, então o dashboard consulta faixas de
+datas nesta tabela em vez de juntar pedidos e boletos em memória a cada atualização.
+"""
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from carga_bilhetagem import publicar_nova_versao
+
+TABELA_PEDIDO_PAGAMENTO = "pedido_pagamento"
+# Quantidade de números de pedido por comando ao atualizar a conciliação
+NUMEROS_POR_COMANDO = 1000
+
+_COLUNAS = "hash_linha, num_pedido, empresa_id, status, data_pedido, emissao, pagamento, valor_pago, dias_para_pagar"
+_SELECT_CONCILIACAO = """
+    SELECT b.hash_linha, p.`Nº Pedido`, p.empresa_id, p.`Status`, p.`Data do Pedido`,
+           b.`Emissão`, b.`Pagamento`, COALESCE(b.`Valor`, p.`Valor Crédito`),
+           DATEDIFF(b.`Pagamento`, b.`Emissão`)
+    FROM pedidos_provider_v2 AS p
+    JOIN boletos_pago_v3 AS b ON b.`Número Pedido` = p.`Nº Pedido`
+    WHERE b.hash_linha IS NOT NULL
+"""
+
+
+def garantir_tabela_pedido_pagamento(engine):
+    """Cria, se ainda não existir, a tabela de conciliação com os índices usados pelo dashboard."""
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {TABELA_PEDIDO_PAGAMENTO} (
+                hash_linha CHAR(40) NOT NULL PRIMARY KEY,
+                num_pedido VARCHAR(32) NOT NULL,
+                empresa_id INT NULL,
+                status VARCHAR(64) NULL,
+                data_pedido DATE NULL,
+                emissao DATE NULL,
+                pagamento DATE NULL,
+                valor_pago DECIMAL(14, 2) NULL,
+                dias_para_pagar INT NULL,
+                KEY ix_pp_num_pedido (num_pedido),
+                KEY ix_pp_data_pedido (data_pedido),
+                KEY ix_pp_pagamento (pagamento),
+                KEY ix_pp_empresa (empresa_id)
+            )
+        """))
+
+
+def _normalizar_numero(numero):
+    """Número de pedido como texto; 900000.0 (coluna lida como float pelo pandas) vira "900000"."""
+    if isinstance(numero, float):
+        return str(int(numero)) if numero.is_integer() else None
+    texto = str(numero).strip()
+    return texto or None
+
+
+def normalizar_numeros(numeros):
+    """Lista ordenada e sem repetição dos números de pedido, como texto."""
+    return sorted({n for n in map(_normalizar_numero, pd.Series(numeros).dropna()) if n})
+
+
+def atualizar_pedido_pagamento(engine, numeros):
+    """
+    Recalcula a conciliação dos números de pedido informados: apaga as linhas atuais desses
+    pedidos e insere de novo a partir de pedidos_provider_v2 × boletos_pago_v3.
+    Assim mudanças de status do pedido e boletos novos entram na tabela.
+    Retorna a quantidade de linhas inseridas.
+    """
+    numeros = normalizar_numeros(numeros)
+    inseridas = 0
+    for i in range(0, len(numeros), NUMEROS_POR_COMANDO):
+        parte = numeros[i:i + NUMEROS_POR_COMANDO]
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"DELETE FROM {TABELA_PEDIDO_PAGAMENTO} WHERE num_pedido IN :numeros")
+                .bindparams(bindparam("numeros", expanding=True)),
+                {"numeros": parte},
+            )
+            inseridas += conn.execute(
+                text(f"""
+                    INSERT INTO {TABELA_PEDIDO_PAGAMENTO} ({_COLUNAS})
+                    {_SELECT_CONCILIACAO} AND p.`Nº Pedido` IN :numeros
+                """).bindparams(bindparam("numeros", expanding=True)),
+                {"numeros": parte},
+            ).rowcount
+    return inseridas
+
+
+def reconstruir_pedido_pagamento(engine):
+    """Reconstrói a conciliação inteira em uma cópia e publica com RENAME TABLE."""
+    garantir_tabela_pedido_pagamento(engine)
+    linhas = publicar_nova_versao(
+        engine, TABELA_PEDIDO_PAGAMENTO,
+        lambda conn, nova: conn.execute(text(f"INSERT INTO {nova} ({_COLUNAS}) {_SELECT_CONCILIACAO}")).rowcount
+    )
+    print(f"✅ {TABELA_PEDIDO_PAGAMENTO} reconstruída: {linhas} linhas.")
+    return linhas
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+import cache_figuras
+from cache_figuras import CacheDisco, CacheMemoria, SemCache, criar_cache, memorizar
+
+
+def test_cache_memoria_descarta_o_usado_ha_mais_tempo():
+    cache = CacheMemoria(maximo=2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obter("a") == 1  # "a" passa a ser o mais recente
+    cache.guardar("c", 3)
+    assert cache.obter("b") is cache_figuras._AUSENTE
+    assert cache.obter("a") == 1
+    assert cache.obter("c") == 3
+
+
+def test_cache_memoria_guarda_none():
+    cache = CacheMemoria()
+    cache.guardar("a", None)
+    assert cache.obter("a") is None
+
+
+def test_cache_disco_descarta_acima_do_maximo(tmp_path):
+    cache = CacheDisco(str(tmp_path), maximo=2)
+    for i in range(4):
+        cache.guardar(("chave", i), {"valor": i})
+    assert len(list(tmp_path.glob("*.pkl"))) == 2
+    assert cache.obter(("chave", 3)) == {"valor": 3}
+
+
+def test_criar_cache_rejeita_backend_desconhecido():
+    assert isinstance(criar_cache("desligado"), SemCache)
+    with pytest.raises(ValueError):
+        criar_cache("redis")
+
+
+def test_memorizar_separa_por_argumentos_e_versao():
+    versao = [1]
+    chamadas = []
+
+    @memorizar(CacheMemoria(), lambda: versao[0])
+    def dobro(x):
+        chamadas.append(x)
+        return 2 * x
+
+    assert dobro(2) == 4 and dobro(2) == 4 and dobro(3) == 6
+    assert chamadas == [2, 3]
+    versao[0] = 2
+    assert dobro(2) == 4
+    assert chamadas == [2, 3, 2]
+    assert cache_figuras._calculando == {}
+
+
+def test_memorizar_calcula_uma_vez_para_chamadas_simultaneas():
+    liberar = threading.Event()
+    chamadas = []
+
+    @memorizar(CacheMemoria(), lambda: 1)
+    def lenta(x):
+        chamadas.append(x)
+        liberar.wait(5)
+        return x
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(lenta(7))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not chamadas:
+        time.sleep(0.01)
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+    assert resultados == [7] * 5
+    assert chamadas == [7]
+    assert cache_figuras._calculando == {}
+
+
+def test_memorizar_nao_remove_o_lock_de_outra_chamada():
+    # Simula uma chamada nova que registrou o próprio lock enquanto esta ainda calculava
+    outro_lock = threading.Lock()
+
+    @memorizar(SemCache(), lambda: 1)
+    def calcular():
+        (chave,) = cache_figuras._calculando
+        cache_figuras._calculando[chave] = outro_lock
+        return 1
+
+    try:
+        calcular()
+        assert list(cache_figuras._calculando.values()) == [outro_lock]
+    finally:
+        cache_figuras._calculando.clear()
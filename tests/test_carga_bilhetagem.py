@@ -0,0 +1,57 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from carga_bilhetagem import calcular_hash_linhas, normalizar_identificador
+
+
+def boleto(**campos):
+    linha = {
+        "Banco": "CAIXA", "Empresa": "EXPRESSO NORTE", "Emissão": datetime.date(2025, 3, 1),
+        "Pagamento": datetime.date(2025, 3, 3), "Processado": "03/03/2025", "Liberação": "03/03/2025",
+        "Nosso Número": "3404381470", "Número Pedido": "900018", "Valor Pedido": "R$ 10,00",
+        "Valor": Decimal("10.00"),
+    }
+    linha.update(campos)
+    return linha
+
+
+@pytest.mark.parametrize("valor", [900018, 900018.0, np.float64(900018.0), Decimal("900018.00"),
+                                   "900018", " 900018.0 ", "900018.00"])
+def test_identificador_canonico(valor):
+    assert normalizar_identificador(valor) == "900018"
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (None, ""), (np.nan, ""), ("", ""), ("00123", "00123"), ("12.5", "12.5"), ("ABC.0", "ABC.0"),
+])
+def test_identificador_mantem_o_que_nao_e_inteiro(valor, esperado):
+    assert normalizar_identificador(valor) == esperado
+
+
+def test_hash_igual_para_identificador_texto_ou_float():
+    # Lote com o totalizador: o pandas lê os números como float64
+    texto = pd.DataFrame([boleto()])
+    numeros = pd.DataFrame([boleto(**{"Nosso Número": 3404381470.0, "Número Pedido": 900018.0})])
+    legado = pd.DataFrame([boleto(**{"Nosso Número": "3404381470.0", "Número Pedido": "900018.0"})])
+    esperado = calcular_hash_linhas(texto)[0]
+    assert calcular_hash_linhas(numeros)[0] == esperado
+    assert calcular_hash_linhas(legado)[0] == esperado
+
+
+def test_hash_muda_com_o_conteudo_e_ignora_outras_colunas():
+    df = pd.DataFrame([boleto(), boleto(Valor=Decimal("10.01")), boleto(empresa_id=7)], index=[5, 6, 7])
+    hashes = calcular_hash_linhas(df)
+    assert list(hashes.index) == [5, 6, 7]
+    assert all(len(h) == 40 for h in hashes)
+    assert hashes[5] != hashes[6]
+    assert hashes[5] == hashes[7]
+
+
+def test_hash_trata_vazios_como_iguais():
+    vazios = [None, np.nan, pd.NaT]
+    hashes = {calcular_hash_linhas(pd.DataFrame([boleto(Liberação=v)]))[0] for v in vazios}
+    assert len(hashes) == 1
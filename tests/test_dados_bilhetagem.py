@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from dados_bilhetagem import filtrar_ordenar_tabela, pagina_tabela
+
+
+@pytest.fixture
+def pedidos():
+    return pd.DataFrame({
+        "Empresa": ["Expresso Norte", "Viação Amazonas", "COMERCIAL RIO NEGRO", "expresso sul"],
+        "Nº Pedido": ["900003", "900001", "900004", "900002"],
+        "Data do Pedido": pd.to_datetime(["2025-03-05", "2025-03-01", "2025-04-02", "2025-03-05"]),
+        "Valor Crédito": [Decimal("150.00"), Decimal("20.50"), Decimal("9.90"), Decimal("1000.00")],
+    })
+
+
+def test_sem_filtro_nem_ordem_devolve_tudo(pedidos):
+    assert filtrar_ordenar_tabela(pedidos).equals(pedidos)
+
+
+def test_contem_ignora_maiusculas(pedidos):
+    df = filtrar_ordenar_tabela(pedidos, filter_query="{Empresa} icontains expresso")
+    assert list(df["Nº Pedido"]) == ["900003", "900002"]
+
+
+def test_comparacao_numerica(pedidos):
+    df = filtrar_ordenar_tabela(pedidos, filter_query="{Valor Crédito} > 100")
+    assert list(df["Nº Pedido"]) == ["900003", "900002"]
+    df = filtrar_ordenar_tabela(pedidos, filter_query="{Valor Crédito} le 20.5")
+    assert list(df["Nº Pedido"]) == ["900001", "900004"]
+
+
+def test_datas_filtradas_como_exibidas(pedidos):
+    df = filtrar_ordenar_tabela(pedidos, filter_query='{Data do Pedido} eq "05/03/2025"')
+    assert list(df["Nº Pedido"]) == ["900003", "900002"]
+    df = filtrar_ordenar_tabela(pedidos, filter_query="{Data do Pedido} datestartswith 02/04")
+    assert list(df["Nº Pedido"]) == ["900004"]
+
+
+def test_filtros_combinados_e_partes_desconhecidas(pedidos):
+    consulta = "{Empresa} icontains expresso && {Valor Crédito} < 500 && {Inexistente} eq 1 && lixo"
+    assert list(filtrar_ordenar_tabela(pedidos, filter_query=consulta)["Nº Pedido"]) == ["900003"]
+
+
+def test_ordena_por_varias_colunas_com_datas_como_datas(pedidos):
+    sort_by = [
+        {"column_id": "Data do Pedido", "direction": "desc"},
+        {"column_id": "Nº Pedido", "direction": "asc"},
+    ]
+    df = filtrar_ordenar_tabela(pedidos, sort_by=sort_by)
+    assert list(df["Nº Pedido"]) == ["900004", "900002", "900003", "900001"]
+
+
+def test_pagina_traz_so_as_linhas_e_colunas_pedidas(pedidos):
+    registros, total = pagina_tabela(
+        pedidos, 1, 3, sort_by=[{"column_id": "Nº Pedido", "direction": "asc"}],
+        colunas=["Nº Pedido", "Data do Pedido"],
+    )
+    assert total == 2
+    assert registros == [{"Nº Pedido": "900004", "Data do Pedido": "02/04/2025"}]
+
+
+def test_pagina_de_tabela_vazia(pedidos):
+    registros, total = pagina_tabela(pedidos, 0, 10, filter_query="{Empresa} eq ninguém")
+    assert registros == []
+    assert total == 1
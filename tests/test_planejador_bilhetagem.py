@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+
+import planejador_bilhetagem
+from planejador_bilhetagem import agrupar_em_janelas, planejar_janelas
+
+D = datetime.date
+
+
+def dias(inicio, fim):
+    return {inicio + datetime.timedelta(days=i) for i in range((fim - inicio).days + 1)}
+
+
+@pytest.fixture
+def cobertura(monkeypatch):
+    """Substitui a tabela de cobertura por um conjunto de dias em memória."""
+    cobertos = set()
+    monkeypatch.setattr(
+        planejador_bilhetagem, "datas_cobertas",
+        lambda engine, inicio, fim: {d for d in cobertos if inicio <= d <= fim},
+    )
+    return cobertos
+
+
+def test_agrupar_une_buracos_pequenos():
+    datas = [D(2025, 3, 1), D(2025, 3, 2), D(2025, 3, 5), D(2025, 3, 10)]
+    assert agrupar_em_janelas(datas, dias_para_unir=2) == [
+        (D(2025, 3, 1), D(2025, 3, 5)), (D(2025, 3, 10), D(2025, 3, 10)),
+    ]
+    assert agrupar_em_janelas(datas, dias_para_unir=0) == [
+        (D(2025, 3, 1), D(2025, 3, 2)), (D(2025, 3, 5), D(2025, 3, 5)), (D(2025, 3, 10), D(2025, 3, 10)),
+    ]
+    assert agrupar_em_janelas([]) == []
+
+
+def test_periodo_coberto_so_rebaixa_os_ultimos_dias(cobertura):
+    cobertura |= dias(D(2025, 3, 1), D(2025, 3, 31))
+    janelas = planejar_janelas(None, D(2025, 3, 1), D(2025, 3, 31), dias_reatualizar=7)
+    assert janelas == [("25/03/2025", "31/03/2025")]
+
+
+def test_buracos_viram_janelas_e_fim_de_semana_sem_dados_nao_falta(cobertura):
+    # A cobertura registra a janela baixada, mesmo que o fim de semana não tenha gerado linhas
+    cobertura |= dias(D(2025, 3, 1), D(2025, 3, 9)) | dias(D(2025, 3, 20), D(2025, 3, 31))
+    janelas = planejar_janelas(None, D(2025, 3, 1), D(2025, 3, 31), dias_reatualizar=3, dias_para_unir=1)
+    assert janelas == [("10/03/2025", "19/03/2025"), ("29/03/2025", "31/03/2025")]
+
+
+def test_janelas_proximas_sao_unidas(cobertura):
+    cobertura |= dias(D(2025, 3, 1), D(2025, 3, 31)) - {D(2025, 3, 10), D(2025, 3, 13)}
+    assert planejar_janelas(None, D(2025, 3, 1), D(2025, 3, 31), dias_reatualizar=0, dias_para_unir=2) == [
+        ("10/03/2025", "13/03/2025")
+    ]
+    assert planejar_janelas(None, D(2025, 3, 1), D(2025, 3, 31), dias_reatualizar=0, dias_para_unir=1) == [
+        ("10/03/2025", "10/03/2025"), ("13/03/2025", "13/03/2025")
+    ]
+
+
+def test_sem_cobertura_baixa_tudo_em_uma_janela(cobertura):
+    assert planejar_janelas(None, D(2025, 3, 1), D(2025, 3, 31)) == [("01/03/2025", "31/03/2025")]
+
+
+def test_periodo_invertido_nao_gera_janelas(cobertura):
+    assert planejar_janelas(None, D(2025, 4, 1), D(2025, 3, 1)) == []
+
+
+def test_sem_data_inicial_e_banco_vazio(monkeypatch, cobertura):
+    monkeypatch.setattr(planejador_bilhetagem, "primeira_data_coberta", lambda engine: None)
+    monkeypatch.setattr(planejador_bilhetagem, "primeira_data_carregada", lambda engine: None)
+    with pytest.raises(ValueError):
+        planejar_janelas(None, ate=D(2025, 3, 31))
+
+
+def test_sem_data_inicial_usa_a_primeira_data_coberta(monkeypatch, cobertura):
+    cobertura |= dias(D(2025, 3, 10), D(2025, 3, 31))
+    monkeypatch.setattr(planejador_bilhetagem, "primeira_data_coberta", lambda engine: D(2025, 3, 10))
+    assert planejar_janelas(None, ate=D(2025, 3, 31), dias_reatualizar=1) == [("31/03/2025", "31/03/2025")]
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from vtadmin_via_selenium import aguardar_download, listar_csvs
+
+
+def test_listar_csvs_inclui_downloads_parciais(tmp_path):
+    for nome in ("a.csv", "B.CSV", "c.csv.crdownload", "notas.txt"):
+        (tmp_path / nome).write_text("x")
+    assert listar_csvs(str(tmp_path)) == {"a.csv", "B.CSV", "c.csv.crdownload"}
+
+
+def test_parcial_antigo_nao_bloqueia_o_download(tmp_path):
+    (tmp_path / "Unconfirmed 123.crdownload").write_bytes(b"resto de uma execucao interrompida")
+    (tmp_path / "anterior.csv").write_text("ja estava na pasta")
+    antes = listar_csvs(str(tmp_path))
+    (tmp_path / "relatorio.csv").write_text("a;b\n1;2\n")
+    assert aguardar_download(str(tmp_path), antes, timeout=2, intervalo=0.01) == str(tmp_path / "relatorio.csv")
+
+
+def test_parcial_novo_espera_o_fim_do_download(tmp_path):
+    antes = listar_csvs(str(tmp_path))
+    parcial = tmp_path / "relatorio.csv.crdownload"
+    parcial.write_text("a;b\n")
+
+    def concluir():
+        parcial.rename(tmp_path / "relatorio.csv")
+
+    threading.Timer(0.2, concluir).start()
+    assert aguardar_download(str(tmp_path), antes, timeout=3, intervalo=0.02) == str(tmp_path / "relatorio.csv")
+
+
+def test_sem_csv_novo_estoura_o_tempo(tmp_path):
+    (tmp_path / "anterior.csv").write_text("ja estava na pasta")
+    (tmp_path / "outro.csv.crdownload").write_text("")
+    antes = listar_csvs(str(tmp_path))
+    with pytest.raises(TimeoutError):
+        aguardar_download(str(tmp_path), antes, timeout=0.1, intervalo=0.02)
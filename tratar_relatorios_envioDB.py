@@ -1,75 +1,226 @@
 #sript abaixo é tratar_relatorios_envioDB.py
 import os
+import re
+import codecs
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import argparse
 import glob
+from decimal import Decimal
 import pandas as pd
-from vtadmin_via_selenium import download_dir 
-from vtadmin_via_selenium import main as selenium_main
+from config_vtadmin import download_dir
+from vtadmin_via_selenium import main as selenium_main, SessaoVTAdmin
 from sqlalchemy import text
+from sqlalchemy.types import Date, DECIMAL, CHAR, Integer
 import numpy as np
 
 from db_bilhetagem import get_engine # Importa o diretório de downloads
+from planejador_bilhetagem import (
+    planejar_janelas, data_br, DIAS_REATUALIZAR, garantir_tabela_cobertura, registrar_cobertura
+)
+from empresas_bilhetagem import garantir_tabela_empresas, atribuir_empresa_id
+from reconciliacao_bilhetagem import garantir_tabela_pedido_pagamento, atualizar_pedido_pagamento
+from kpis_bilhetagem import (
+    garantir_tabelas_kpi, atualizar_kpis_pedidos, atualizar_kpis_boletos, meses_de, meses_pedidos_novos,
+    reconstruir_kpis
+)
+from carga_bilhetagem import (
+    upsert_por_chave, inserir_novos_por_hash, calcular_hash_linhas, normalizar_identificador, relatar_velocidade,
+    COLUNAS_IDENTIFICADOR,
+    ESTRATEGIAS_CARGA, ESTRATEGIA_CARGA_PADRAO, TAMANHO_LOTE_PADRAO,
+    garantir_tabela_manifesto, checksums_carregados, info_arquivo, registrar_arquivo,
+    publicar_nova_versao, garantir_tabela_versao, incrementar_versao_dados
+)
 
 # Renomeia para maior clareza
 base_dir = download_dir
 
-def ler_csv_com_codificacao(arquivo):
+# Tipos nativos das colunas de data e valor (o restante continua como texto)
+DTYPES_PEDIDOS = {"Data do Pedido": Date(), "Valor Crédito": DECIMAL(14, 2), "empresa_id": Integer()}
+DTYPES_BOLETOS = {
+    "Emissão": Date(), "Pagamento": Date(), "Valor": DECIMAL(14, 2), "hash_linha": CHAR(40), "empresa_id": Integer()
+}
+
+_RE_VALOR = re.compile(r"^-?\d+(\.\d+)?$")
+
+# Leitura dos CSVs: amostra usada para detectar a codificação e tamanho dos lotes em linhas
+TAMANHO_AMOSTRA_CODIFICACAO = 64 * 1024
+LINHAS_POR_LOTE = 50000
+# Codificações tentadas em ordem; ISO-8859-1 aceita qualquer byte e encerra a lista
+CODIFICACOES = ["utf-8", "windows-1252", "ISO-8859-1"]
+
+def converter_datas_br(serie):
+    """
+    Converte uma coluna de datas "dd/mm/yyyy" para datetime.date.
+    Datas inválidas ou vazias viram None (NULL no banco).
+    """
+    datas = pd.to_datetime(serie, format="%d/%m/%Y", errors="coerce")
+    return datas.dt.date.astype(object).where(datas.notna(), None)
+
+def converter_valores_br(serie):
+    """
+    Converte valores monetários "R$ 1.234,56" para Decimal("1234.56").
+    Valores inválidos ou vazios viram None (NULL no banco).
+    """
+    texto = (
+        serie.astype(str)
+        .str.replace("R$", "", regex=False)
+        .str.replace("\xa0", "", regex=False)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .str.strip()
+    )
+    return texto.map(lambda v: Decimal(v) if _RE_VALOR.match(v) else None)
+
+def converter_identificadores(serie):
     """
-    Tenta ler o arquivo CSV utilizando diferentes codificações, sem interpretar
-    a primeira linha como cabeçalho (header=None).
+    Converte uma coluna de identificadores para o texto canônico usado no hash e nas junções
+    entre tabelas: 900018, 900018.0 e "900018.0" viram "900018" (o lote do totalizador chega
+    do pandas como float). Valores vazios viram None (NULL no banco).
     """
-    encodings = ['utf-8', 'ISO-8859-1', 'windows-1252']
-    for enc in encodings:
+    return serie.map(lambda v: normalizar_identificador(v) or None)
+
+def detectar_codificacao(arquivo, tamanho_amostra=TAMANHO_AMOSTRA_CODIFICACAO):
+    """
+    Descobre a codificação do arquivo a partir de uma amostra dos primeiros bytes,
+    sem precisar ler o arquivo inteiro uma vez para cada codificação testada.
+    """
+    with open(arquivo, "rb") as f:
+        amostra = f.read(tamanho_amostra)
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in CODIFICACOES[:-1]:
         try:
-            # Lê o CSV sem cabeçalho para que todos os dados sejam tratados como dados
-            return pd.read_csv(arquivo, encoding=enc, header=None), enc
+            # final=False: um caractere multibyte cortado no fim da amostra não conta como erro
+            codecs.getincrementaldecoder(enc)().decode(amostra, final=False)
+            return enc
         except UnicodeDecodeError:
             continue
-    return None, None
+    return "ISO-8859-1"
 
-def tratar_pedidos_provider_v2(base_dir):
+def _lotes_csv(arquivo, codificacoes, linhas_por_lote):
     """
-    Processa os arquivos CSV encontrados na pasta 'Pedidos Provider - V2'.
-    
-    Etapas de tratamento:
-      1. Remove as 7 primeiras colunas.
-      2. Na primeira coluna que sobrou, remove a string "Empresa:" de todos os dados.
-      3. Exclui as colunas de índice 1 a 10, mantendo apenas a de índice 2.
-      4. Remove todas as colunas completamente vazias.
-      5. Remove as 3 últimas colunas.
-      6. Atribui novos títulos: ["Empresa", "Código da Empresa", "Nº Pedido", "Data do Pedido", "Taxa Adm.", "Valor Crédito", "Status"].
+    Gera os lotes do CSV decodificando de forma estrita com a primeira codificação da lista.
+    Se aparecer um byte inválido depois da amostra, recomeça o arquivo com a próxima
+    codificação e pula as linhas que já foram entregues.
+    """
+    entregues = 0
+    for i, enc in enumerate(codificacoes):
+        pular = entregues
+        try:
+            for df in pd.read_csv(arquivo, encoding=enc, header=None, chunksize=linhas_por_lote):
+                if pular:
+                    if len(df) <= pular:
+                        pular -= len(df)
+                        continue
+                    df = df.iloc[pular:]
+                    pular = 0
+                entregues += len(df)
+                yield df
+            return
+        except UnicodeDecodeError:
+            if i == len(codificacoes) - 1:
+                raise
+            print(f"⚠ Byte inválido para '{enc}' após a linha {entregues}. "
+                  f"Recomeçando a leitura com '{codificacoes[i + 1]}'...")
 
-    Retorna:
-      Uma lista de DataFrames resultantes do tratamento de cada arquivo CSV.
+def ler_csv_em_lotes(arquivo, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    Lê o CSV sem cabeçalho (header=None) em lotes de `linhas_por_lote` linhas,
+    decodificando cada byte uma única vez com a codificação detectada na amostra.
+    A leitura é estrita: um byte inválido depois da amostra faz o arquivo ser relido com a
+    próxima codificação de CODIFICACOES, em vez de virar U+FFFD nos nomes e no hash das linhas.
+
+    Retorna o iterador de DataFrames e a codificação detectada.
+    """
+    enc = detectar_codificacao(arquivo)
+    base = "utf-8" if enc == "utf-8-sig" else enc
+    alternativas = CODIFICACOES[CODIFICACOES.index(base) + 1:] if base in CODIFICACOES else []
+    return _lotes_csv(arquivo, [enc] + alternativas, linhas_por_lote), enc
+
+def ler_csv_com_codificacao(arquivo):
+    """
+    Lê o arquivo CSV inteiro, sem interpretar a primeira linha como cabeçalho (header=None),
+    usando a codificação detectada por detectar_codificacao.
+    """
+    try:
+        lotes, enc = ler_csv_em_lotes(arquivo)
+        return pd.concat(list(lotes), ignore_index=True), enc
+    except UnicodeDecodeError:
+        return None, None
+
+def _marcar_ultimo(iteravel):
+    """Gera pares (item, é_o_último), olhando um item à frente."""
+    iterador = iter(iteravel)
+    try:
+        anterior = next(iterador)
+    except StopIteration:
+        return
+    for atual in iterador:
+        yield anterior, False
+        anterior = atual
+    yield anterior, True
+
+def listar_arquivos_csv(base_dir, pasta_name, engine=None, force=False):
+    """
+    Lista os arquivos CSV da pasta do relatório que precisam ser processados.
+
+    Com `engine`, consulta o manifesto (arquivos_ingeridos) e ignora os arquivos cujo
+    conteúdo (checksum) já foi carregado. Com force=True todos os arquivos são processados.
+
+    Retorna uma lista de pares (caminho do arquivo, registro do manifesto).
     """
-    pasta_name = "Pedidos Provider - V2"
     pasta_path = os.path.join(base_dir, pasta_name)
-    dataframes_resultantes = []  # Lista para armazenar os DataFrames finais
-    
     if not os.path.exists(pasta_path):
         print(f"🚫 Pasta '{pasta_name}' não encontrada.")
-        return dataframes_resultantes  # Retorna lista vazia
+        return []
 
-    arquivos_csv = glob.glob(os.path.join(pasta_path, "*.csv"))
+    arquivos_csv = sorted(glob.glob(os.path.join(pasta_path, "*.csv")))
     if not arquivos_csv:
         print("❌ Nenhum arquivo CSV encontrado na pasta.")
-        return dataframes_resultantes  # Retorna lista vazia
+        return []
 
-    for arquivo in arquivos_csv:
-        print(f"📄 Processando o arquivo: {arquivo}")
-        df, encoding_usada = ler_csv_com_codificacao(arquivo)
-        if df is None:
-            print(f"⚠ Erro ao ler o arquivo {arquivo}")
-            continue
-        
-        print(f"✅ Arquivo lido com sucesso utilizando codificação '{encoding_usada}'.")
+    arquivos = [(arquivo, info_arquivo(arquivo, pasta_name)) for arquivo in arquivos_csv]
+    if engine is None or force:
+        return arquivos
+
+    carregados = checksums_carregados(engine, pasta_name)
+    pendentes = [(arquivo, info) for arquivo, info in arquivos if info["checksum"] not in carregados]
+    ignorados = len(arquivos) - len(pendentes)
+    if ignorados:
+        print(f"⏭️ {ignorados} arquivo(s) de '{pasta_name}' já carregados anteriormente foram ignorados.")
+    return pendentes
+
+def _resolver_colunas_pedidos(df_tratado):
+    """
+    Decide, a partir do primeiro lote, quais colunas do relatório de pedidos são mantidas:
+    descarta as colunas completamente vazias e depois as 3 últimas.
+    O layout vale para todos os lotes do arquivo, para que as colunas fiquem alinhadas
+    mesmo que um lote específico tenha alguma coluna vazia por acaso.
+    """
+    colunas = list(df_tratado.dropna(axis=1, how='all').columns)
+    if len(colunas) > 3:
+        return colunas[:-3]
+    print("⚠ Não há colunas suficientes para remover as 3 últimas.")
+    return colunas
+
+def iterar_pedidos_provider_v2(arquivo, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    Lê e trata um arquivo do relatório 'Pedidos Provider - V2' em lotes, gerando um
+    DataFrame tratado por lote (ver tratar_pedidos_provider_v2 para as etapas).
+    A memória usada fica limitada ao tamanho do lote, independente do tamanho do arquivo.
+    """
+    lotes, encoding_usada = ler_csv_em_lotes(arquivo, linhas_por_lote)
+    print(f"✅ Arquivo aberto utilizando codificação '{encoding_usada}'.")
 
+    colunas_mantidas = None
+    novos_titulos = ["Empresa", "Código da Empresa", "Nº Pedido", "Data do Pedido", "Taxa Adm.", "Valor Crédito", "Status"]
+    for df in lotes:
         # Remover as 7 primeiras colunas
         if df.shape[1] <= 7:
             print("⚠ O arquivo possui 7 ou menos colunas. Não é possível remover as 7 primeiras colunas.")
-            continue
-        df_tratado = df.iloc[:, 7:]
-        print("📝 DataFrame após remover as 7 primeiras colunas:")
-        #print(df_tratado.head())
+            return
+        df_tratado = df.iloc[:, 7:].copy()
 
         # Na primeira coluna (índice 0) remova "Empresa:" dos valores e limpe espaços extras
         df_tratado.iloc[:, 0] = (
@@ -78,8 +229,6 @@ def tratar_pedidos_provider_v2(base_dir):
             .str.replace("Empresa:", "", regex=False)
             .str.strip()
         )
-        print("📝 DataFrame após remover 'Empresa:' da primeira coluna (dados):")
-        #print(df_tratado.head())
 
         # Excluir as colunas de índice 1 a 10, mantendo a de índice 2
         indices_para_remover = [i for i in range(1, 11) if i != 2]
@@ -87,118 +236,158 @@ def tratar_pedidos_provider_v2(base_dir):
             df_tratado.columns[i] for i in indices_para_remover if i < len(df_tratado.columns)
         ]
         df_tratado = df_tratado.drop(columns=colunas_para_remover)
-        print("📝 DataFrame após remover colunas de índice 1 a 10 (exceto índice 2):")
-        #print(df_tratado.head())
-
-        # Remover colunas completamente vazias
-        df_tratado = df_tratado.dropna(axis=1, how='all')
-        print("📝 DataFrame após remover colunas completamente vazias:")
-        #print(df_tratado.head())
-
-        # Remover as 3 últimas colunas, se houver pelo menos 3 colunas disponíveis
-        if df_tratado.shape[1] > 3:
-            df_tratado = df_tratado.iloc[:, :-3]
-            print("📝 DataFrame após remover as 3 últimas colunas:")
-            #print(df_tratado.head())
-        else:
-            print("⚠ Não há colunas suficientes para remover as 3 últimas.")
+
+        # Remover colunas completamente vazias e as 3 últimas (layout decidido no primeiro lote)
+        if colunas_mantidas is None:
+            colunas_mantidas = _resolver_colunas_pedidos(df_tratado)
+        df_tratado = df_tratado[colunas_mantidas]
 
         # Definir os novos títulos das colunas
-        novos_titulos = ["Empresa", "Código da Empresa", "Nº Pedido", "Data do Pedido", "Taxa Adm.", "Valor Crédito", "Status"]
         if df_tratado.shape[1] == len(novos_titulos):
             df_tratado.columns = novos_titulos
-            print("📝 DataFrame com colunas renomeadas:")
-            print(df_tratado.head())
+            df_tratado["Nº Pedido"] = converter_identificadores(df_tratado["Nº Pedido"])
+            df_tratado["Data do Pedido"] = converter_datas_br(df_tratado["Data do Pedido"])
+            df_tratado["Valor Crédito"] = converter_valores_br(df_tratado["Valor Crédito"])
         else:
             print(f"⚠ Atenção: Número de colunas ({df_tratado.shape[1]}) difere do esperado ({len(novos_titulos)}).")
-        
-        
-        # Excluir linhas com os códigos indesejados na coluna "Código da Empresa"
-        if "Código da Empresa" in df_tratado.columns:
-            codigos_excluir = [77776, 99999, 3, 27717, 99998, 77777, 77778,28671,
-                               142,5823,24023,]
-            df_tratado = df_tratado[~df_tratado["Código da Empresa"].isin(codigos_excluir)]
-            print("🗑️ Linhas com os códigos indesejados foram removidas:", codigos_excluir)
-        else:
-            print("⚠ Coluna 'Código da Empresa' não encontrada para realizar a exclusão.")
 
-        
+        # As empresas não contabilizáveis não são mais descartadas aqui: ficam marcadas na
+        # tabela `empresas` e são excluídas na leitura (ver empresas_bilhetagem.py)
+
+        print(f"📝 Lote tratado: {len(df_tratado)} linhas.")
+        yield df_tratado
+
+def _tratar_arquivo(iterar, arquivo):
+    """
+    Trata um arquivo inteiro com a função geradora `iterar` e junta os lotes.
+    Roda tanto no processo principal quanto nos processos do pool; erros são devolvidos
+    em vez de levantados, para que um arquivo com problema não interrompa os demais.
+
+    Retorna (DataFrame ou None, mensagem de erro ou None).
+    """
+    try:
+        lotes = list(iterar(arquivo))
+        if not lotes:
+            return None, "nenhum dado tratado"
+        return pd.concat(lotes, ignore_index=True), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _tratar_pasta(base_dir, pasta_name, iterar, engine=None, force=False, workers=1):
+    """
+    Trata todos os arquivos pendentes da pasta do relatório.
+    Com workers > 1 os arquivos são distribuídos em um pool de processos; a lista
+    resultante mantém a ordem dos arquivos independente de qual termina primeiro.
+    Arquivos com erro são pulados e listados no final.
+    """
+    arquivos = listar_arquivos_csv(base_dir, pasta_name, engine, force)
+    caminhos = [arquivo for arquivo, _ in arquivos]
+    if workers > 1 and len(caminhos) > 1:
+        print(f"⚙️ Tratando {len(caminhos)} arquivos de '{pasta_name}' em {workers} processos...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(_tratar_arquivo, repeat(iterar), caminhos))
+    else:
+        resultados = [_tratar_arquivo(iterar, arquivo) for arquivo in caminhos]
+
+    dataframes_resultantes = []  # Lista para armazenar os DataFrames finais
+    falhas = []
+    for (arquivo, info), (df_tratado, erro) in zip(arquivos, resultados):
+        if df_tratado is None:
+            falhas.append((arquivo, erro))
+            continue
+        print(f"📄 Arquivo tratado: {arquivo} ({len(df_tratado)} linhas)")
+        print(df_tratado.head())
         print("-" * 40)
-        
+
         # Adiciona o DataFrame tratado à lista de resultados
+        df_tratado.attrs["arquivo"] = info
         dataframes_resultantes.append(df_tratado)
 
+    if falhas:
+        print(f"⚠ {len(falhas)} arquivo(s) de '{pasta_name}' não puderam ser tratados:")
+        for arquivo, erro in falhas:
+            print(f"   - {arquivo}: {erro}")
     return dataframes_resultantes
 
-def tratar_boletos_pago_v3(base_dir):
+def tratar_pedidos_provider_v2(base_dir, engine=None, force=False, workers=1):
     """
-    Processa os arquivos CSV encontrados na pasta "Boletos Pago (por data de pagamento - V3)".
+    Processa os arquivos CSV encontrados na pasta 'Pedidos Provider - V2'.
+    
+    Etapas de tratamento:
+      1. Remove as 7 primeiras colunas.
+      2. Na primeira coluna que sobrou, remove a string "Empresa:" de todos os dados.
+      3. Exclui as colunas de índice 1 a 10, mantendo apenas a de índice 2.
+      4. Remove todas as colunas completamente vazias.
+      5. Remove as 3 últimas colunas.
+      6. Atribui novos títulos: ["Empresa", "Código da Empresa", "Nº Pedido", "Data do Pedido", "Taxa Adm.", "Valor Crédito", "Status"].
+      7. Converte "Nº Pedido" para o texto canônico (converter_identificadores).
 
-    Fluxo do tratamento:
-      - Seleciona as primeiras 20 colunas e mantém somente a coluna 10 (índice 9) e a coluna 12 (índice 11).
-      - Mantém todas as colunas a partir da 21ª (índice 20 em diante).
-      - Concatena esses conjuntos para formar o DataFrame final.
-      - Exclui as duas últimas colunas do DataFrame final.
-      - Renomeia as colunas resultantes para:
-        [ "Banco", "Empresa", "Emissão", "Pagamento", "Processado", "Liberação", 
-          "Nosso Número", "Número Pedido", "Valor Pedido", "Valor" ]
+    Com `engine`, arquivos já registrados no manifesto são ignorados (a menos que force=True).
+    Com workers > 1, os arquivos são tratados em paralelo em um pool de processos.
 
     Retorna:
-      Uma lista de DataFrames resultantes do tratamento de cada arquivo CSV.
+      Uma lista de DataFrames resultantes do tratamento de cada arquivo CSV, na ordem dos arquivos.
+      O registro do manifesto de cada arquivo fica em df.attrs["arquivo"].
+      Para arquivos grandes, prefira iterar_pedidos_provider_v2, que não junta os lotes em memória.
     """
-    pasta_name = "Boletos Pago (por data de pagamento - V3)"
-    pasta_path = os.path.join(base_dir, pasta_name)
-    dataframes_resultantes = []  # Lista para armazenar os DataFrames finais
-    
-    if not os.path.exists(pasta_path):
-        print(f"🚫 Pasta '{pasta_name}' não encontrada.")
-        return dataframes_resultantes
+    return _tratar_pasta(
+        base_dir, "Pedidos Provider - V2", iterar_pedidos_provider_v2, engine, force, workers
+    )
 
-    arquivos_csv = glob.glob(os.path.join(pasta_path, "*.csv"))
-    if not arquivos_csv:
-        print("❌ Nenhum arquivo CSV encontrado na pasta.")
-        return dataframes_resultantes
+def _ajustar_ultima_linha_boletos(df):
+    """
+    A última linha do relatório de boletos (totalizador) vem com uma coluna a menos a partir
+    da coluna 11 (índice 10). Desloca esses valores uma posição para a direita.
+    """
+    # Verifica se a última linha tem menos colunas do que deveria
+    if df.iloc[-1].isnull().sum() == 0:  # Confirma que há colunas ausentes na última linha
+        return df
+    print(df.iloc[-5:, 10:18])
 
-    for arquivo in arquivos_csv:
-        print(f"📄 Processando o arquivo: {arquivo}")
-        df, encoding_usada = ler_csv_com_codificacao(arquivo)
-        if df is None:
-            print(f"⚠ Erro ao ler o arquivo {arquivo}")
-            continue
-        
-        print(f"✅ Arquivo lido com sucesso utilizando codificação '{encoding_usada}'.")
-        print(df.iloc[-5:, 10:18])
+    # Copia a última linha problemática
+    last_row = df.iloc[-1].copy()
+    new_row = last_row.copy()
 
-        # Verifica se a última linha tem menos colunas do que deveria
-        if df.iloc[-1].isnull().sum() > 0:  # Confirma que há colunas ausentes na última linha
-            # Copia a última linha problemática
-            last_row = df.iloc[-1].copy()
-            new_row = last_row.copy()
+    # Pega todos os valores a partir da coluna 11 (índice 10)
+    valores = new_row.iloc[10:].values
 
-            # Pega todos os valores a partir da coluna 11 (índice 10)
-            valores = new_row.iloc[10:].values
+    # Cria uma lista com o novo alinhamento: insere None no início e desloca os demais para a direita
+    novos_valores = [np.nan]  + list(valores[:-1])
 
-            # Cria uma lista com o novo alinhamento: insere None no início e desloca os demais para a direita
-            novos_valores = [np.nan]  + list(valores[:-1])
+    # Atribui os novos valores às colunas a partir da coluna 11
+    new_row.iloc[10:] = novos_valores
 
-            # Atribui os novos valores às colunas a partir da coluna 11
-            new_row.iloc[10:] = novos_valores
+    # Insere a nova linha no final do DataFrame
+    df = pd.concat([df, new_row.to_frame().T], ignore_index=True)
 
-            # Insere a nova linha no final do DataFrame
-            df = pd.concat([df, new_row.to_frame().T], ignore_index=True)
+    # Exclui a penúltima linha (a linha original desalinhada)
+    df = df.drop(df.index[-2]).reset_index(drop=True)
 
-            # Exclui a penúltima linha (a linha original desalinhada)
-            df = df.drop(df.index[-2]).reset_index(drop=True)
+    print("✅ Última linha ajustada.")
+    print(df.iloc[-5:, 10:18])
+    return df
 
+def iterar_boletos_pago_v3(arquivo, linhas_por_lote=LINHAS_POR_LOTE):
+    """
+    Lê e trata um arquivo do relatório 'Boletos Pago (por data de pagamento - V3)' em lotes,
+    gerando um DataFrame tratado por lote (ver tratar_boletos_pago_v3 para as etapas).
+    O ajuste da última linha é aplicado apenas no último lote do arquivo.
+    """
+    lotes, encoding_usada = ler_csv_em_lotes(arquivo, linhas_por_lote)
+    print(f"✅ Arquivo aberto utilizando codificação '{encoding_usada}'.")
 
+    colunas_finais = [
+        "Banco", "Empresa", "Emissão", "Pagamento", "Processado", 
+        "Liberação", "Nosso Número", "Número Pedido", "Valor Pedido", "Valor"
+    ]
+    for df, ultimo in _marcar_ultimo(lotes):
+        if ultimo:
+            df = _ajustar_ultima_linha_boletos(df)
 
-            print("✅ Última linha ajustada.")
-            print(df.iloc[-5:, 10:18])
-        
         # Verifica se o DataFrame possui ao menos 20 colunas para a primeira etapa
         if df.shape[1] < 20:
             print("⚠ O arquivo não possui 20 colunas. Pulando este arquivo.")
-            continue
+            return
 
         # Seleciona as primeiras 20 colunas
         df_first20 = df.iloc[:, :20]
@@ -208,32 +397,53 @@ def tratar_boletos_pago_v3(base_dir):
         df_remaining = df.iloc[:, 20:]
         # Concatena os conjuntos horizontalmente
         df_tratado = pd.concat([df_keep, df_remaining], axis=1)
-        
+
         # Exclui as duas últimas colunas do DataFrame final
-        if df_tratado.shape[1] < 2:
-            print("⚠ O DataFrame não possui colunas suficientes para remover as duas últimas.")
-            continue
         df_tratado = df_tratado.iloc[:, :-2]
 
         # Renomeia as colunas para os nomes desejados
-        colunas_finais = [
-            "Banco", "Empresa", "Emissão", "Pagamento", "Processado", 
-            "Liberação", "Nosso Número", "Número Pedido", "Valor Pedido", "Valor"
-        ]
-        
         if df_tratado.shape[1] == len(colunas_finais):
             df_tratado.columns = colunas_finais
-            print("📝 DataFrame final com colunas renomeadas:")
-            print(df_tratado.head())
+            df_tratado["Emissão"] = converter_datas_br(df_tratado["Emissão"])
+            df_tratado["Pagamento"] = converter_datas_br(df_tratado["Pagamento"])
+            df_tratado["Valor"] = converter_valores_br(df_tratado["Valor"])
+            for coluna in COLUNAS_IDENTIFICADOR:
+                df_tratado[coluna] = converter_identificadores(df_tratado[coluna])
+            df_tratado["hash_linha"] = calcular_hash_linhas(df_tratado)
         else:
             print(f"⚠ O DataFrame final não possui {len(colunas_finais)} colunas. Atual: {df_tratado.shape[1]}")
-        
-        print("-" * 40)
-        
-        # Adiciona o DataFrame tratado à lista de resultados
-        dataframes_resultantes.append(df_tratado)
 
-    return dataframes_resultantes
+        print(f"📝 Lote tratado: {len(df_tratado)} linhas.")
+        yield df_tratado
+
+def tratar_boletos_pago_v3(base_dir, engine=None, force=False, workers=1):
+    """
+    Processa os arquivos CSV encontrados na pasta "Boletos Pago (por data de pagamento - V3)".
+
+    Fluxo do tratamento:
+      - Seleciona as primeiras 20 colunas e mantém somente a coluna 10 (índice 9) e a coluna 12 (índice 11).
+      - Mantém todas as colunas a partir da 21ª (índice 20 em diante).
+      - Concatena esses conjuntos para formar o DataFrame final.
+      - Exclui as duas últimas colunas do DataFrame final.
+      - Renomeia as colunas resultantes para:
+        [ "Banco", "Empresa", "Emissão", "Pagamento", "Processado", "Liberação", 
+          "Nosso Número", "Número Pedido", "Valor Pedido", "Valor" ]
+      - Converte "Nosso Número" e "Número Pedido" para o texto canônico (converter_identificadores),
+        o mesmo usado no hash e nas junções com pedidos_provider_v2.
+      - Acrescenta a coluna "hash_linha", o SHA-1 do conteúdo da linha, usada pelo
+        índice único de boletos_pago_v3 para rejeitar duplicados na inserção.
+
+    Com `engine`, arquivos já registrados no manifesto são ignorados (a menos que force=True).
+    Com workers > 1, os arquivos são tratados em paralelo em um pool de processos.
+
+    Retorna:
+      Uma lista de DataFrames resultantes do tratamento de cada arquivo CSV, na ordem dos arquivos.
+      O registro do manifesto de cada arquivo fica em df.attrs["arquivo"].
+      Para arquivos grandes, prefira iterar_boletos_pago_v3, que não junta os lotes em memória.
+    """
+    return _tratar_pasta(
+        base_dir, "Boletos Pago (por data de pagamento - V3)", iterar_boletos_pago_v3, engine, force, workers
+    )
 
 
 
@@ -244,148 +454,277 @@ def tratar_boletos_pago_v3(base_dir):
 def remove_duplicados(engine, tabela):
     """
     Remove registros duplicados (todas as colunas iguais) da tabela especificada.
-    """
-    with engine.begin() as conn:
-        temp_table = f"temp_{tabela}"
-        print(f"🧹 Removendo duplicados da tabela {tabela}...")
-        conn.execute(text(f"CREATE TABLE {temp_table} AS SELECT DISTINCT * FROM {tabela};"))
-        conn.execute(text(f"TRUNCATE TABLE {tabela};"))
-        conn.execute(text(f"INSERT INTO {tabela} SELECT * FROM {temp_table};"))
-        conn.execute(text(f"DROP TABLE {temp_table};"))
-        print(f"✅ Duplicados removidos da tabela {tabela}.")
+    Não faz parte da carga normal: boletos_pago_v3 rejeita duplicados pelo índice único
+    de 'hash_linha'. Fica disponível como manutenção (--dedup-boletos).
 
-
-    
-def delete_registros_intervalo(engine, tabela, data_inicial, data_final):
-    """
-    Apaga os registros da tabela que possuem a "Data do Pedido" 
-    entre data_inicial e data_final (inclusive) e retorna a quantidade de registros apagados.
-
-    Parâmetros:
-      - engine: objeto de conexão com o banco.
-      - tabela: nome da tabela onde os registros serão deletados.
-      - data_inicial: data inicial no formato "dd/mm/yyyy".
-      - data_final: data final no formato "dd/mm/yyyy".
-    """
-    with engine.begin() as conn:
-        print(f"🧹 Deletando registros da tabela {tabela} entre {data_inicial} e {data_final}...")
-        query = f"""
-            DELETE FROM {tabela}
-            WHERE STR_TO_DATE(`Data do Pedido`, '%d/%m/%Y') BETWEEN 
-                  STR_TO_DATE(:data_inicial, '%d/%m/%Y') AND STR_TO_DATE(:data_final, '%d/%m/%Y')
-        """
-        result = conn.execute(text(query), {"data_inicial": data_inicial, "data_final": data_final})
-        deleted_count = result.rowcount
-        print(f"✅ Registros deletados: {deleted_count}.")
-    return deleted_count
-
-def remove_duplicados_por_num_pedido(engine, tabela, pk="id"):
-    """
-    Remove registros duplicados mantendo apenas um registro para cada 'Nº Pedido',
-    de modo que seja preservado o registro com o maior valor de {pk} (mais recente).
+    A versão sem duplicados é montada em uma cópia e publicada com RENAME TABLE,
+    então o dashboard nunca encontra a tabela vazia durante a limpeza. A ingestão precisa
+    estar parada: linhas gravadas na tabela antiga durante a cópia não entram na nova versão.
     """
-    try:
-        with engine.begin() as conn:
-            temp_table = f"temp_{tabela}"
-            print(f"🧹 Removendo duplicados da tabela '{tabela}' com base em 'Nº Pedido', mantendo o maior {pk}...")
-
-            # Verificar se existem dados na tabela antes de processar
-            count_query = f"SELECT COUNT(*) FROM db_bilhetagem.{tabela}"
-            count = conn.execute(text(count_query)).scalar()
-            print(f"Registros na tabela original antes do processamento: {count}")
-            
-            if count == 0:
-                print(f"⚠️ Nenhum registro encontrado em {tabela}. Pulando processamento.")
-                return
-
-            # Se a tabela temporária já existir, removê-la
-            conn.execute(text(f"DROP TABLE IF EXISTS db_bilhetagem.{temp_table};"))
-
-            # 1. Cria uma tabela temporária com a mesma estrutura da tabela original.
-            conn.execute(text(f"CREATE TABLE db_bilhetagem.{temp_table} LIKE db_bilhetagem.{tabela};"))
-
-            # 2. Insere na tabela temporária apenas os registros que possuem o maior {pk} para cada 'Nº Pedido'
-            insert_query = f"""
-                INSERT INTO db_bilhetagem.{temp_table}
-                SELECT t.*
-                FROM db_bilhetagem.{tabela} AS t
-                JOIN (
-                    SELECT `Nº Pedido`, MAX({pk}) AS max_id
-                    FROM db_bilhetagem.{tabela}
-                    GROUP BY `Nº Pedido`
-                ) AS filtro
-                ON t.{pk} = filtro.max_id;
-            """
-
-            result = conn.execute(text(insert_query))
-            print(f"Linhas inseridas na tabela temporária: {result.rowcount}")
-
-            # Verificar dados na tabela temporária
-            temp_count = conn.execute(text(f"SELECT COUNT(*) FROM db_bilhetagem.{temp_table}")).scalar()
-            print(f"Registros na tabela temporária: {temp_count}")
-
-            # 3. Limpa a tabela original
-            conn.execute(text(f"TRUNCATE TABLE db_bilhetagem.{tabela};"))
-
-            # 4. Reinsere os registros filtrados de volta na tabela original
-            result2 = conn.execute(text(f"INSERT INTO db_bilhetagem.{tabela} SELECT * FROM db_bilhetagem.{temp_table};"))
-            print(f"Registros reinseridos na tabela original: {result2.rowcount}")
-
-            # 5. Remove a tabela temporária
-            conn.execute(text(f"DROP TABLE db_bilhetagem.{temp_table};"))
-
-            print(f"✅ Duplicados removidos de '{tabela}' mantendo apenas o registro com maior {pk}.")
-    except Exception as e:
-        print(f"❌ Erro ao processar tabela {tabela}: {str(e)}")
-
+    print(f"🧹 Removendo duplicados da tabela {tabela}...")
+    antes = contar_registros(engine, tabela)
+    depois = publicar_nova_versao(
+        engine, tabela,
+        lambda conn, nova: conn.execute(text(f"INSERT INTO {nova} SELECT DISTINCT * FROM {tabela};")).rowcount
+    )
+    print(f"✅ Duplicados removidos da tabela {tabela}: {antes - depois} registros.")
+
+def contar_registros(engine, tabela):
+    """Retorna a quantidade de registros da tabela."""
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
+
+def fontes_de_lotes(base_dir, pasta_name, iterar, engine, force=False, workers=1):
+    """
+    Retorna pares (registro do manifesto, lotes tratados) para cada arquivo pendente da pasta.
+      - workers == 1: os lotes são gerados sob demanda (leitura em lotes, memória limitada a um lote);
+      - workers > 1: os arquivos são tratados antes, em paralelo no pool de processos,
+        e cada um vira um único lote.
+    """
+    if workers > 1:
+        dfs = _tratar_pasta(base_dir, pasta_name, iterar, engine, force, workers)
+        return [(df.attrs["arquivo"], [df]) for df in dfs]
+    return [(info, iterar(arquivo)) for arquivo, info in listar_arquivos_csv(base_dir, pasta_name, engine, force)]
 
+def carregar_arquivo(engine, info, lotes, totais, carregar_lote):
+    """
+    Carrega os lotes tratados de um arquivo com a função `carregar_lote`, acumulando as
+    contagens em `totais`, e registra o arquivo no manifesto ao final.
+    Se algum lote falhar, o arquivo não é registrado e será reprocessado na próxima execução
+    (a carga é idempotente, então os lotes já enviados não geram duplicados).
+    Um arquivo que não gera nenhum lote (layout inesperado, CSV truncado) também não é
+    registrado, para não ser ignorado nas próximas execuções.
+    """
+    linhas = 0
+    lotes_carregados = 0
+    for lote in lotes:
+        contagens = carregar_lote(lote)
+        linhas += len(lote)
+        lotes_carregados += 1
+        for k, v in contagens.items():
+            totais[k] += v
+    totais["linhas"] += linhas
+    if not lotes_carregados:
+        print(f"⚠ Nenhum lote tratado em {info['caminho']}: o arquivo não foi registrado no manifesto.")
+        return linhas
+    registrar_arquivo(engine, info, linhas)
+    return linhas
+
+def carregar_arquivos(engine, fontes, tabela, totais, carregar_lote):
+    """
+    Trata e carrega cada arquivo de `fontes` (pares de fontes_de_lotes) com carregar_arquivo.
+    Um arquivo com erro no tratamento ou na carga é pulado, sem registro no manifesto (volta na
+    próxima execução), e os demais continuam; as falhas são listadas no final.
+    """
+    falhas = []
+    for info, lotes in fontes:
+        print(f"📄 Carregando o arquivo {info['caminho']} na tabela '{tabela}'...")
+        try:
+            carregar_arquivo(engine, info, lotes, totais, carregar_lote)
+        except Exception as e:
+            print(f"❌ Falha ao carregar {info['caminho']}: {type(e).__name__}: {e}")
+            falhas.append((info["caminho"], f"{type(e).__name__}: {e}"))
+    if falhas:
+        print(f"⚠ {len(falhas)} arquivo(s) não carregado(s) em '{tabela}':")
+        for arquivo, erro in falhas:
+            print(f"   - {arquivo}: {erro}")
+    return falhas
+
+def carregar_lote_pedidos(engine, lote, estrategia=ESTRATEGIA_CARGA_PADRAO, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Carrega um lote tratado de pedidos em 'pedidos_provider_v2' com upsert pelo índice único
+    de 'Nº Pedido' (ver migracoes_bilhetagem.py chave_pedidos), já com o empresa_id de cada linha.
+    Em seguida atualiza a conciliação (pedido_pagamento) dos pedidos do lote e os
+    indicadores mensais (kpi_pedidos_mes) dos meses do lote, e incrementa a versão dos dados.
+    """
+    atribuir_empresa_id(engine, lote, "Empresa", "Código da Empresa")
+    contagens = upsert_por_chave(
+        engine, lote, "pedidos_provider_v2", "Nº Pedido", dtype=DTYPES_PEDIDOS,
+        estrategia=estrategia, tamanho_lote=tamanho_lote
+    )
+    contagens["conciliados"] = atualizar_pedido_pagamento(engine, lote["Nº Pedido"])
+    atualizar_kpis_pedidos(engine, meses_de(lote["Data do Pedido"]))
+    incrementar_versao_dados(engine)
+    return contagens
+
+def carregar_lote_boletos(engine, lote, estrategia=ESTRATEGIA_CARGA_PADRAO, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Carrega um lote tratado de boletos em 'boletos_pago_v3'; duplicados são rejeitados pelo índice
+    único de 'hash_linha' (ver migracoes_bilhetagem.py hash_boletos). A empresa é resolvida pelo nome.
+    Em seguida atualiza a conciliação (pedido_pagamento) dos pedidos pagos pelos boletos do lote
+    e os indicadores mensais: kpi_boletos_mes nos meses de pagamento do lote e kpi_pedidos_mes
+    nos meses dos pedidos em 'Novo' que acabaram de receber boleto. Por fim incrementa a versão dos dados.
+    """
+    atribuir_empresa_id(engine, lote, "Empresa")
+    contagens = inserir_novos_por_hash(
+        engine, lote, "boletos_pago_v3", dtype=DTYPES_BOLETOS,
+        estrategia=estrategia, tamanho_lote=tamanho_lote
+    )
+    contagens["conciliados"] = atualizar_pedido_pagamento(engine, lote["Número Pedido"])
+    atualizar_kpis_boletos(engine, meses_de(lote["Pagamento"]))
+    atualizar_kpis_pedidos(engine, meses_pedidos_novos(engine, lote["Número Pedido"]))
+    incrementar_versao_dados(engine)
+    return contagens
+
+def carregar_relatorios(engine, pasta=base_dir, force=False, workers=1,
+                        estrategia=ESTRATEGIA_CARGA_PADRAO, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Trata e carrega no banco os CSVs pendentes das subpastas dos dois relatórios em `pasta`.
+    Arquivos já registrados no manifesto são ignorados (a menos que force=True).
+    """
+    opcoes_carga = {"estrategia": estrategia, "tamanho_lote": tamanho_lote}
+    garantir_tabela_manifesto(engine)
+    garantir_tabela_empresas(engine)
+    garantir_tabela_pedido_pagamento(engine)
+    garantir_tabelas_kpi(engine)
+    garantir_tabela_versao(engine)
+
+    # 1) Pedidos Provider - V2: cada arquivo novo ou alterado (salvo --force) é tratado e carregado
+    #    com upsert em 'pedidos_provider_v2', usando o índice único de 'Nº Pedido'
+    #    (ver migracoes_bilhetagem.py chave_pedidos).
+    totais_pedidos = {
+        "linhas": 0, "inseridos": 0, "atualizados": 0, "inalterados": 0, "conciliados": 0, "segundos": 0.0
+    }
+    carregar_arquivos(
+        engine,
+        fontes_de_lotes(pasta, "Pedidos Provider - V2", iterar_pedidos_provider_v2, engine, force, workers),
+        "pedidos_provider_v2", totais_pedidos,
+        lambda lote: carregar_lote_pedidos(engine, lote, **opcoes_carga)
+    )
+    print(
+        f"📊 pedidos_provider_v2: {totais_pedidos['inseridos']} inseridos, "
+        f"{totais_pedidos['atualizados']} atualizados, {totais_pedidos['inalterados']} inalterados "
+        f"({totais_pedidos['conciliados']} linhas de pedido_pagamento recalculadas)."
+    )
+    relatar_velocidade("pedidos_provider_v2", totais_pedidos["linhas"], totais_pedidos["segundos"])
+
+    # 2) Boletos Pago - V3: mesmo fluxo; duplicados são rejeitados pelo índice único
+    #    de 'hash_linha' (ver migracoes_bilhetagem.py hash_boletos), sem reescrever a tabela.
+    totais_boletos = {"linhas": 0, "inseridos": 0, "duplicados": 0, "conciliados": 0, "segundos": 0.0}
+    carregar_arquivos(
+        engine,
+        fontes_de_lotes(
+            pasta, "Boletos Pago (por data de pagamento - V3)", iterar_boletos_pago_v3, engine, force, workers
+        ),
+        "boletos_pago_v3", totais_boletos,
+        lambda lote: carregar_lote_boletos(engine, lote, **opcoes_carga)
+    )
+    print(
+        f"📊 boletos_pago_v3: {totais_boletos['inseridos']} inseridos, "
+        f"{totais_boletos['duplicados']} duplicados ignorados "
+        f"({totais_boletos['conciliados']} linhas de pedido_pagamento recalculadas)."
+    )
+    relatar_velocidade("boletos_pago_v3", totais_boletos["linhas"], totais_boletos["segundos"])
+
+def baixar_janelas(janelas, via="selenium", paralelo=False, engine=None):
+    """
+    Baixa os dois relatórios de cada janela ("dd/mm/yyyy", "dd/mm/yyyy") planejada.
+    No modo sequencial do Selenium o mesmo navegador logado atende todas as janelas.
+    Com `engine`, cada janela baixada é registrada na cobertura usada pelo planejador.
+    """
+    if not janelas:
+        return
+
+    def registrar(data_inicial, data_final):
+        if engine is not None:
+            registrar_cobertura(engine, data_inicial, data_final)
+
+    if via == "http":
+        # Importado só aqui: requests/beautifulsoup4 não são necessários no modo Selenium
+        from vtadmin_http import main as http_main
+        for data_inicial, data_final in janelas:
+            http_main(data_inicial, data_final)
+            registrar(data_inicial, data_final)
+    elif paralelo:
+        for data_inicial, data_final in janelas:
+            selenium_main(data_inicial, data_final, paralelo=True)
+            registrar(data_inicial, data_final)
+    else:
+        with SessaoVTAdmin(base_dir) as sessao:
+            for data_inicial, data_final in janelas:
+                selenium_main(data_inicial, data_final, sessao=sessao)
+                registrar(data_inicial, data_final)
 
 def main():
-     # Defina as datas aqui no script principal
-    data_inicial = "01/03/2025"
-    data_final   = "25/03/2025"
-
-    # Executa o Selenium passando as datas definidas
-    selenium_main(data_inicial, data_final)
-
-    # 1) Gera as listas de DataFrames
-    df_pedidos_list = tratar_pedidos_provider_v2(base_dir)
-    df_boletos_list = tratar_boletos_pago_v3(base_dir)
-
-    print(f"Total de DataFrames retornados de Pedidos Provider: {len(df_pedidos_list)}")
-    print(f"Total de DataFrames retornados de Boletos Pago V3: {len(df_boletos_list)}")
-
-    # 2) Cria a engine para se conectar ao banco MySQL
-    engine = get_engine()
-
-    # 3) Deleta apenas os registros do período definido (sem afetar outros meses)
-    delete_registros_intervalo(engine, "pedidos_provider_v2", data_inicial, data_final)
-
-    # 3) Insere cada DataFrame de Pedidos Provider - V2 na tabela 'pedidos_provider_v2'
-    for i, df_pedidos in enumerate(df_pedidos_list, start=1):
-        print(f"Inserindo DataFrame {i} de Pedidos Provider - V2 na tabela 'pedidos_provider_v2'...")
-        df_pedidos.to_sql(
-            name="pedidos_provider_v2",
-            con=engine,
-            if_exists="append",
-            index=False
+    parser = argparse.ArgumentParser(description="Baixa, trata e carrega os relatórios do VTAdmin.")
+    parser.add_argument(
+        "--dedup-boletos", action="store_true",
+        help="Apenas executa a manutenção: remove duplicados de boletos_pago_v3 reescrevendo a tabela. "
+             "Pare a ingestão antes: linhas gravadas durante a reconstrução se perdem na troca."
+    )
+    parser.add_argument(
+        "--estrategia-carga", choices=ESTRATEGIAS_CARGA, default=ESTRATEGIA_CARGA_PADRAO,
+        help="Como inserir os lotes no MySQL: INSERT multi-linhas ('multi') ou LOAD DATA LOCAL INFILE ('infile')."
+    )
+    parser.add_argument(
+        "--tamanho-lote", type=int, default=TAMANHO_LOTE_PADRAO,
+        help="Quantidade de linhas por comando INSERT na estratégia 'multi'."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Reprocessa todos os CSVs das pastas, inclusive os já registrados no manifesto."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Processos usados para tratar os CSVs em paralelo (1 = leitura em lotes, sem pool)."
+    )
+    parser.add_argument(
+        "--download-paralelo", action="store_true",
+        help="Baixa os dois relatórios ao mesmo tempo, cada um em sua própria sessão do navegador."
+    )
+    parser.add_argument(
+        "--via", choices=("selenium", "http"), default="selenium",
+        help="Como baixar os relatórios: pelo navegador ('selenium') ou direto por HTTP, sem Chrome ('http')."
+    )
+    parser.add_argument(
+        "--desde", type=data_br,
+        help="Data inicial (dd/mm/yyyy) considerada pelo planejador. Padrão: primeira data já carregada."
+    )
+    parser.add_argument(
+        "--ate", type=data_br, help="Data final (dd/mm/yyyy) considerada pelo planejador. Padrão: hoje."
+    )
+    parser.add_argument(
+        "--dias-reatualizar", type=int, default=DIAS_REATUALIZAR,
+        help="Últimos dias do período que são sempre baixados novamente (status ainda podem mudar)."
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Sobrepõe download, tratamento e carga: cada relatório é tratado e carregado enquanto o próximo é baixado."
+    )
+    args = parser.parse_args()
+
+    if args.dedup_boletos:
+        engine = get_engine()
+        remove_duplicados(engine, "boletos_pago_v3")
+        reconstruir_kpis(engine)
+        return
+
+    # 1) Cria a engine para se conectar ao banco MySQL
+    engine = get_engine(local_infile=args.estrategia_carga == "infile")
+
+    # Baixa apenas as janelas de datas que ainda não foram baixadas, mais os últimos dias
+    garantir_tabela_cobertura(engine)
+    janelas = planejar_janelas(engine, args.desde, args.ate, args.dias_reatualizar)
+    if not janelas:
+        print("✅ Nenhuma janela de datas pendente para baixar.")
+
+    if args.pipeline:
+        from pipeline_bilhetagem import executar_pipeline  # Importado aqui: o pipeline usa este módulo
+        executar_pipeline(
+            engine, janelas, args.via, args.force, args.estrategia_carga, args.tamanho_lote
         )
-
-    # 4) Insere cada DataFrame de Boletos Pago - V3 na tabela 'boletos_pago_v3'
-    for i, df_boletos in enumerate(df_boletos_list, start=1):
-        print(f"Inserindo DataFrame {i} de Boletos Pago - V3 na tabela 'boletos_pago_v3'...")
-        df_boletos.to_sql(
-            name="boletos_pago_v3",
-            con=engine,
-            if_exists="append",
-            index=False
+        # CSVs que já estavam na pasta antes desta execução e ainda não foram carregados
+        carregar_relatorios(
+            engine, base_dir, False, args.workers, args.estrategia_carga, args.tamanho_lote
         )
+        print("✅ Inserção e limpeza concluídas.")
+        return
 
-    # 5) Após as inserções, remove duplicados das tabelas no próprio banco de dados
-    
-    remove_duplicados(engine, "boletos_pago_v3")
-    remove_duplicados_por_num_pedido(engine, "pedidos_provider_v2", pk="id")
-    #remove_duplicados_pedidos_provider_v2(engine)
+    baixar_janelas(janelas, args.via, args.download_paralelo, engine)
+
+    carregar_relatorios(
+        engine, base_dir, args.force, args.workers, args.estrategia_carga, args.tamanho_lote
+    )
 
     print("✅ Inserção e limpeza concluídas.")
 
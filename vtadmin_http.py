@@ -0,0 +1,214 @@
+"""
+Exportação dos relatórios do VTAdmin apenas com requisições HTTP, sem navegador.
+
+Reproduz o que o fluxo do Selenium (vtadmin_via_selenium.py) faz na tela:
+  1. Login assíncrono em Login_Async.aspx (usuário/senha ofuscados com qcCript_py);
+  2. POST do formulário Reports/wfm_ReportFilter.aspx com o relatório e as datas (ViewState);
+  3. Espera o relatório ficar pronto em Reports/ShowReport.aspx (__CRYSTALSTATE...);
+  4. POST de exportação do Crystal Reports com printMode = CSV, gravando a resposta em disco
+     em blocos, sem carregar o arquivo inteiro em memória.
+
+Para testar e medir o fluxo sem acesso ao servidor real, use fake_vtadmin.py.
+"""
+import os
+import json
+import time
+import random
+
+import requests
+from bs4 import BeautifulSoup
+
+from config_vtadmin import download_dir, usuario, senha, RELATORIOS, FILTROS_RELATORIOS, URL_VTADMIN
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
+)
+
+# Botão "Exportar" do diálogo do Crystal Reports (ver scripts não usados/vtadim_relatorios.py)
+EVENTO_EXPORTAR = "theBttnbobjid_1740526847058_dialog_submitBtn"
+CAMPO_CRYSTAL_STATE = "__CRYSTALSTATECrystalReportViewer1"
+
+# Tempo máximo (s) para o servidor gerar o relatório e intervalo entre as consultas
+TEMPO_LIMITE_RELATORIO = 120
+INTERVALO_CONSULTA_RELATORIO = 1
+TAMANHO_BLOCO_DOWNLOAD = 64 * 1024
+# Tempos máximos (s) de conexão e de leitura de cada requisição: sem eles uma conexão parada
+# com o VTAdmin trava para sempre (e o backfill nunca recebe requests.exceptions.Timeout).
+# O processamento e a exportação podem demorar a responder, então leem até TEMPO_LIMITE_RELATORIO.
+TEMPO_LIMITE_CONEXAO = 10
+TEMPO_LIMITE_LEITURA = 60
+TEMPO_LIMITE_REQUISICAO = (TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_LEITURA)
+TEMPO_LIMITE_REQUISICAO_LONGA = (TEMPO_LIMITE_CONEXAO, TEMPO_LIMITE_RELATORIO)
+
+
+class ErroExportacao(Exception):
+    """Falha em alguma etapa da exportação HTTP do VTAdmin."""
+
+
+def qcCript_py(txt):
+    """
+    Ofusca o texto adicionando 5 caracteres aleatórios entre 65 e 114 a cada caractere original.
+    """
+    ret = ""
+    for c in txt:
+        for _ in range(5):
+            r = random.randint(65, 114)
+            if 91 <= r <= 96:
+                r = 76  # 'L'
+            ret += chr(r)
+        ret += c
+    return ret
+
+
+def campos_ocultos(html):
+    """Retorna os <input type="hidden"> da página (ViewState e afins) como dicionário."""
+    soup = BeautifulSoup(html, "html.parser")
+    return {
+        campo.get("name"): campo.get("value", "")
+        for campo in soup.find_all("input", {"type": "hidden"})
+        if campo.get("name")
+    }
+
+
+def login_vtadmin(usuario, senha, url_base=URL_VTADMIN):
+    """
+    Realiza login no VTAdmin e retorna a sessão autenticada.
+    """
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+
+    params = {"usr": qcCript_py(usuario), "pass": qcCript_py(senha)}
+    response = session.get(f"{url_base}/Login_Async.aspx", params=params, timeout=TEMPO_LIMITE_REQUISICAO)
+    response.raise_for_status()
+    if not session.cookies:
+        raise ErroExportacao("Login não retornou cookie de sessão. Verifique usuário e senha.")
+    print("✅ Login HTTP realizado.")
+    return session
+
+
+def processar_relatorio_http(session, relatorio, data_inicial, data_final, url_base=URL_VTADMIN):
+    """
+    Envia o formulário wfm_ReportFilter.aspx para gerar o relatório (1 ou 2) no período.
+    """
+    filtro = FILTROS_RELATORIOS[relatorio]
+    url = f"{url_base}/Reports/wfm_ReportFilter.aspx"
+    response = session.get(url, timeout=TEMPO_LIMITE_REQUISICAO)
+    response.raise_for_status()
+
+    payload = campos_ocultos(response.text)
+    payload.update({
+        "__EVENTTARGET": "btnQuery",
+        "__EVENTARGUMENT": "",
+        "ddListOpt": filtro["rpt"],
+        "selectedvalue": filtro["rpt"],
+        filtro["inicio"]: data_inicial,
+        filtro["fim"]: data_final,
+        "btnQuery": "Processar",
+    })
+    response = session.post(url, data=payload, timeout=TEMPO_LIMITE_REQUISICAO_LONGA)
+    response.raise_for_status()
+    print(f"✅ Relatório '{RELATORIOS[relatorio]}' enviado para processamento.")
+
+
+def aguardar_relatorio(session, url_base=URL_VTADMIN, timeout=TEMPO_LIMITE_RELATORIO,
+                       intervalo=INTERVALO_CONSULTA_RELATORIO):
+    """
+    Consulta ShowReport.aspx até o relatório ficar pronto (página com o CRYSTALSTATE)
+    e retorna os campos ocultos da página. Levanta TimeoutError após `timeout` segundos.
+    """
+    url = f"{url_base}/Reports/ShowReport.aspx"
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        response = session.get(url, timeout=TEMPO_LIMITE_REQUISICAO)
+        response.raise_for_status()
+        campos = campos_ocultos(response.text)
+        if campos.get(CAMPO_CRYSTAL_STATE):
+            print("✅ Relatório gerado.")
+            return campos
+        time.sleep(intervalo)
+    raise TimeoutError(f"Relatório não foi gerado em {timeout}s.")
+
+
+def estado_para_csv(crystal_state):
+    """Altera o `printMode` do CRYSTALSTATE para exportação em CSV."""
+    try:
+        estado = json.loads(crystal_state.replace("'", "\""))  # Corrige a string JSON
+        estado["common"]["printMode"] = "CharacterSeparatedValues"  # Altera para CSV
+    except (json.JSONDecodeError, KeyError) as e:
+        raise ErroExportacao(f"Formato inesperado do CRYSTALSTATE: {e}")
+    return json.dumps(estado).replace("\"", "'")  # Converte de volta para o formato original
+
+
+def exportar_csv_http(session, destino, campos, url_base=URL_VTADMIN):
+    """
+    Envia a exportação do relatório em CSV e grava a resposta em `destino`, em blocos.
+    Retorna a quantidade de bytes gravados.
+    """
+    url = f"{url_base}/Reports/ShowReport.aspx"
+    payload = {
+        "__EVENTTARGET": EVENTO_EXPORTAR,
+        "__EVENTARGUMENT": "",
+        CAMPO_CRYSTAL_STATE: estado_para_csv(campos[CAMPO_CRYSTAL_STATE]),
+        "__VIEWSTATE": campos.get("__VIEWSTATE", ""),
+        "__VIEWSTATEGENERATOR": campos.get("__VIEWSTATEGENERATOR", ""),
+    }
+    headers = {"Referer": url, "Origin": url_base}
+
+    with session.post(
+        url, data=payload, headers=headers, stream=True, timeout=TEMPO_LIMITE_REQUISICAO_LONGA
+    ) as response:
+        response.raise_for_status()
+        if "attachment" not in response.headers.get("Content-Disposition", ""):
+            raise ErroExportacao(
+                "O servidor não retornou um CSV. Início da resposta: " + response.text[:500]
+            )
+        parcial = destino + ".parcial"
+        tamanho = 0
+        with open(parcial, "wb") as f:
+            for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO_DOWNLOAD):
+                f.write(bloco)
+                tamanho += len(bloco)
+    os.replace(parcial, destino)
+    return tamanho
+
+
+def baixar_relatorio_http(session, relatorio, data_inicial, data_final,
+                          pasta_download=download_dir, url_base=URL_VTADMIN):
+    """
+    Gera e exporta um relatório (1 ou 2) e grava o CSV na subpasta do relatório.
+    Retorna o caminho do arquivo.
+    """
+    processar_relatorio_http(session, relatorio, data_inicial, data_final, url_base)
+    campos = aguardar_relatorio(session, url_base)
+
+    subpasta = os.path.join(pasta_download, RELATORIOS[relatorio])
+    os.makedirs(subpasta, exist_ok=True)
+    nome = "{}_{}_{}.csv".format(
+        FILTROS_RELATORIOS[relatorio]["rpt"].replace(".rpt", ""),
+        data_inicial.replace("/", "-"),
+        data_final.replace("/", "-"),
+    )
+    destino = os.path.join(subpasta, nome)
+    tamanho = exportar_csv_http(session, destino, campos, url_base)
+    print(f"✅ CSV salvo em {destino} ({tamanho} bytes).")
+    return destino
+
+
+def main(data_inicial, data_final, pasta_download=download_dir, url_base=URL_VTADMIN):
+    """
+    Baixa os dois relatórios do período via HTTP e retorna os caminhos dos CSVs,
+    na ordem de RELATORIOS (mesmo contrato de vtadmin_via_selenium.main).
+    """
+    session = login_vtadmin(usuario, senha, url_base)
+    arquivos = [
+        baixar_relatorio_http(session, relatorio, data_inicial, data_final, pasta_download, url_base)
+        for relatorio in RELATORIOS
+    ]
+    print("✅ Download de ambos relatórios concluído.")
+    return arquivos
+
+
+if __name__ == "__main__":
+    # Caso queira executar diretamente, defina as datas aqui
+    main("18/03/2025", "19/03/2025")
@@ -4,15 +4,36 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import os
-import glob
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # ===================== CONFIGURAÇÕES GERAIS =====================
 
-download_dir = r"C:\Users\dcdse\OneDrive\Desktop"
+# download_dir, credenciais e relatórios ficam em config_vtadmin (compartilhados com vtadmin_http)
+from config_vtadmin import download_dir, usuario, senha, RELATORIOS
+
+# Tempo máximo (s) de espera pelo término de cada download e intervalo entre verificações
+TEMPO_LIMITE_DOWNLOAD = 300
+INTERVALO_VERIFICACAO_DOWNLOAD = 0.5
+
+# Caminho do chromedriver resolvido pelo ChromeDriverManager, reaproveitado por todos os drivers
+_chromedriver = {"caminho": None}
+_lock_chromedriver = threading.Lock()
+
+def caminho_chromedriver():
+    """
+    Resolve o chromedriver com ChromeDriverManager().install() apenas na primeira chamada
+    (a resolução consulta versões e o cache em disco) e devolve o mesmo caminho nas seguintes.
+    """
+    with _lock_chromedriver:
+        if _chromedriver["caminho"] is None:
+            _chromedriver["caminho"] = ChromeDriverManager().install()
+        return _chromedriver["caminho"]
 
 def configurar_driver(download_dir=download_dir):
     """
@@ -31,7 +52,7 @@ def configurar_driver(download_dir=download_dir):
     }
     chrome_options.add_experimental_option("prefs", prefs)
 
-    service = Service(ChromeDriverManager().install())
+    service = Service(caminho_chromedriver())
     driver = webdriver.Chrome(service=service, options=chrome_options)
     return driver
 
@@ -169,72 +190,243 @@ def exportar_relatorio_csv(driver):
     exportar_button.click()
     print("✅ Exportação confirmada, download iniciado.")
 
-def mover_csv_para_subpasta(driver, folder_name):
+def listar_csvs(pasta):
+    """Retorna o conjunto de nomes de arquivos CSV (e downloads parciais .crdownload) presentes na pasta."""
+    return {nome for nome in os.listdir(pasta) if nome.lower().endswith((".csv", ".crdownload"))}
+
+def aguardar_download(pasta, arquivos_antes, timeout=TEMPO_LIMITE_DOWNLOAD,
+                      intervalo=INTERVALO_VERIFICACAO_DOWNLOAD, verificacoes_estaveis=2):
+    """
+    Aguarda o término do download iniciado pela exportação e retorna o caminho do CSV gerado.
+
+    O arquivo esperado é um CSV que não estava na pasta antes da exportação (`arquivos_antes`).
+    O download é considerado concluído quando não há mais arquivo parcial do Chrome (.crdownload)
+    criado depois da exportação (parciais que já estavam na pasta, restos de uma execução
+    interrompida, são ignorados) e o tamanho do CSV novo se mantém igual por `verificacoes_estaveis` verificações seguidas.
+    Levanta TimeoutError se isso não acontecer em `timeout` segundos.
     """
-    Aguarda o download, move o último arquivo CSV baixado para a subpasta correspondente.
+    limite = time.monotonic() + timeout
+    ultimo_tamanho = None
+    estaveis = 0
+    while time.monotonic() < limite:
+        nomes = os.listdir(pasta)
+        parciais = [nome for nome in nomes if nome.lower().endswith(".crdownload") and nome not in arquivos_antes]
+        novos = [
+            os.path.join(pasta, nome) for nome in nomes
+            if nome.lower().endswith(".csv") and nome not in arquivos_antes
+        ]
+        if novos and not parciais:
+            arquivo = max(novos, key=os.path.getmtime)
+            tamanho = os.path.getsize(arquivo)
+            if tamanho > 0 and tamanho == ultimo_tamanho:
+                estaveis += 1
+                if estaveis >= verificacoes_estaveis:
+                    print(f"✅ Download concluído: {arquivo} ({tamanho} bytes).")
+                    return arquivo
+            else:
+                estaveis = 0
+            ultimo_tamanho = tamanho
+        time.sleep(intervalo)
+    raise TimeoutError(f"Download não concluído em {timeout}s na pasta {pasta}.")
+
+def mover_csv_para_subpasta(driver, folder_name, arquivos_antes, pasta_download=download_dir,
+                            timeout=TEMPO_LIMITE_DOWNLOAD, pasta_destino=None):
     """
-    time.sleep(90)  # Tempo para efetuar o download
-    subfolder_path = os.path.join(download_dir, folder_name)
+    Aguarda o download do CSV gerado pela exportação e move exatamente esse arquivo
+    para a subpasta correspondente. Retorna o caminho final do arquivo.
+
+    `arquivos_antes` é o resultado de listar_csvs(pasta_download) tirado antes de exportar.
+    A subpasta fica dentro de `pasta_destino` (por padrão, a própria pasta de download).
+    """
+    arquivo_baixado = aguardar_download(pasta_download, arquivos_antes, timeout)
+    subfolder_path = os.path.join(pasta_destino or pasta_download, folder_name)
     if not os.path.exists(subfolder_path):
-        os.makedirs(subfolder_path)
+        os.makedirs(subfolder_path, exist_ok=True)
         print(f"✅ Pasta '{folder_name}' criada.")
     else:
         print(f"✅ Pasta '{folder_name}' já existe.")
     
-    # Busca o arquivo CSV mais recente na pasta de download
-    list_of_files = glob.glob(os.path.join(download_dir, "*.csv"))
-    if list_of_files:
-        latest_file = max(list_of_files, key=os.path.getmtime)
-        destination = os.path.join(subfolder_path, os.path.basename(latest_file))
-        shutil.move(latest_file, destination)
-        print(f"✅ Arquivo movido para {subfolder_path}.")
-    else:
-        print("Nenhum arquivo CSV encontrado para mover.")
+    destination = os.path.join(subfolder_path, os.path.basename(arquivo_baixado))
+    if os.path.exists(destination):
+        # O VTAdmin exporta sempre com o mesmo nome: não sobrescreve o CSV de outro período
+        nome, extensao = os.path.splitext(destination)
+        destination = f"{nome}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{threading.get_ident()}{extensao}"
+    shutil.move(arquivo_baixado, destination)
+    print(f"✅ Arquivo movido para {subfolder_path}.")
 
     # Fecha a janela atual do relatório e volta para a principal
     driver.close()
     driver.switch_to.window(driver.window_handles[0])
     # Recarrega o iframe para poder escolher outro relatório
     driver.switch_to.frame("FRAME")
+    return destination
 
-# ===================== FLUXO PRINCIPAL =====================
+def baixar_relatorio(driver, relatorio, data_inicial, data_final,
+                     pasta_download=download_dir, pasta_destino=None):
+    """
+    Com o driver já na tela de relatórios, gera e exporta um relatório (1 ou 2)
+    e move o CSV para a subpasta do relatório. Retorna o caminho final do arquivo.
+    """
+    data_inicio_element, data_fim_element = selecionar_relatorio(driver, relatorio)
+    inserir_datas(data_inicio_element, data_fim_element, data_inicial, data_final)
+    processar_relatorio(driver)
+    arquivos_antes = listar_csvs(pasta_download)
+    exportar_relatorio_csv(driver)
+    return mover_csv_para_subpasta(
+        driver, RELATORIOS[relatorio], arquivos_antes, pasta_download, pasta_destino=pasta_destino
+    )
 
-def main(data_inicial, data_final):
-    # As datas agora são recebidas como parâmetros e não são definidas aqui
-    # data_inicial = "18/03/2025"
-    # data_final   = "19/03/2025"
+def baixar_relatorio_em_sessao(relatorio, data_inicial, data_final, pasta_download=download_dir):
+    """
+    Baixa um relatório em uma sessão de navegador própria (login, navegação e exportação),
+    usando uma pasta de download exclusiva para não confundir arquivos com outras sessões.
+    O CSV é movido para a subpasta do relatório dentro de `pasta_download`.
+    """
+    pasta_sessao = os.path.join(pasta_download, f"_sessao_relatorio_{relatorio}")
+    os.makedirs(pasta_sessao, exist_ok=True)
+
+    with SessaoVTAdmin(pasta_sessao) as sessao:
+        return sessao.baixar(relatorio, data_inicial, data_final, pasta_destino=pasta_download)
+
+# ===================== SESSÃO PERSISTENTE =====================
+
+class SessaoVTAdmin:
+    """
+    Mantém um navegador logado e parado na tela de relatórios para vários downloads seguidos.
+
+    O login e a navegação pelos menus são feitos apenas na primeira requisição; as seguintes
+    começam direto em select_ddListOpt. Se a sessão do VTAdmin expirar (a tela de login volta
+    a aparecer) o login é refeito, e se o navegador cair ele é recriado uma única vez por relatório.
 
-    # Cria e configura o driver
-    driver = configurar_driver(download_dir)
-    try:
-        # 1) Fazer login
-        usuario = "DAVICARVALHO.SNTR"
-        senha = "123456"
-        fazer_login(driver, usuario, senha)
+    Uso:
+        with SessaoVTAdmin(pasta_download) as sessao:
+            for data_inicial, data_final in janelas:
+                main(data_inicial, data_final, sessao=sessao)
+    """
 
-        # 2) Navegar até a tela de relatórios (uma vez)
+    def __init__(self, pasta_download=download_dir, usuario=usuario, senha=senha, pasta_destino=None):
+        self.pasta_download = pasta_download
+        # Onde ficam as subpastas dos relatórios (por padrão, a própria pasta de download)
+        self.pasta_destino = pasta_destino
+        self.usuario = usuario
+        self.senha = senha
+        self.driver = None
+        self.logins = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _entrar(self):
+        """Faz login e navega até a tela de relatórios."""
+        fazer_login(self.driver, self.usuario, self.senha)
+        navegar_para_relatorios(self.driver)
+        self.logins += 1
+
+    def abrir(self):
+        """Cria o navegador (se necessário) já logado na tela de relatórios."""
+        if self.driver is None:
+            self.driver = configurar_driver(self.pasta_download)
+            self._entrar()
+        return self.driver
+
+    def pronta(self):
+        """
+        Garante que o driver está no iframe da tela de relatórios, com o seletor disponível.
+        Refaz o login apenas se a tela de login aparecer (sessão expirada).
+        """
+        driver = self.abrir()
+        if driver.find_elements(By.ID, "select_ddListOpt"):
+            return driver
+
+        driver.switch_to.default_content()
+        if driver.find_elements(By.ID, "txtLogin"):
+            print("🔑 Sessão do VTAdmin expirada. Refazendo login...")
+            self._entrar()
+            return driver
+
+        # Logado, mas fora do iframe de relatórios: tenta voltar para ele antes de navegar pelos menus
+        if driver.find_elements(By.ID, "FRAME"):
+            driver.switch_to.frame("FRAME")
+            if driver.find_elements(By.ID, "select_ddListOpt"):
+                return driver
+            driver.switch_to.default_content()
         navegar_para_relatorios(driver)
+        return driver
+
+    def _descartar_janelas_extras(self):
+        """Fecha janelas de relatório que tenham ficado abertas por uma exportação interrompida."""
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+
+    def baixar(self, relatorio, data_inicial, data_final, pasta_destino=None):
+        """
+        Baixa um relatório (1 ou 2) com o navegador da sessão e retorna o caminho do CSV.
+        Se o navegador falhar no meio, ele é recriado e o relatório é pedido mais uma vez.
+        """
+        pasta_destino = pasta_destino or self.pasta_destino
+        for tentativa in (1, 2):
+            try:
+                driver = self.pronta()
+                return baixar_relatorio(
+                    driver, relatorio, data_inicial, data_final, self.pasta_download, pasta_destino
+                )
+            except (TimeoutError, TimeoutException):
+                # Relatório ou download não terminou a tempo: repetir o mesmo período não adianta.
+                # Limpa as janelas extras para a próxima requisição começar limpa.
+                self._descartar_janelas_extras()
+                raise
+            except WebDriverException as e:
+                if tentativa == 2:
+                    raise
+                print(f"⚠ Falha no navegador ({type(e).__name__}). Recriando a sessão...")
+                self.fechar()
+
+    def fechar(self):
+        """Encerra o navegador da sessão (se houver)."""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = None
+            print("✅ Driver encerrado.")
 
-        # === PRIMEIRO RELATÓRIO (Pedidos Provider - V2) ===
-        data_inicio_element, data_fim_element = selecionar_relatorio(driver, 1)
-        inserir_datas(data_inicio_element, data_fim_element, data_inicial, data_final)
-        processar_relatorio(driver)
-        exportar_relatorio_csv(driver)
-        mover_csv_para_subpasta(driver, "Pedidos Provider - V2")
+# ===================== FLUXO PRINCIPAL =====================
 
-        # === SEGUNDO RELATÓRIO (Boletos Pago - V3) ===
-        data_inicio_element, data_fim_element = selecionar_relatorio(driver, 2)
-        inserir_datas(data_inicio_element, data_fim_element, data_inicial, data_final)
-        processar_relatorio(driver)
-        exportar_relatorio_csv(driver)
-        mover_csv_para_subpasta(driver, "Boletos Pago (por data de pagamento - V3)")
+def main(data_inicial, data_final, paralelo=False, pasta_download=download_dir, sessao=None):
+    """
+    Baixa os dois relatórios do período e retorna os caminhos dos CSVs, na ordem de RELATORIOS.
 
+    Com paralelo=True cada relatório roda em sua própria sessão headless ao mesmo tempo,
+    de modo que a geração dos dois relatórios no servidor se sobrepõe.
+    Com `sessao` (SessaoVTAdmin) o navegador já logado é reaproveitado e não é encerrado ao final;
+    os CSVs vão para a pasta de download da sessão.
+    """
+    if sessao is not None:
+        arquivos = [sessao.baixar(relatorio, data_inicial, data_final) for relatorio in RELATORIOS]
         print("✅ Download de ambos relatórios concluído.")
-    finally:
-        driver.quit()
-        print("✅ Driver encerrado.")
+        return arquivos
+
+    if paralelo:
+        with ThreadPoolExecutor(max_workers=len(RELATORIOS)) as executor:
+            futuros = [
+                executor.submit(baixar_relatorio_em_sessao, relatorio, data_inicial, data_final, pasta_download)
+                for relatorio in RELATORIOS
+            ]
+            arquivos = [futuro.result() for futuro in futuros]
+        print("✅ Download de ambos relatórios concluído.")
+        return arquivos
+
+    # Pedidos Provider - V2 e depois Boletos Pago - V3, na mesma sessão (login e navegação uma vez)
+    with SessaoVTAdmin(pasta_download) as sessao:
+        return main(data_inicial, data_final, sessao=sessao)
 
 if __name__ == "__main__":
     # Caso queira executar diretamente, defina as datas aqui
     main("18/03/2025", "19/03/2025")
-